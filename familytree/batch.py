@@ -0,0 +1,90 @@
+from django.db import transaction
+from .models import Person, FamilyTree, FamilyRelation
+from .signals import tree_bulk_changed
+
+# Rows of the Person.parents through table point from child to parent.
+ParentLink = Person.parents.through
+PartnerLink = Person.partners.through
+TreeMember = FamilyTree.person.through
+
+RELATIONS = ('parent', 'child', 'sibling', 'partner')
+
+
+def add_relatives(main_person, relation, relation_type, persons):
+    """Save new persons as relatives of main_person in bulk.
+    relation is one of RELATIONS, relation_type the FamilyRelation type
+    recorded for every new person. The persons, their links, relations
+    and tree memberships are each written with one bulk insert.
+    Return the saved persons.
+    """
+    if relation not in RELATIONS:
+        raise ValueError(f"Unknown relation {relation}.")
+    persons = list(persons)
+    if not persons:
+        return persons
+
+    owner_id = main_person.owner_id
+    with transaction.atomic():
+        for person in persons:
+            person.owner_id = owner_id
+        Person.objects.bulk_create(persons)
+        new_ids = [person.pk for person in persons]
+
+        parent_links, partner_links = [], []
+        if relation == 'parent':
+            parent_links = [
+                ParentLink(from_person_id=main_person.pk, to_person_id=pk)
+                for pk in new_ids
+            ]
+        elif relation == 'child':
+            parent_links = [
+                ParentLink(from_person_id=pk, to_person_id=main_person.pk)
+                for pk in new_ids
+            ]
+        elif relation == 'sibling':
+            parent_ids = ParentLink.objects.filter(
+                from_person_id=main_person.pk
+                ).values_list('to_person_id', flat=True)
+            parent_links = [
+                ParentLink(from_person_id=pk, to_person_id=parent_id)
+                for parent_id in parent_ids for pk in new_ids
+            ]
+        else:
+            partner_links = [
+                link for pk in new_ids for link in (
+                    PartnerLink(from_person_id=main_person.pk,
+                                to_person_id=pk),
+                    PartnerLink(from_person_id=pk,
+                                to_person_id=main_person.pk),
+                )
+            ]
+        ParentLink.objects.bulk_create(parent_links)
+        PartnerLink.objects.bulk_create(partner_links)
+
+        # Parents point to the main person, everyone else from it,
+        # the same as add_family_member does.
+        if relation == 'parent':
+            pairs = [(pk, main_person.pk) for pk in new_ids]
+        else:
+            pairs = [(main_person.pk, pk) for pk in new_ids]
+        FamilyRelation.objects.bulk_create([
+            FamilyRelation(from_person_id=a, to_person_id=b,
+                           relation_type=relation_type)
+            for a, b in pairs
+        ])
+
+        tree, _ = FamilyTree.objects.get_or_create(owner_id=owner_id)
+        TreeMember.objects.bulk_create([
+            TreeMember(familytree_id=tree.pk, person_id=pk)
+            for pk in new_ids
+        ])
+        if tree.main_person_id is None:
+            tree.main_person_id = main_person.pk
+            tree.save(update_fields=['main_person'])
+
+        # New parents change the ancestors of the main person and its
+        # descendants, other relatives only their own.
+        touched = new_ids + ([main_person.pk] if relation == 'parent' else [])
+        tree_bulk_changed.send(
+            sender=Person, owner_id=owner_id, person_ids=touched)
+    return persons
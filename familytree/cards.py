@@ -0,0 +1,76 @@
+import uuid
+from django.core.cache import caches
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+from . import images
+from .models import Person
+
+CARD_TEMPLATE = 'familytree/_person_card.html'
+CARD_TIMEOUT = 24 * 60 * 60
+BATCH_SIZE = 1000
+# Cards of other persons are rendered once for every point of view
+# with this id in the links, which is then replaced by the real one.
+POV_MARK = 7340032916405811
+
+
+def _new_version():
+    return uuid.uuid4().hex[:12]
+
+
+def bump(person_ids):
+    """Give persons a new card version with one UPDATE per thousand
+    persons, so their cached cards are never read again and expire on
+    their own. Return the new version.
+    """
+    version = _new_version()
+    person_ids = list(set(person_ids))
+    for start in range(0, len(person_ids), BATCH_SIZE):
+        Person.objects.filter(
+            pk__in=person_ids[start:start + BATCH_SIZE]
+            ).update(card_version=version)
+    return version
+
+
+def _card_key(person, pov_id):
+    own = 'own' if person.pk == pov_id else 'other'
+    return f"familytree:card:{person.pk}:{person.card_version}:{own}"
+
+
+def render_cards(persons, pov_id):
+    """Get the card markup of many persons seen from pov_id.
+    Cards are read with one multi-get from the fragment cache of this
+    worker, keyed by the card_version loaded with the persons, and only
+    cards missing from it are rendered. Return a dict mapping person
+    ids to safe html.
+    """
+    persons = list(persons)
+    if not persons:
+        return {}
+    fragments = caches['fragments']
+    keys = {p.pk: _card_key(p, pov_id) for p in persons}
+    found = fragments.get_many(keys.values())
+    missing = [p for p in persons if keys[p.pk] not in found]
+    images.attach_card_images(
+        p for p in missing if not hasattr(p, 'card_image'))
+    rendered = {
+        keys[p.pk]: render_to_string(CARD_TEMPLATE, {
+            'person': p,
+            'pov_id': pov_id if p.pk == pov_id else POV_MARK,
+        })
+        for p in missing
+    }
+    fragments.set_many(rendered, CARD_TIMEOUT)
+    found.update(rendered)
+    return {
+        pk: mark_safe(found[key].replace(str(POV_MARK), str(pov_id)))
+        for pk, key in keys.items()
+    }
+
+
+def attach_cards(persons, pov_id):
+    """Set card_html on every person, see render_cards."""
+    persons = list(persons)
+    cards = render_cards(persons, pov_id)
+    for person in persons:
+        person.card_html = cards[person.pk]
+    return persons
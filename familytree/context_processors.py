@@ -1,13 +1,32 @@
-from .models import FamilyTree
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.functional import SimpleLazyObject
+from .freshness import tree_state
+from .models import Person
+
+
+def main_person_id(request):
+    """
+    Get the id of the main person of the user's family tree, or None.
+    It comes with the tree state of the request, so tree pages, which
+    read that state for their ETag, get it without another query.
+    """
+    state = tree_state(request)
+    return state and state[3]
+
+
+def _main_person(request):
+    person_id = main_person_id(request)
+    if person_id is None:
+        return None
+    # Only the id is known, other fields are loaded on first access.
+    return Person.from_db(DEFAULT_DB_ALIAS, ['id'], [person_id])
 
 
 def pov_context(request):
     """
     Context processor to add the main person of the family tree to the context.
+    The lookup only runs if a template actually reads the person.
     """
     if request.user.is_authenticated:
-        user = request.user
-        family_tree = FamilyTree.objects.filter(owner=user).first()
-        person = family_tree.main_person if family_tree else None
-        return {'person': person}
+        return {'person': SimpleLazyObject(lambda: _main_person(request))}
     return {}
@@ -0,0 +1,114 @@
+from collections import defaultdict
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from .models import Person, FamilyTree, FamilyUnit
+
+# Rows of the Person.parents through table point from child to parent.
+ParentLink = Person.parents.through
+PartnerLink = Person.partners.through
+TreeMember = FamilyTree.person.through
+UnitParent = FamilyUnit.parents.through
+
+BATCH_SIZE = 1000
+
+
+def _chunked(ids):
+    ids = list(ids)
+    for start in range(0, len(ids), BATCH_SIZE):
+        yield ids[start:start + BATCH_SIZE]
+
+
+def _rows(model, column, outer='pk'):
+    """Count the rows of model whose column is the outer row."""
+    return Coalesce(Subquery(
+        model.objects.filter(**{column: OuterRef(outer)}).order_by()
+        .values(column).annotate(rows=Count('*')).values('rows')), 0)
+
+
+def add(person_ids, field, amount):
+    """Change a counter of persons by amount with one UPDATE."""
+    Person.objects.filter(pk__in=person_ids).update(
+        **{field: F(field) + amount})
+
+
+def neighbours(person_ids):
+    """Get the ids of the parents, children and partners of persons."""
+    found = set()
+    for chunk in _chunked(person_ids):
+        for model, columns in (
+                (ParentLink, ('from_person_id', 'to_person_id')),
+                (ParentLink, ('to_person_id', 'from_person_id')),
+                (PartnerLink, ('from_person_id', 'to_person_id'))):
+            column, other = columns
+            found.update(model.objects.filter(
+                **{f'{column}__in': chunk}).values_list(other, flat=True))
+    return found
+
+
+def recount(person_ids):
+    """Recompute the parent, child and partner counters of persons
+    from the link tables, one UPDATE per chunk.
+    """
+    for chunk in _chunked(person_ids):
+        Person.objects.filter(pk__in=chunk).update(
+            parent_count=_rows(ParentLink, 'from_person_id'),
+            child_count=_rows(ParentLink, 'to_person_id'),
+            partner_count=_rows(PartnerLink, 'from_person_id'),
+        )
+
+
+def recount_siblings(unit_ids):
+    """Recompute the sibling counters of the children of the given
+    family units and of every unit sharing a parent with them.
+    """
+    unit_ids = set(unit_ids)
+    unit_ids.discard(None)
+    if not unit_ids:
+        return
+    parents = UnitParent.objects.filter(
+        familyunit_id__in=unit_ids).values('person_id')
+    related = unit_ids | set(UnitParent.objects.filter(
+        person_id__in=parents).values_list('familyunit_id', flat=True))
+
+    parents_of, units_of = defaultdict(set), defaultdict(set)
+    rows = UnitParent.objects.filter(
+        person_id__in=UnitParent.objects.filter(
+            familyunit_id__in=related).values('person_id')
+        ).values_list('familyunit_id', 'person_id')
+    for unit_id, parent_id in rows:
+        parents_of[unit_id].add(parent_id)
+        units_of[parent_id].add(unit_id)
+
+    sizes = dict(Person.objects.filter(
+        birth_unit_id__in={u for units in units_of.values() for u in units}
+        ).order_by().values('birth_unit_id').annotate(
+            size=Count('*')).values_list('birth_unit_id', 'size'))
+    counts = {
+        unit_id: sum(sizes.get(other, 0) for other in {
+            other for parent in parents_of[unit_id]
+            for other in units_of[parent]
+        }) - 1
+        for unit_id in related
+    }
+    persons = [
+        Person(pk=pk, sibling_count=max(counts[unit_id], 0))
+        for pk, unit_id in Person.objects.filter(
+            birth_unit_id__in=related).values_list('pk', 'birth_unit_id')
+    ]
+    Person.objects.bulk_update(
+        persons, ['sibling_count'], batch_size=BATCH_SIZE)
+
+
+def recount_trees(owner_id):
+    """Recompute the person counter of the family trees of an owner."""
+    FamilyTree.objects.filter(owner_id=owner_id).update(
+        person_count=_rows(TreeMember, 'familytree_id'))
+
+
+def refresh(owner_id, person_ids):
+    """Recompute the counters touched by a bulk write to persons.
+    Sibling counters follow the family units, see units.assign.
+    """
+    person_ids = set(person_ids)
+    recount(person_ids | neighbours(person_ids))
+    recount_trees(owner_id)
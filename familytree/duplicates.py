@@ -0,0 +1,164 @@
+import heapq
+import unicodedata
+from collections import defaultdict
+from difflib import SequenceMatcher
+from itertools import combinations
+from .models import Person
+
+CHUNK_SIZE = 2000
+# Name blocks larger than this are split by birth year and country,
+# sub-blocks still larger are compared with a sliding window over
+# the persons sorted by birth date instead of all pairs.
+MAX_BLOCK = 200
+WINDOW = 20
+THRESHOLD = 0.75
+
+FIELDS = (
+    'id', 'first_name', 'last_name', 'nickname', 'birth_date',
+    'birth_country', 'birth_place', 'death_date',
+)
+
+SOUNDEX_CODES = {
+    **dict.fromkeys('BFPV', '1'), **dict.fromkeys('CGJKQSXZ', '2'),
+    **dict.fromkeys('DT', '3'), 'L': '4', **dict.fromkeys('MN', '5'),
+    'R': '6',
+}
+
+
+def _ascii(value):
+    value = unicodedata.normalize('NFKD', value or '')
+    return ''.join(c for c in value if c.isascii() and c.isalpha()).upper()
+
+
+def soundex(name):
+    """Get the American Soundex code of a name, like 'R163' for
+    Robert and Rupert. Diacritics are dropped, '' for empty names.
+    """
+    letters = _ascii(name)
+    if not letters:
+        return ''
+    code = letters[0]
+    previous = SOUNDEX_CODES.get(letters[0])
+    for letter in letters[1:]:
+        digit = SOUNDEX_CODES.get(letter)
+        if digit and digit != previous:
+            code += digit
+        # H and W do not separate letters with the same code.
+        if letter not in 'HW':
+            previous = digit
+        if len(code) == 4:
+            break
+    return code.ljust(4, '0')
+
+
+def name_key(person):
+    """Get the phonetic first and last name of a person."""
+    return soundex(person['first_name']), soundex(person['last_name'])
+
+
+def blocking_keys(person):
+    """Get the sub-blocks a person is put into when the block of its
+    name is too large: close birth years and the country of birth.
+    Persons lacking either also share a sub-block by name alone.
+    """
+    keys = []
+    if person['birth_date']:
+        year = person['birth_date'].year
+        # Two overlapping 5 year buckets, so that close years
+        # always share one of them.
+        keys += [('y', year // 5), ('z', (year + 2) // 5)]
+    if person['birth_country']:
+        keys.append(('c', person['birth_country']))
+    if not person['birth_date'] or not person['birth_country']:
+        keys.append(('-',))
+    return keys
+
+
+def _name(person):
+    return f"{_ascii(person['first_name'])} {_ascii(person['last_name'])}"
+
+
+def score(a, b):
+    """Rate how likely two persons are the same, from 0 to 1."""
+    total = SequenceMatcher(None, _name(a), _name(b)).ratio() * 0.5
+    weight = 0.5
+
+    if a['birth_date'] and b['birth_date']:
+        weight += 0.3
+        years = abs(a['birth_date'].year - b['birth_date'].year)
+        if a['birth_date'] == b['birth_date']:
+            total += 0.3
+        elif years <= 2:
+            total += 0.3 * (1 - years / 3) * 0.8
+
+    for field, share in (('birth_country', 0.1), ('birth_place', 0.05),
+                         ('nickname', 0.05)):
+        if a[field] and b[field]:
+            weight += share
+            if a[field].strip().lower() == b[field].strip().lower():
+                total += share
+
+    if a['death_date'] and b['death_date']:
+        weight += 0.1
+        if a['death_date'] == b['death_date']:
+            total += 0.1
+    return round(total / weight, 3)
+
+
+def _pairs(block, split):
+    if len(block) <= MAX_BLOCK:
+        yield from combinations(block, 2)
+        return
+    if split:
+        sub_blocks = defaultdict(list)
+        for person in block:
+            for key in blocking_keys(person):
+                sub_blocks[key].append(person)
+        for sub_block in sub_blocks.values():
+            yield from _pairs(sub_block, split=False)
+        return
+    block = sorted(block, key=lambda p: (p['birth_date'] is None,
+                                         p['birth_date'], p['id']))
+    for i, person in enumerate(block):
+        for other in block[i + 1:i + 1 + WINDOW]:
+            yield person, other
+
+
+def candidate_pairs(block):
+    """Yield the pairs of a name block that are worth scoring.
+    Small blocks are compared completely, large ones are split
+    by blocking_keys first.
+    """
+    return _pairs(block, split=True)
+
+
+def find_duplicates(owner_id, threshold=THRESHOLD, limit=None):
+    """Find likely duplicate persons in the family tree of an owner.
+    Persons are read once, grouped into blocks by phonetic name and
+    only compared within their blocks.
+    Return (score, id, id) tuples, best first.
+    """
+    blocks = defaultdict(list)
+    rows = Person.objects.filter(
+        owner_id=owner_id
+        ).order_by('id').values_list(*FIELDS)
+    for row in rows.iterator(chunk_size=CHUNK_SIZE):
+        person = dict(zip(FIELDS, row))
+        blocks[name_key(person)].append(person)
+
+    seen = set()
+    candidates = []
+    for block in blocks.values():
+        for a, b in candidate_pairs(block):
+            pair = (min(a['id'], b['id']), max(a['id'], b['id']))
+            if pair in seen:
+                continue
+            seen.add(pair)
+            rating = score(a, b)
+            if rating >= threshold:
+                candidates.append((rating, *pair))
+
+    rank = (lambda c: (-c[0], c[1], c[2]))
+    if limit is not None:
+        return heapq.nsmallest(limit, candidates, key=rank)
+    return sorted(candidates, key=rank)
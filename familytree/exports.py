@@ -0,0 +1,173 @@
+import json
+import struct
+from datetime import date
+from .models import Person, FamilyRelation
+
+ParentLink = Person.parents.through
+PartnerLink = Person.partners.through
+
+CHUNK_SIZE = 2000
+
+NODE_FIELDS = (
+    'id', 'first_name', 'last_name', 'nickname',
+    'birth_date', 'death_date', 'featured_image',
+)
+
+# Edge kinds of the binary encoding, relation types follow the
+# order of FamilyRelation.RELATIONSHIP_CHOICES after the first two.
+EDGE_KINDS = ['parent', 'partner'] + [
+    f'relation:{value}' for value, _ in FamilyRelation.RELATIONSHIP_CHOICES
+]
+
+MAGIC = b'YGG1'
+NODE = struct.Struct('<cqii')
+EDGE = struct.Struct('<cBqq')
+TEXT = struct.Struct('<H')
+
+
+def nodes(owner_id):
+    """Yield the card fields of every person of an owner as dicts."""
+    rows = Person.objects.filter(
+        owner_id=owner_id
+        ).order_by('id').values_list(*NODE_FIELDS)
+    for row in rows.iterator(chunk_size=CHUNK_SIZE):
+        node = dict(zip(NODE_FIELDS, row))
+        image = node['featured_image']
+        node['featured_image'] = (
+            None if not image or 'placeholder' in str(image) else str(image)
+        )
+        yield node
+
+
+def edges(owner_id):
+    """Yield (kind, source_id, target_id) for every edge of an owner.
+    Parent edges point from parent to child, each partnership is
+    yielded once and relations carry their relation type in the kind.
+    """
+    parents = ParentLink.objects.filter(
+        from_person__owner_id=owner_id
+        ).order_by('pk').values_list('to_person_id', 'from_person_id')
+    for parent_id, child_id in parents.iterator(chunk_size=CHUNK_SIZE):
+        yield 'parent', parent_id, child_id
+
+    partners = PartnerLink.objects.filter(
+        from_person__owner_id=owner_id
+        ).order_by('pk').values_list('from_person_id', 'to_person_id')
+    for a, b in partners.iterator(chunk_size=CHUNK_SIZE):
+        if a < b:
+            yield 'partner', a, b
+
+    relations = FamilyRelation.objects.filter(
+        from_person__owner_id=owner_id
+        ).order_by('pk').values_list(
+            'relation_type', 'from_person_id', 'to_person_id')
+    for relation_type, a, b in relations.iterator(chunk_size=CHUNK_SIZE):
+        yield f'relation:{relation_type}', a, b
+
+
+def _batched(parts, size=500):
+    batch = []
+    for part in parts:
+        batch.append(part)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def graph_json(owner_id):
+    """Stream the graph of an owner as a JSON document
+    {"nodes": [...], "edges": [...]} in text chunks.
+    """
+    yield '{"nodes":['
+    first = True
+    node_json = (
+        json.dumps(node, default=str, separators=(',', ':'))
+        for node in nodes(owner_id)
+    )
+    for batch in _batched(node_json):
+        yield ('' if first else ',') + ','.join(batch)
+        first = False
+
+    yield '],"edges":['
+    first = True
+    edge_json = (
+        json.dumps({'kind': kind, 'source': source, 'target': target},
+                   separators=(',', ':'))
+        for kind, source, target in edges(owner_id)
+    )
+    for batch in _batched(edge_json):
+        yield ('' if first else ',') + ','.join(batch)
+        first = False
+    yield ']}'
+
+
+def _text(value):
+    data = (value or '').encode('utf-8')[:0xFFFF]
+    return TEXT.pack(len(data)) + data
+
+
+def graph_binary(owner_id):
+    """Stream the graph of an owner in the compact binary encoding.
+
+    After the MAGIC header follow tagged little-endian records:
+    b'N' node: int64 id, int32 birth and death date ordinals (0 if
+    unknown), then first name, last name, nickname and image id as
+    uint16 length prefixed UTF-8. b'E' edge: uint8 index into
+    EDGE_KINDS, int64 source and target ids. b'Z' ends the stream.
+    """
+    yield MAGIC
+    for batch in _batched(nodes(owner_id)):
+        yield b''.join(
+            NODE.pack(
+                b'N', node['id'],
+                node['birth_date'].toordinal() if node['birth_date'] else 0,
+                node['death_date'].toordinal() if node['death_date'] else 0,
+            )
+            + _text(node['first_name']) + _text(node['last_name'])
+            + _text(node['nickname']) + _text(node['featured_image'])
+            for node in batch
+        )
+    kinds = {kind: i for i, kind in enumerate(EDGE_KINDS)}
+    for batch in _batched(edges(owner_id)):
+        yield b''.join(
+            EDGE.pack(b'E', kinds[kind], source, target)
+            for kind, source, target in batch
+        )
+    yield b'Z'
+
+
+def read_binary(data):
+    """Decode the binary encoding into a {"nodes", "edges"} dict."""
+    if data[:len(MAGIC)] != MAGIC:
+        raise ValueError("Not a Yggdrasil graph stream.")
+    graph = {'nodes': [], 'edges': []}
+    offset = len(MAGIC)
+    while data[offset:offset + 1] != b'Z':
+        if data[offset:offset + 1] == b'E':
+            _, kind, source, target = EDGE.unpack_from(data, offset)
+            offset += EDGE.size
+            graph['edges'].append({
+                'kind': EDGE_KINDS[kind], 'source': source, 'target': target
+            })
+            continue
+
+        _, person_id, birth, death = NODE.unpack_from(data, offset)
+        offset += NODE.size
+        texts = []
+        for _ in range(4):
+            (length,) = TEXT.unpack_from(data, offset)
+            offset += TEXT.size
+            texts.append(data[offset:offset + length].decode('utf-8'))
+            offset += length
+        graph['nodes'].append({
+            'id': person_id,
+            'first_name': texts[0],
+            'last_name': texts[1],
+            'nickname': texts[2],
+            'birth_date': date.fromordinal(birth) if birth else None,
+            'death_date': date.fromordinal(death) if death else None,
+            'featured_image': texts[3] or None,
+        })
+    return graph
@@ -3,7 +3,7 @@ from .models import Person, FamilyRelation
 from datetime import date
 from django_select2.forms import Select2MultipleWidget
 from django.core.exceptions import ValidationError
-from PIL import Image
+from . import images
 import re
 
 
@@ -55,9 +55,10 @@ class PersonForm(forms.ModelForm):
         for name, field in self.fields.items():
             if name != 'language':
                 field.widget.attrs['class'] = 'form-control'
-        self.fields[
-            'featured_image'
-            ].widget.attrs['class'] = 'form-control-file'
+        if 'featured_image' in self.fields:
+            self.fields[
+                'featured_image'
+                ].widget.attrs['class'] = 'form-control-file'
 
     def clean(self):
         """Clean the form data before saving."""
@@ -81,18 +82,42 @@ class PersonForm(forms.ModelForm):
             return None
 
         try:
-            img = Image.open(image)
-            img.verify()
-        except Exception:
-            raise ValidationError("Uploaded file is not a valid image.")
+            image_format, _, _ = images.inspect(image)
+        except ValueError as error:
+            raise ValidationError(str(error))
+        finally:
+            image.seek(0)
 
-        allowed_types = ['jpeg', 'png', 'jpg', 'webp']
-        if img.format.lower() not in allowed_types:
+        allowed_types = images.ALLOWED_FORMATS
+        if image_format not in allowed_types:
             raise ValidationError(
                 f"Only {', '.join(allowed_types)} images are allowed.")
 
+        self.image_digest = images.content_hash(image)
+
         return image
 
+    def save(self, commit=True):
+        """Save the person without waiting for the image upload.
+        An image that was stored before is reused right away. A new
+        image is staged and stored by a background task once the person
+        is saved, until then the previous image stays in place.
+        """
+        upload = self.cleaned_data.get('featured_image')
+        if upload and hasattr(upload, 'chunks'):
+            asset = images.find_asset(
+                self.instance.owner_id, self.image_digest)
+            if asset:
+                self.instance.featured_image = asset
+                self.instance.image_status = Person.IMAGE_READY
+            else:
+                self.instance.featured_image = (
+                    self.initial.get('featured_image') or images.PLACEHOLDER)
+                self.instance.image_status = Person.IMAGE_PENDING
+                self.instance._staged_image = (
+                    images.stage(upload), self.image_digest)
+        return super().save(commit)
+
     def clean_birth_date(self):
         """"Validate the birth date."""
         birth_date = self.cleaned_data.get('birth_date')
@@ -143,6 +168,20 @@ class PersonForm(forms.ModelForm):
         return validate_name_field(nickname, "Nickname")
 
 
+class BatchPersonForm(PersonForm):
+    """One row of the form to add several relatives at once.
+    Photos are added later on the edit page of each person."""
+    class Meta(PersonForm.Meta):
+        fields = (
+            'first_name', 'last_name', 'nickname', 'birth_date',
+            'birth_place', 'birth_country', 'death_date',
+        )
+
+
+BatchPersonFormSet = forms.formset_factory(
+    BatchPersonForm, extra=5, max_num=50, validate_max=True)
+
+
 class FamilyRelationForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         relation_context = kwargs.pop('relation_context', None)
@@ -185,3 +224,38 @@ class FamilyRelationForm(forms.ModelForm):
         help_texts = {
             'relation_type': 'Select the relation type.',
         }
+
+
+class GedcomUploadForm(forms.Form):
+    """Form to upload a GEDCOM file for import."""
+    gedcom_file = forms.FileField(
+        label='GEDCOM file (.ged)',
+        widget=forms.FileInput(attrs={'class': 'form-control-file'}),
+    )
+
+    def clean_gedcom_file(self):
+        """Validate the uploaded file looks like a GEDCOM file."""
+        upload = self.cleaned_data.get('gedcom_file')
+        if not upload.name.lower().endswith('.ged'):
+            raise ValidationError("Please upload a .ged file.")
+        head = upload.read(64).removeprefix(b'\xef\xbb\xbf')
+        upload.seek(0)
+        if not head.startswith(b'0 HEAD'):
+            raise ValidationError("This is not a valid GEDCOM file.")
+        return upload
+
+
+class MergePersonForm(forms.Form):
+    """Form to pick the duplicate that is merged into a person."""
+    duplicate = forms.ModelChoiceField(
+        queryset=Person.objects.none(),
+        label='Duplicate to merge into this person',
+        widget=forms.Select(attrs={'class': 'form-control'}),
+    )
+
+    def __init__(self, *args, person=None, **kwargs):
+        """Offer the other persons of the same owner."""
+        super().__init__(*args, **kwargs)
+        self.fields['duplicate'].queryset = Person.objects.filter(
+            owner_id=person.owner_id
+            ).exclude(pk=person.pk).order_by('last_name', 'first_name')
@@ -0,0 +1,102 @@
+import hashlib
+import os
+from functools import lru_cache, wraps
+from django.conf import settings
+from django.contrib import messages
+from django.template.utils import get_app_template_dirs
+from django.db.models import F
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+from .models import FamilyTree
+
+
+def touch(owner_id):
+    """Mark the family tree of an owner as changed."""
+    FamilyTree.objects.filter(owner_id=owner_id).update(
+        version=F('version') + 1, modified_at=timezone.now())
+
+
+@lru_cache(maxsize=None)
+def _files_token():
+    """Hash the names and modification times of the template and
+    static files, read once per process."""
+    dirs = [
+        *(d for engine in settings.TEMPLATES for d in engine['DIRS']),
+        *get_app_template_dirs('templates'),
+        *getattr(settings, 'STATICFILES_DIRS', ()),
+    ]
+    digest = hashlib.md5()
+    for directory in sorted(map(str, dirs)):
+        for root, _, files in sorted(os.walk(directory)):
+            for name in sorted(files):
+                path = os.path.join(root, name)
+                digest.update(f"{path}:{os.stat(path).st_mtime_ns}".encode())
+    return digest.hexdigest()[:12]
+
+
+def release():
+    """Token of the deployed code, FAMILYTREE_RELEASE if set at deploy
+    time, else derived from the template and static files. It is part
+    of every ETag, so pages kept by browsers are not reused after a
+    deploy changed how they look.
+    """
+    return getattr(settings, 'FAMILYTREE_RELEASE', '') or _files_token()
+
+
+def tree_state(request):
+    """Get (tree id, version, modified_at, main_person_id) of the tree
+    of the user, read once per request, or None without tree.
+    """
+    if not hasattr(request, '_familytree_state'):
+        request._familytree_state = FamilyTree.objects.filter(
+            owner_id=request.user.pk
+            ).values_list(
+                'pk', 'version', 'modified_at', 'main_person_id').first()
+    return request._familytree_state
+
+
+def _state(request):
+    """Get the tree state for conditional answers. None with pending
+    messages, which a cached page would not show.
+    """
+    if len(messages.get_messages(request)):
+        return None
+    return tree_state(request)
+
+
+def tree_etag(request, *args, **kwargs):
+    """ETag of a tree page, it changes with every change to the tree
+    and with every deploy. The CSRF secret is part of it, so pages with
+    stale tokens are not reused after a new login.
+    """
+    state = _state(request)
+    if state is None:
+        return None
+    tree_id, version = state[:2]
+    session = hashlib.md5(
+        f"{request.user.pk}:{request.META.get('CSRF_COOKIE', '')}".encode()
+        ).hexdigest()[:12]
+    return f'"tree-{tree_id}-{version}-{session}-{release()}"'
+
+
+def tree_last_modified(request, *args, **kwargs):
+    """Last modification of the tree of the user."""
+    state = _state(request)
+    return state and state[2]
+
+
+def tree_condition(view):
+    """Answer If-None-Match and If-Modified-Since of a tree page with
+    304 before the view runs any of its queries. Browsers are told to
+    revalidate every time instead of guessing a freshness lifetime.
+    """
+    conditional = condition(
+        etag_func=tree_etag, last_modified_func=tree_last_modified)(view)
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        response = conditional(request, *args, **kwargs)
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+    return wrapper
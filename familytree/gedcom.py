@@ -0,0 +1,397 @@
+import os
+import re
+import tempfile
+from datetime import date
+from django.contrib.auth.models import User
+from django.db import models, transaction
+from .models import Person, FamilyTree, FamilyRelation
+from .signals import tree_bulk_changed
+
+ParentLink = Person.parents.through
+PartnerLink = Person.partners.through
+TreeMember = FamilyTree.person.through
+
+BATCH_SIZE = 1000
+CHUNK_SIZE = 2000
+VERSIONS = ('5.5.1', '7.0')
+# GEDCOM 5.5.1 limits a line to 255 characters, longer values are
+# split over CONC lines. GEDCOM 7 has no line limit and no CONC.
+MAX_VALUE_LENGTH = 200
+
+LINE = re.compile(r'^\s*(\d+)\s+(?:(@[^@]+@)\s+)?(\S+)(?: (.*))?$')
+NAME = re.compile(r'^([^/]*)/([^/]*)/?(.*)$')
+DATE = re.compile(r'^(\d{1,2})\s+([A-Z]{3})\s+(\d{1,4})$')
+MONTH_NAMES = [
+    'JAN', 'FEB', 'MAR', 'APR', 'MAY', 'JUN',
+    'JUL', 'AUG', 'SEP', 'OCT', 'NOV', 'DEC',
+]
+MONTHS = {month: number for number, month in enumerate(MONTH_NAMES, 1)}
+
+
+class Record:
+    """A GEDCOM line together with its nested lines."""
+    __slots__ = ('tag', 'xref', 'value', 'children')
+
+    def __init__(self, tag, xref=None, value=''):
+        self.tag = tag
+        self.xref = xref
+        self.value = value
+        self.children = []
+
+    def find(self, *path):
+        """Get the first nested record following the tags in path."""
+        record = self
+        for tag in path:
+            record = next(
+                (child for child in record.children if child.tag == tag),
+                None)
+            if record is None:
+                return None
+        return record
+
+    def value_of(self, *path):
+        """Get the value of the first nested record following path."""
+        record = self.find(*path)
+        return record.value.strip() if record else ''
+
+    def all(self, tag):
+        """Get all direct children with the given tag."""
+        return [child for child in self.children if child.tag == tag]
+
+
+def parse(lines):
+    """Yield the level 0 records of a GEDCOM stream one at a time,
+    so a file is never held in memory as a whole.
+    CONC and CONT lines are merged into the value they continue.
+    """
+    stack = []
+    for raw in lines:
+        match = LINE.match(raw.rstrip('\r\n'))
+        if not match:
+            continue
+        level = int(match[1])
+        record = Record(match[3].upper(), match[2], match[4] or '')
+        if level == 0:
+            if stack:
+                yield stack[0]
+            stack = [record]
+            continue
+        if level > len(stack):
+            continue
+        del stack[level:]
+        if record.tag in ('CONC', 'CONT'):
+            separator = '\n' if record.tag == 'CONT' else ''
+            stack[-1].value += separator + record.value
+            continue
+        stack[-1].children.append(record)
+        stack.append(record)
+    if stack:
+        yield stack[0]
+
+
+def parse_date(value):
+    """Convert an exact GEDCOM date like '2 JAN 1950' to a date.
+    Approximate or partial dates cannot be stored and give None.
+    """
+    match = DATE.match(value.upper())
+    if not match or match[2] not in MONTHS:
+        return None
+    try:
+        return date(int(match[3]), MONTHS[match[2]], int(match[1]))
+    except ValueError:
+        return None
+
+
+def person_fields(record):
+    """Map an INDI record to Person field values."""
+    given, surname = '', ''
+    name = record.find('NAME')
+    if name:
+        match = NAME.match(name.value)
+        if match:
+            given = f"{match[1]} {match[3]}".strip()
+            surname = match[2].strip()
+        else:
+            given = name.value.strip()
+        given = name.value_of('GIVN') or given
+        surname = name.value_of('SURN') or surname
+
+    fields = {
+        'first_name': (given or "Unknown")[:100],
+        'last_name': surname[:100],
+        'nickname': (
+            (name.value_of('NICK') if name else '')
+            or record.value_of('NICK'))[:100],
+        'birth_date': parse_date(record.value_of('BIRT', 'DATE')),
+        'birth_place': record.value_of('BIRT', 'PLAC')[:100],
+        'death_date': parse_date(record.value_of('DEAT', 'DATE')),
+        'occupation': record.value_of('OCCU')[:100],
+    }
+    note = record.value_of('NOTE')
+    if note and not note.startswith('@'):
+        fields['bio'] = note
+    return fields
+
+
+def _save_persons(tree, pending, person_ids):
+    with transaction.atomic():
+        Person.objects.bulk_create([person for _, person in pending])
+        TreeMember.objects.bulk_create([
+            TreeMember(familytree_id=tree.pk, person_id=person.pk)
+            for _, person in pending
+        ])
+    for xref, person in pending:
+        person_ids[xref] = person.pk
+
+
+def _save_families(families, person_ids):
+    parent_links, partner_links, relations = [], [], []
+    for husband, wife, children, divorced in families:
+        parents = [
+            person_ids[xref] for xref in (husband, wife)
+            if xref in person_ids
+        ]
+        if len(parents) == 2:
+            a, b = parents
+            partner_links += [
+                PartnerLink(from_person_id=a, to_person_id=b),
+                PartnerLink(from_person_id=b, to_person_id=a),
+            ]
+            relations.append(FamilyRelation(
+                from_person_id=a, to_person_id=b,
+                relation_type='ex-partner' if divorced else 'partner'))
+        for xref in children:
+            child = person_ids.get(xref)
+            if child is None:
+                continue
+            for parent in parents:
+                parent_links.append(
+                    ParentLink(from_person_id=child, to_person_id=parent))
+                relations.append(FamilyRelation(
+                    from_person_id=parent, to_person_id=child,
+                    relation_type='parent'))
+
+    with transaction.atomic():
+        for model, rows in ((ParentLink, parent_links),
+                            (PartnerLink, partner_links),
+                            (FamilyRelation, relations)):
+            model.objects.bulk_create(
+                rows, batch_size=BATCH_SIZE, ignore_conflicts=True)
+
+
+def import_gedcom(lines, owner, batch_size=BATCH_SIZE):
+    """Import a GEDCOM stream into the family tree of owner.
+    Persons are inserted in batches with one transaction per batch,
+    families are resolved once every individual is known.
+    Return the number of imported persons and families.
+    """
+    tree, _ = FamilyTree.objects.get_or_create(owner=owner)
+    person_ids = {}
+    families = []
+    pending = []
+    for record in parse(lines):
+        if record.tag == 'INDI':
+            person = Person(owner=owner, **person_fields(record))
+            pending.append((record.xref, person))
+            if len(pending) >= batch_size:
+                _save_persons(tree, pending, person_ids)
+                pending = []
+        elif record.tag == 'FAM':
+            families.append((
+                record.value_of('HUSB'),
+                record.value_of('WIFE'),
+                [child.value.strip() for child in record.all('CHIL')],
+                record.find('DIV') is not None,
+            ))
+    if pending:
+        _save_persons(tree, pending, person_ids)
+
+    for start in range(0, len(families), batch_size):
+        _save_families(families[start:start + batch_size], person_ids)
+
+    if tree.main_person_id is None and person_ids:
+        tree.main_person_id = next(iter(person_ids.values()))
+        tree.save(update_fields=['main_person'])
+
+    tree_bulk_changed.send(
+        sender=Person, owner_id=owner.pk,
+        person_ids=list(person_ids.values()))
+    return len(person_ids), len(families)
+
+
+def stage_upload(upload):
+    """Copy an uploaded GEDCOM file to a temporary file and return
+    its path, so it can be imported after the request has finished.
+    """
+    with tempfile.NamedTemporaryFile(
+            suffix='.ged', delete=False) as staged:
+        for chunk in upload.chunks():
+            staged.write(chunk)
+    return staged.name
+
+
+def import_file(path, owner_id, batch_size=BATCH_SIZE):
+    """Import a staged GEDCOM file and remove it afterwards."""
+    try:
+        owner = User.objects.get(pk=owner_id)
+        with open(path, encoding='utf-8-sig', errors='replace') as lines:
+            return import_gedcom(lines, owner, batch_size)
+    finally:
+        os.remove(path)
+
+
+def family_units(owner_id):
+    """Derive the families of an owner in one pass over the through
+    tables: children sharing the same set of parents form one family,
+    partners without children form a family of their own.
+    Return a list of (parent_ids, child_ids, divorced) tuples.
+    """
+    links = ParentLink.objects.filter(
+        from_person__owner_id=owner_id
+        ).order_by('from_person_id', 'to_person_id').values_list(
+            'from_person_id', 'to_person_id')
+    families = {}
+    child, parents = None, []
+    for child_id, parent_id in links.iterator(chunk_size=CHUNK_SIZE):
+        if child_id != child:
+            if parents:
+                families.setdefault(tuple(parents), []).append(child)
+            child, parents = child_id, []
+        parents.append(parent_id)
+    if parents:
+        families.setdefault(tuple(parents), []).append(child)
+
+    partners = PartnerLink.objects.filter(
+        from_person__owner_id=owner_id,
+        from_person_id__lt=models.F('to_person_id'),
+        ).order_by('from_person_id', 'to_person_id').values_list(
+            'from_person_id', 'to_person_id')
+    for pair in partners.iterator(chunk_size=CHUNK_SIZE):
+        families.setdefault(pair, [])
+
+    divorced = {
+        tuple(sorted(pair)) for pair in FamilyRelation.objects.filter(
+            from_person__owner_id=owner_id, relation_type='ex-partner'
+            ).values_list('from_person_id', 'to_person_id')
+    }
+    return [
+        (parents, children, parents in divorced)
+        for parents, children in families.items()
+    ]
+
+
+def _date(value):
+    return f"{value.day} {MONTH_NAMES[value.month - 1]} {value.year}"
+
+
+def _split(line):
+    """Split a line into values of at most MAX_VALUE_LENGTH characters.
+    Splits fall between two non-space characters where possible, as
+    readers may strip spaces around CONC values.
+    """
+    parts = []
+    while len(line) > MAX_VALUE_LENGTH:
+        cut = MAX_VALUE_LENGTH
+        while cut and (line[cut - 1].isspace() or line[cut].isspace()):
+            cut -= 1
+        cut = cut or MAX_VALUE_LENGTH
+        parts.append(line[:cut])
+        line = line[cut:]
+    parts.append(line)
+    return parts
+
+
+def _text_lines(level, tag, text, version):
+    """Encode a possibly multi-line value as GEDCOM lines."""
+    lines = []
+    for i, line in enumerate(text.split('\n')):
+        parts = _split(line) if version == '5.5.1' else [line]
+        for j, part in enumerate(parts):
+            if i == 0 and j == 0:
+                lines.append(f"{level} {tag} {part}")
+            else:
+                continuation = 'CONC' if j else 'CONT'
+                lines.append(f"{level + 1} {continuation} {part}")
+        lines[-1] = lines[-1].rstrip()
+    return lines
+
+
+def export_gedcom(owner_id, version='5.5.1'):
+    """Yield the family tree of an owner as GEDCOM text chunks.
+    Persons are read through a server-side cursor and written one
+    record at a time, only the family structure is kept in memory.
+    Partners are written as HUSB and WIFE in the order of their ids,
+    as persons carry no sex. A FAM record holds two parents, further
+    parents get FAM records of their own with the same children.
+    """
+    if version not in VERSIONS:
+        raise ValueError(f"GEDCOM version must be one of {VERSIONS}.")
+
+    families = [
+        (parents[start:start + 2], children, divorced)
+        for parents, children, divorced in family_units(owner_id)
+        for start in range(0, max(len(parents), 1), 2)
+    ]
+    spouse_of, child_of = {}, {}
+    for number, (parents, children, _) in enumerate(families, 1):
+        for parent in parents:
+            spouse_of.setdefault(parent, []).append(number)
+        for child in children:
+            child_of.setdefault(child, []).append(number)
+
+    header = ["0 HEAD", "1 GEDC", f"2 VERS {version}"]
+    if version == '5.5.1':
+        header += ["2 FORM LINEAGE-LINKED", "1 CHAR UTF-8"]
+    header += ["1 SOUR YGGDRASIL"]
+    yield "\n".join(header) + "\n"
+
+    persons = Person.objects.filter(owner_id=owner_id).order_by('id')
+    fields = (
+        'id', 'first_name', 'last_name', 'nickname', 'birth_date',
+        'birth_place', 'death_date', 'occupation', 'bio',
+    )
+    batch = []
+    for row in persons.values_list(*fields).iterator(chunk_size=CHUNK_SIZE):
+        person = dict(zip(fields, row))
+        lines = [
+            f"0 @I{person['id']}@ INDI",
+            f"1 NAME {person['first_name']} /{person['last_name']}/",
+        ]
+        if person['nickname']:
+            lines.append(f"2 NICK {person['nickname']}")
+        if person['birth_date'] or person['birth_place']:
+            lines.append("1 BIRT")
+            if person['birth_date']:
+                lines.append(f"2 DATE {_date(person['birth_date'])}")
+            if person['birth_place']:
+                lines.append(f"2 PLAC {person['birth_place']}")
+        if person['death_date']:
+            lines += ["1 DEAT", f"2 DATE {_date(person['death_date'])}"]
+        if person['occupation']:
+            lines.append(f"1 OCCU {person['occupation']}")
+        if person['bio']:
+            lines += _text_lines(1, 'NOTE', person['bio'], version)
+        lines += [f"1 FAMS @F{n}@" for n in spouse_of.get(person['id'], ())]
+        lines += [f"1 FAMC @F{n}@" for n in child_of.get(person['id'], ())]
+        batch.append("\n".join(lines))
+        if len(batch) >= 500:
+            yield "\n".join(batch) + "\n"
+            batch = []
+    if batch:
+        yield "\n".join(batch) + "\n"
+
+    batch = []
+    for number, (parents, children, divorced) in enumerate(families, 1):
+        lines = [f"0 @F{number}@ FAM"]
+        for tag, parent in zip(('HUSB', 'WIFE'), parents):
+            lines.append(f"1 {tag} @I{parent}@")
+        lines += [f"1 CHIL @I{child}@" for child in children]
+        if divorced:
+            lines.append("1 DIV Y")
+        batch.append("\n".join(lines))
+        if len(batch) >= 500:
+            yield "\n".join(batch) + "\n"
+            batch = []
+    if batch:
+        yield "\n".join(batch) + "\n"
+    yield "0 TRLR\n"
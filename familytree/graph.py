@@ -0,0 +1,190 @@
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from threading import Lock
+from django.conf import settings
+from .models import Person, FamilyTree
+
+ParentLink = Person.parents.through
+PartnerLink = Person.partners.through
+
+
+def _csr(size, pairs):
+    """Pack (row, column) index pairs into CSR offset and column arrays."""
+    counts = [0] * (size + 1)
+    for row, _ in pairs:
+        counts[row + 1] += 1
+    for i in range(size):
+        counts[i + 1] += counts[i]
+    offsets = array('l', counts)
+    columns = array('l', bytes(len(pairs) * offsets.itemsize))
+    cursor = list(counts[:-1])
+    for row, column in pairs:
+        columns[cursor[row]] = column
+        cursor[row] += 1
+    return offsets, columns
+
+
+class FamilyGraph:
+    """Compact adjacency snapshot of the persons of one owner.
+    Person ids are stored sorted, the position in that array is the
+    index used by the CSR arrays for parents, children and partners.
+    """
+
+    def __init__(self, ids, parent_pairs, partner_pairs):
+        self.ids = array('q', ids)
+        position = {person_id: i for i, person_id in enumerate(self.ids)}
+        parents = [
+            (position[child], position[parent])
+            for child, parent in parent_pairs
+            if child in position and parent in position
+        ]
+        partners = [
+            (position[a], position[b])
+            for a, b in partner_pairs
+            if a in position and b in position
+        ]
+        size = len(self.ids)
+        self._parents = _csr(size, parents)
+        self._children = _csr(size, [(p, c) for c, p in parents])
+        self._partners = _csr(size, partners)
+
+    @classmethod
+    def build(cls, owner_id):
+        """Load the graph of an owner with three values_list queries."""
+        persons = Person.objects.filter(owner_id=owner_id)
+        ids = sorted(persons.values_list('id', flat=True))
+        parent_pairs = ParentLink.objects.filter(
+            from_person__owner_id=owner_id
+            ).values_list('from_person_id', 'to_person_id')
+        partner_pairs = PartnerLink.objects.filter(
+            from_person__owner_id=owner_id
+            ).values_list('from_person_id', 'to_person_id')
+        return cls(ids, list(parent_pairs), list(partner_pairs))
+
+    def __contains__(self, person_id):
+        return self._index(person_id) is not None
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def nbytes(self):
+        """Approximate memory used by the arrays of this snapshot."""
+        arrays = [self.ids]
+        for offsets, columns in (self._parents, self._children,
+                                 self._partners):
+            arrays += [offsets, columns]
+        return sum(a.itemsize * len(a) for a in arrays)
+
+    def _index(self, person_id):
+        i = bisect_left(self.ids, person_id)
+        if i < len(self.ids) and self.ids[i] == person_id:
+            return i
+        return None
+
+    def _neighbours(self, csr, person_id):
+        i = self._index(person_id)
+        if i is None:
+            return ()
+        offsets, columns = csr
+        return tuple(
+            self.ids[j] for j in columns[offsets[i]:offsets[i + 1]]
+        )
+
+    def parents(self, person_id):
+        """Get the ids of the parents of a person."""
+        return self._neighbours(self._parents, person_id)
+
+    def children(self, person_id):
+        """Get the ids of the children of a person."""
+        return self._neighbours(self._children, person_id)
+
+    def partners(self, person_id):
+        """Get the ids of the partners of a person."""
+        return self._neighbours(self._partners, person_id)
+
+    def siblings(self, person_id):
+        """Get the ids of everyone sharing at least one parent.
+        Exclude the person itself from the result.
+        """
+        siblings = {
+            sibling
+            for parent in self.parents(person_id)
+            for sibling in self.children(parent)
+        }
+        siblings.discard(person_id)
+        return tuple(sorted(siblings))
+
+
+class GraphCache:
+    """Per-worker LRU cache of FamilyGraph snapshots keyed by owner.
+    Snapshots are stamped with FamilyTree.version, which every write to
+    the tree raises in the database, so a write handled by one worker
+    retires the snapshots of all workers.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, owner_id):
+        """Get the graph of an owner, building it on a miss."""
+        version = FamilyTree.objects.filter(
+            owner_id=owner_id).values_list('version', flat=True).first()
+        with self._lock:
+            entry = self._entries.get(owner_id)
+            if entry and entry[0] == version:
+                self._entries.move_to_end(owner_id)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        graph = FamilyGraph.build(owner_id)
+        with self._lock:
+            self._discard(owner_id)
+            if graph.nbytes <= self.max_bytes:
+                self._entries[owner_id] = (version, graph)
+                self.size += graph.nbytes
+                while self.size > self.max_bytes:
+                    self._discard(next(iter(self._entries)))
+                    self.evictions += 1
+        return graph
+
+    def invalidate(self, owner_id):
+        """Drop the graph of an owner held by this worker. Other workers
+        rebuild theirs once they see the new tree version.
+        """
+        with self._lock:
+            self._discard(owner_id)
+
+    def clear(self):
+        """Drop all graphs held by this worker and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.size = self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        """Get the counters of this worker's cache."""
+        return {
+            'entries': len(self._entries),
+            'bytes': self.size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+    def _discard(self, owner_id):
+        entry = self._entries.pop(owner_id, None)
+        if entry:
+            self.size -= entry[1].nbytes
+
+
+graph_cache = GraphCache(
+    getattr(settings, 'FAMILYTREE_GRAPH_CACHE_BYTES', 32 * 1024 * 1024)
+)
@@ -0,0 +1,276 @@
+import logging
+import os
+import shutil
+import tempfile
+import uuid
+import hashlib
+import cloudinary.uploader
+from PIL import Image, ImageOps, features
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+from .models import Person, ImageAsset
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BACKEND = 'familytree.images.CloudinaryBackend'
+PLACEHOLDER = 'placeholder'
+ALLOWED_FORMATS = ['jpeg', 'png', 'jpg', 'webp']
+
+# Cards show images at 100px, the larger widths serve dense displays.
+CARD_WIDTHS = (100, 200, 300)
+CARD_TRANSFORMATION = {
+    'crop': 'fill', 'gravity': 'auto',
+    'quality': 'auto', 'fetch_format': 'auto',
+}
+CARD_URL_TIMEOUT = 24 * 60 * 60
+
+
+def max_pixels():
+    """Largest number of pixels an upload may have."""
+    return getattr(settings, 'FAMILYTREE_IMAGE_MAX_PIXELS', 40_000_000)
+
+
+def max_side():
+    """Longest side of a stored image, larger ones are downscaled."""
+    return getattr(settings, 'FAMILYTREE_IMAGE_MAX_SIDE', 1200)
+
+
+class CloudinaryBackend:
+    """Store images on Cloudinary, the production backend."""
+
+    def __init__(self, folder='familytree'):
+        self.folder = folder
+
+    def save(self, path):
+        """Upload the image at path and return the value to store
+        in Person.featured_image.
+        """
+        result = cloudinary.uploader.upload(path, folder=self.folder)
+        return (
+            f"image/upload/v{result['version']}/"
+            f"{result['public_id']}.{result['format']}"
+        )
+
+    def url(self, image, **options):
+        """Get the delivery url of a stored image."""
+        return image.build_url(secure=True, **options)
+
+
+class LocalFileSystemBackend:
+    """Store images below a local directory, a stand-in for Cloudinary
+    in development and tests. Transformation options are ignored.
+    """
+
+    prefix = 'local'
+
+    def __init__(self, location=None, base_url=None):
+        self.location = location or getattr(
+            settings, 'FAMILYTREE_IMAGE_ROOT',
+            os.path.join(settings.BASE_DIR, 'media'))
+        self.base_url = base_url or getattr(
+            settings, 'FAMILYTREE_IMAGE_URL', '/media/')
+
+    def save(self, path):
+        """Copy the image at path and return the value to store
+        in Person.featured_image.
+        """
+        extension = os.path.splitext(path)[1].lower() or '.jpg'
+        name = f"{self.prefix}/{uuid.uuid4().hex}{extension}"
+        target = os.path.join(self.location, name)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.copyfile(path, target)
+        return f"image/upload/{name}"
+
+    def url(self, image, **options):
+        """Get the url of a stored image."""
+        return f"{self.base_url}{image.public_id}.{image.format}"
+
+
+def backend_name():
+    """Get the import path of the configured image backend."""
+    return getattr(settings, 'FAMILYTREE_IMAGE_BACKEND', DEFAULT_BACKEND)
+
+
+def get_backend():
+    """Get the image backend named by FAMILYTREE_IMAGE_BACKEND."""
+    return import_string(backend_name())()
+
+
+def content_hash(upload):
+    """Get the SHA-256 hex digest of an upload, read in chunks."""
+    digest = hashlib.sha256()
+    for chunk in upload.chunks():
+        digest.update(chunk)
+    upload.seek(0)
+    return digest.hexdigest()
+
+
+def find_asset(owner_id, digest):
+    """Get the stored image of an upload hash, or None. Only images of
+    the same owner are found, so uploads reveal nothing about others."""
+    return ImageAsset.objects.filter(
+        owner_id=owner_id, backend=backend_name(), sha256=digest
+        ).values_list('image', flat=True).first()
+
+
+def has_image(person):
+    """Check if a person has an own image instead of the placeholder."""
+    image = person.featured_image
+    return bool(image) and PLACEHOLDER not in str(image)
+
+
+def _resource(image):
+    """Get a stored image as CloudinaryResource, freshly assigned
+    values are still plain strings.
+    """
+    return Person._meta.get_field('featured_image').to_python(image)
+
+
+def image_url(person, **options):
+    """Get the url of the image of a person, or '' for the placeholder."""
+    if not has_image(person):
+        return ''
+    return get_backend().url(_resource(person.featured_image), **options)
+
+
+def _card_key(image, widths):
+    value = image.get_prep_value()
+    digest = hashlib.md5(f"{backend_name()}:{value}".encode()).hexdigest()
+    return f"familytree:card-image:{'-'.join(map(str, widths))}:{digest}"
+
+
+def card_images(persons, widths=CARD_WIDTHS):
+    """Get the card image urls of many persons at once.
+    Return a dict mapping person ids to {'src', 'srcset'}, persons
+    without an own image are left out. Urls are cached per image, so a
+    photo shared by several persons is only built once.
+    """
+    wanted = {}
+    for person in persons:
+        if has_image(person):
+            key = _card_key(_resource(person.featured_image), widths)
+            wanted.setdefault(key, []).append(person)
+    if not wanted:
+        return {}
+
+    fragments = caches['fragments']
+    found = fragments.get_many(wanted)
+    missing = {}
+    backend = get_backend()
+    for key, group in wanted.items():
+        if key in found:
+            continue
+        urls = [
+            backend.url(_resource(group[0].featured_image),
+                        width=width, height=width, **CARD_TRANSFORMATION)
+            for width in widths
+        ]
+        srcset = ''
+        if len(set(urls)) > 1:
+            srcset = ', '.join(
+                f"{url} {width}w" for url, width in zip(urls, widths))
+        found[key] = missing[key] = {'src': urls[0], 'srcset': srcset}
+    fragments.set_many(missing, CARD_URL_TIMEOUT)
+
+    return {
+        person.pk: found[key]
+        for key, group in wanted.items() for person in group
+    }
+
+
+def attach_card_images(persons):
+    """Set card_image on every person, None for the placeholder."""
+    persons = list(persons)
+    urls = card_images(persons)
+    for person in persons:
+        person.card_image = urls.get(person.pk)
+    return persons
+
+
+def stage(upload):
+    """Copy an uploaded image to a temporary file and return its path,
+    so it can be stored after the request has finished.
+    """
+    extension = os.path.splitext(upload.name)[1].lower()
+    with tempfile.NamedTemporaryFile(
+            suffix=extension, delete=False) as staged:
+        for chunk in upload.chunks():
+            staged.write(chunk)
+    return staged.name
+
+
+def inspect(file):
+    """Read the header of an image and return (format, width, height).
+    The pixel data is not decoded. Raise ValueError for files that are
+    no image or have more pixels than allowed.
+    """
+    try:
+        with Image.open(file) as image:
+            image_format, (width, height) = image.format, image.size
+    except (OSError, Image.DecompressionBombError) as error:
+        raise ValueError("Uploaded file is not a valid image.") from error
+    if width * height > max_pixels():
+        raise ValueError(f"Images may have at most {max_pixels():,} pixels.")
+    return (image_format or '').lower(), width, height
+
+
+def downscale(path):
+    """Shrink an image so its longest side fits max_side() and
+    re-encode it as WebP, or JPEG where Pillow lacks WebP support.
+    JPEG files are decoded at a reduced scale right away, so a large
+    photo never has to be held in memory at full size.
+    Return the path of the image to store, which is path itself for
+    images that are already small enough.
+    """
+    limit = max_side()
+    _, width, height = inspect(path)
+    if max(width, height) <= limit:
+        return path
+    with Image.open(path) as image:
+        image.draft('RGB', (limit, limit))
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((limit, limit), Image.LANCZOS)
+        if features.check('webp'):
+            extension, image_format = '.webp', 'WEBP'
+            if image.mode not in ('RGB', 'RGBA'):
+                image = image.convert('RGBA')
+        else:
+            extension, image_format = '.jpg', 'JPEG'
+            image = image.convert('RGB')
+        with tempfile.NamedTemporaryFile(
+                suffix=extension, delete=False) as target:
+            image.save(target, image_format, quality=82)
+    os.remove(path)
+    return target.name
+
+
+def process(person_id, path, digest=None):
+    """Store a staged image and attach it to the person.
+    With the digest of the upload the stored image is registered
+    as ImageAsset, so later uploads of the same file by the same owner
+    reuse it.
+    The staged file is removed afterwards, also when storing failed.
+    """
+    try:
+        person = Person.objects.filter(pk=person_id).first()
+        if person is None:
+            return
+        try:
+            path = downscale(path)
+            person.featured_image = get_backend().save(path)
+            person.image_status = Person.IMAGE_READY
+        except Exception:
+            logger.exception("Storing the image of person %s failed",
+                             person_id)
+            person.image_status = Person.IMAGE_FAILED
+            person.save(update_fields=['image_status'])
+            return
+        person.save(update_fields=['featured_image', 'image_status'])
+        if digest:
+            ImageAsset.objects.get_or_create(
+                owner_id=person.owner_id, backend=backend_name(),
+                sha256=digest,
+                defaults={'image': person.featured_image})
+    finally:
+        os.remove(path)
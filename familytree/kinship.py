@@ -0,0 +1,123 @@
+from weakref import WeakKeyDictionary
+from threading import Lock
+
+ORDINALS = [
+    'first', 'second', 'third', 'fourth', 'fifth',
+    'sixth', 'seventh', 'eighth', 'ninth', 'tenth',
+]
+REMOVALS = ['once', 'twice', 'thrice']
+
+# Answers are memoized per graph snapshot, a new snapshot is
+# built whenever the tree changes so stale answers die with the old one.
+MEMO_SIZE = 4096
+_memo = WeakKeyDictionary()
+_memo_lock = Lock()
+
+
+def closest_common_ancestor(graph, a, b):
+    """Find the common ancestor of a and b with the fewest generations
+    in between, as (ancestor_id, generations_from_a, generations_from_b).
+    Both sides walk up the parents one generation at a time and the
+    search stops as soon as no shorter connection is possible.
+    Return None if the two persons share no ancestor.
+    """
+    if a == b:
+        return a, 0, 0
+
+    seen = ({a: 0}, {b: 0})
+    frontiers = [[a], [b]]
+    levels = [0, 0]
+    best = None
+    while frontiers[0] or frontiers[1]:
+        open_levels = [levels[i] for i in (0, 1) if frontiers[i]]
+        if best and best[1] + best[2] <= min(open_levels) + 1:
+            break
+
+        side = 0 if frontiers[0] and (
+            levels[0] <= levels[1] or not frontiers[1]) else 1
+        other = 1 - side
+        depth = levels[side] + 1
+        generation = []
+        for person_id in frontiers[side]:
+            for parent_id in graph.parents(person_id):
+                if parent_id in seen[side]:
+                    continue
+                seen[side][parent_id] = depth
+                generation.append(parent_id)
+                if parent_id in seen[other]:
+                    found = (depth, seen[other][parent_id])
+                    if side == 1:
+                        found = found[::-1]
+                    if best is None or sum(found) < best[1] + best[2]:
+                        best = (parent_id, *found)
+        frontiers[side] = generation
+        levels[side] = depth
+    return best
+
+
+def _greats(count):
+    return 'great-' * count
+
+
+def _removed(count):
+    if count <= len(REMOVALS):
+        return f"{REMOVALS[count - 1]} removed"
+    return f"{count} times removed"
+
+
+def describe(up_a, up_b, half=False):
+    """Name what b is to a, given the generations from each of them
+    up to their closest common ancestor.
+    """
+    if up_a == 0 and up_b == 0:
+        return "self"
+    if up_a == 0:
+        return "child" if up_b == 1 else f"{_greats(up_b - 2)}grandchild"
+    if up_b == 0:
+        return "parent" if up_a == 1 else f"{_greats(up_a - 2)}grandparent"
+    if up_a == 1 and up_b == 1:
+        return "half-sibling" if half else "sibling"
+    if up_a == 1:
+        return f"{_greats(up_b - 2)}niece/nephew"
+    if up_b == 1:
+        return f"{_greats(up_a - 2)}aunt/uncle"
+
+    degree = min(up_a, up_b) - 1
+    ordinal = (
+        ORDINALS[degree - 1] if degree <= len(ORDINALS) else f"{degree}th"
+    )
+    name = f"{ordinal} cousin"
+    if up_a != up_b:
+        name = f"{name} {_removed(abs(up_a - up_b))}"
+    return name
+
+
+def relationship(graph, a, b):
+    """Name the relationship of person b to person a.
+    Return a dict with the label and the common ancestor, the label is
+    None if the two persons are not related by blood or partnership.
+    """
+    with _memo_lock:
+        memo = _memo.setdefault(graph, {})
+        if (a, b) in memo:
+            return memo[(a, b)]
+
+    result = {'relationship': None, 'common_ancestor': None}
+    if b in graph.partners(a):
+        result['relationship'] = "partner"
+    else:
+        found = closest_common_ancestor(graph, a, b)
+        if found:
+            ancestor, up_a, up_b = found
+            half = (
+                up_a == up_b == 1
+                and set(graph.parents(a)) != set(graph.parents(b))
+            )
+            result['relationship'] = describe(up_a, up_b, half)
+            result['common_ancestor'] = ancestor
+
+    with _memo_lock:
+        if len(memo) >= MEMO_SIZE:
+            memo.pop(next(iter(memo)))
+        memo[(a, b)] = result
+    return result
@@ -0,0 +1,320 @@
+import math
+from collections import defaultdict, deque, namedtuple
+from django.core.cache import caches
+from .graph import graph_cache
+from .models import FamilyTree
+
+# Layout units: neighbouring persons are SEPARATION apart and every
+# generation is one unit below the previous one. Layouts are served in
+# tiles of TILE_WIDTH by TILE_HEIGHT units.
+SEPARATION = 1.0
+TILE_WIDTH = 16
+TILE_HEIGHT = 4
+# Barycenter sweeps ordering the generations of a layered layout and
+# rounds pulling partners onto the same generation.
+SWEEPS = 4
+MAX_RELAXATIONS = 8
+LAYOUT_TIMEOUT = 24 * 60 * 60
+# Most persons sent for one viewport.
+MAX_NODES = 2000
+
+
+def _spanning_tree(graph, root_id):
+    """Get the descendants of root_id in breadth first order with the
+    children placed below each of them. Persons with several parents
+    in the tree are placed below the first one reached.
+    """
+    order, children, depth = [root_id], {}, {root_id: 0}
+    index = 0
+    while index < len(order):
+        person_id = order[index]
+        index += 1
+        below = [c for c in graph.children(person_id) if c not in depth]
+        for child in below:
+            depth[child] = depth[person_id] + 1
+        children[person_id] = below
+        order.extend(below)
+    return order, children, depth
+
+
+def _merge(group, contour):
+    """Merge the contour of the next sibling into the contour of the
+    siblings left of it, see descendant_layout. Both are lists of the
+    leftmost and rightmost position per generation, deepest first, and
+    a shift added to every value. The longer lists are reused, so the
+    cost is the height of the shorter subtree.
+    """
+    lefts, rights, shift = group
+    c_lefts, c_rights, c_shift = contour
+    common = min(len(lefts), len(c_lefts))
+    if len(c_lefts) >= len(lefts):
+        for i in range(1, common + 1):
+            c_lefts[-i] = lefts[-i] + shift - c_shift
+        return c_lefts, c_rights, c_shift
+    for i in range(1, common + 1):
+        rights[-i] = c_rights[-i] + c_shift - shift
+    return lefts, rights, shift
+
+
+def descendant_layout(graph, root_id):
+    """Place root_id and its descendants with the Reingold-Tilford
+    algorithm. Subtrees are laid out bottom up, each one is pushed
+    right of its left siblings just as far as their contours require
+    and parents are centred above their children.
+    Return {person_id: (x, generation)}.
+    """
+    order, children, depth = _spanning_tree(graph, root_id)
+    offset, contours = {}, {}
+    for person_id in reversed(order):
+        below = children[person_id]
+        if not below:
+            contours[person_id] = ([0.0], [0.0], 0.0)
+            continue
+        group = contours.pop(below[0])
+        positions = [0.0]
+        for child in below[1:]:
+            c_lefts, c_rights, c_shift = contours.pop(child)
+            lefts, rights, shift = group
+            common = min(len(lefts), len(c_lefts))
+            position = max(
+                rights[-i] + shift - c_lefts[-i] - c_shift + SEPARATION
+                for i in range(1, common + 1))
+            positions.append(position)
+            group = _merge(group, (c_lefts, c_rights, c_shift + position))
+        middle = (positions[0] + positions[-1]) / 2
+        for child, position in zip(below, positions):
+            offset[child] = position - middle
+        lefts, rights, shift = group
+        shift -= middle
+        lefts.append(-shift)
+        rights.append(-shift)
+        contours[person_id] = (lefts, rights, shift)
+
+    x = {root_id: 0.0}
+    for person_id in order:
+        for child in children[person_id]:
+            x[child] = x[person_id] + offset[child]
+    left = min(x.values())
+    return {
+        person_id: (x[person_id] - left, depth[person_id])
+        for person_id in order
+    }
+
+
+# Neighbours of every person, read once from the FamilyGraph.
+_Links = namedtuple('_Links', 'parents children partners')
+
+
+def _generations(links, ids):
+    """Assign every person a generation, at least one below each of
+    its parents and the same as its partners. Persons on a cycle of
+    parent links keep the generation they reached.
+    """
+    generation = dict.fromkeys(ids, 0)
+    for _ in range(MAX_RELAXATIONS):
+        changed = False
+        waiting = {pid: len(links.parents[pid]) for pid in ids}
+        queue = deque(pid for pid in ids if not waiting[pid])
+        while queue:
+            parent = queue.popleft()
+            for child in links.children[parent]:
+                if generation[child] <= generation[parent]:
+                    generation[child] = generation[parent] + 1
+                    changed = True
+                waiting[child] -= 1
+                if not waiting[child]:
+                    queue.append(child)
+        for person_id in ids:
+            for partner in links.partners[person_id]:
+                if generation[person_id] < generation[partner]:
+                    generation[person_id] = generation[partner]
+                    changed = True
+        if not changed:
+            break
+    return generation
+
+
+def _initial_order(links, ids, generation):
+    """Order every generation depth first from the roots, so that
+    families start out next to each other.
+    """
+    levels = defaultdict(list)
+    seen = set()
+    for root in ids:
+        if root in seen or links.parents[root]:
+            continue
+        stack = [root]
+        while stack:
+            person_id = stack.pop()
+            if person_id in seen:
+                continue
+            seen.add(person_id)
+            levels[generation[person_id]].append(person_id)
+            stack.extend(reversed(links.children[person_id]))
+            stack.extend(reversed(links.partners[person_id]))
+    for person_id in ids:
+        if person_id not in seen:
+            levels[generation[person_id]].append(person_id)
+    return levels
+
+
+def _partner_blocks(links, level):
+    """Map every person of a generation to the first person of its
+    group of partners within that generation."""
+    members, block = set(level), {}
+    for person_id in level:
+        if person_id in block:
+            continue
+        block[person_id] = person_id
+        stack = [person_id]
+        while stack:
+            for partner in links.partners[stack.pop()]:
+                if partner in members and partner not in block:
+                    block[partner] = person_id
+                    stack.append(partner)
+    return block
+
+
+def _sort_level(level, key, block):
+    """Sort a generation by key, partners stay next to each other."""
+    groups = defaultdict(list)
+    for person_id in level:
+        groups[block[person_id]].append(key[person_id])
+    centre = {b: sum(keys) / len(keys) for b, keys in groups.items()}
+    level.sort(key=lambda p: (centre[block[p]], block[p], key[p]))
+
+
+def _order(links, levels):
+    """Reduce edge crossings with barycenter sweeps, down the
+    generations by parents and back up by children.
+    """
+    position, blocks = {}, {}
+    for number, level in levels.items():
+        position.update((p, i) for i, p in enumerate(level))
+        blocks[number] = _partner_blocks(links, level)
+    down = sorted(levels)
+    for _ in range(SWEEPS):
+        for generations, neighbours in ((down[1:], links.parents),
+                                        (down[-2::-1], links.children)):
+            for number in generations:
+                level = levels[number]
+                key = {}
+                for person_id in level:
+                    near = [position[n] for n in neighbours[person_id]]
+                    key[person_id] = (
+                        sum(near) / len(near) if near
+                        else position[person_id])
+                _sort_level(level, key, blocks[number])
+                position.update((p, i) for i, p in enumerate(level))
+
+
+def layered_layout(graph):
+    """Place every person of a tree in generations, a Sugiyama style
+    layout for pedigrees with several roots, marriages between
+    branches and parents on different generations. Generations are
+    ordered to reduce crossings, then each person is put below the
+    middle of its parents as far as its left neighbour allows.
+    Return {person_id: (x, generation)}.
+    """
+    ids = list(graph.ids)
+    if not ids:
+        return {}
+    links = _Links(
+        {pid: graph.parents(pid) for pid in ids},
+        {pid: graph.children(pid) for pid in ids},
+        {pid: graph.partners(pid) for pid in ids},
+    )
+    generation = _generations(links, ids)
+    levels = _initial_order(links, ids, generation)
+    _order(links, levels)
+
+    x = {}
+    for number in sorted(levels):
+        previous = -math.inf
+        for person_id in levels[number]:
+            above = [x[p] for p in links.parents[person_id] if p in x]
+            wanted = sum(above) / len(above) if above else 0.0
+            x[person_id] = previous = max(wanted, previous + SEPARATION)
+    # Persons without parents move right towards their children.
+    for number in sorted(levels, reverse=True):
+        following = math.inf
+        for person_id in reversed(levels[number]):
+            below = [x[c] for c in links.children[person_id]]
+            if below and not links.parents[person_id]:
+                wanted = sum(below) / len(below)
+                x[person_id] = max(
+                    x[person_id], min(wanted, following - SEPARATION))
+            following = x[person_id]
+
+    left = min(x.values())
+    return {
+        person_id: (x[person_id] - left, generation[person_id])
+        for person_id in ids
+    }
+
+
+def _tile(x, y):
+    return int(x // TILE_WIDTH), int(y // TILE_HEIGHT)
+
+
+def _layout_key(owner_id, version, root_id):
+    return f"familytree:layout:{owner_id}:{version}:{root_id or 'all'}"
+
+
+def get_layout(owner_id, root_id=None):
+    """Get the layout of the tree of an owner, of the descendants of
+    root_id or else of everyone. Layouts are cached per tree version
+    in the fragment cache of this worker.
+    Return a dict with the tree version, the positions, the person ids
+    per tile and the bounds as (left, top, right, bottom).
+    """
+    version = FamilyTree.objects.filter(
+        owner_id=owner_id).values_list('version', flat=True).first()
+    key = _layout_key(owner_id, version, root_id)
+    fragments = caches['fragments']
+    layout = fragments.get(key)
+    if layout is not None:
+        return layout
+
+    graph = graph_cache.get(owner_id)
+    if root_id is None:
+        positions = layered_layout(graph)
+    else:
+        positions = descendant_layout(graph, root_id)
+    tiles = defaultdict(list)
+    for person_id, (x, y) in positions.items():
+        tiles[_tile(x, y)].append(person_id)
+    layout = {
+        'version': version,
+        'positions': positions,
+        'tiles': dict(tiles),
+        'bounds': (
+            0.0, 0,
+            max((x for x, _ in positions.values()), default=0.0),
+            max((y for _, y in positions.values()), default=0),
+        ),
+    }
+    fragments.set(key, layout, LAYOUT_TIMEOUT)
+    return layout
+
+
+def window(layout, left, top, right, bottom):
+    """Get the ids of the persons of a layout inside a viewport,
+    reading only the tiles it overlaps.
+    """
+    left, top = max(left, 0.0), max(top, 0.0)
+    right = min(right, layout['bounds'][2])
+    bottom = min(bottom, layout['bounds'][3])
+    if left > right or top > bottom:
+        return []
+    (first_x, first_y), (last_x, last_y) = (
+        _tile(left, top), _tile(right, bottom))
+    positions = layout['positions']
+    found = []
+    for tile_x in range(first_x, last_x + 1):
+        for tile_y in range(first_y, last_y + 1):
+            for person_id in layout['tiles'].get((tile_x, tile_y), ()):
+                x, y = positions[person_id]
+                if left <= x <= right and top <= y <= bottom:
+                    found.append(person_id)
+    return sorted(found)
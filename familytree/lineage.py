@@ -0,0 +1,123 @@
+from collections import defaultdict, deque
+from .models import Person, PersonLineage
+
+# Rows of the Person.parents through table point from child to parent.
+ParentLink = Person.parents.through
+
+BATCH_SIZE = 1000
+
+
+def _chunked(ids):
+    """Split ids into lists small enough for an IN lookup."""
+    ids = list(ids)
+    for start in range(0, len(ids), BATCH_SIZE):
+        yield ids[start:start + BATCH_SIZE]
+
+
+def _closure_of(person_ids, column):
+    """Map each person to a set of (relative_id, depth) pairs.
+    column is 'descendant' to collect ancestors and 'ancestor'
+    to collect descendants. Every person is its own relative at depth 0.
+    """
+    other = 'ancestor' if column == 'descendant' else 'descendant'
+    closure = defaultdict(set)
+    for person_id in person_ids:
+        closure[person_id].add((person_id, 0))
+
+    for chunk in _chunked(person_ids):
+        rows = PersonLineage.objects.filter(
+            **{f'{column}_id__in': chunk}
+            ).values_list(f'{column}_id', f'{other}_id', 'depth')
+        for person_id, relative_id, depth in rows:
+            closure[person_id].add((relative_id, depth))
+    return closure
+
+
+def link(edges):
+    """Add the closure rows created by new (parent_id, child_id) edges.
+    Every ancestor of the parent becomes an ancestor of every
+    descendant of the child.
+    """
+    edges = list(edges)
+    if not edges:
+        return
+
+    above = _closure_of({parent for parent, _ in edges}, 'descendant')
+    below = _closure_of({child for _, child in edges}, 'ancestor')
+
+    rows = {
+        (ancestor, descendant, up + 1 + down)
+        for parent, child in edges
+        for ancestor, up in above[parent]
+        for descendant, down in below[child]
+        if ancestor != descendant
+    }
+    PersonLineage.objects.bulk_create(
+        [PersonLineage(ancestor_id=a, descendant_id=d, depth=depth)
+         for a, d, depth in rows],
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def rebuild(person_ids):
+    """Recompute the ancestor rows of the given persons and of all
+    their descendants from the current parent links.
+    Used after parent links were removed or persons were deleted.
+    """
+    roots = set(person_ids)
+    if not roots:
+        return
+
+    subtree = set(roots)
+    for chunk in _chunked(roots):
+        subtree.update(
+            PersonLineage.objects.filter(
+                ancestor_id__in=chunk
+                ).values_list('descendant_id', flat=True)
+        )
+
+    parents_of = defaultdict(list)
+    children_of = defaultdict(list)
+    indegree = dict.fromkeys(subtree, 0)
+    outside = set()
+    for chunk in _chunked(subtree):
+        links = ParentLink.objects.filter(
+            from_person_id__in=chunk
+            ).values_list('from_person_id', 'to_person_id')
+        for child, parent in links:
+            parents_of[child].append(parent)
+            if parent in subtree:
+                children_of[parent].append(child)
+                indegree[child] += 1
+            else:
+                outside.add(parent)
+
+    # Ancestors of parents outside the subtree are not affected.
+    ancestry = _closure_of(outside, 'descendant')
+
+    # Walk the subtree top-down, persons caught in a cycle are skipped.
+    queue = deque(p for p, count in indegree.items() if count == 0)
+    rows = set()
+    while queue:
+        person_id = queue.popleft()
+        own = {(person_id, 0)}
+        for parent in parents_of[person_id]:
+            for ancestor, depth in ancestry.get(parent, ()):
+                if ancestor != person_id:
+                    own.add((ancestor, depth + 1))
+                    rows.add((ancestor, person_id, depth + 1))
+        ancestry[person_id] = own
+        for child in children_of[person_id]:
+            indegree[child] -= 1
+            if indegree[child] == 0:
+                queue.append(child)
+
+    for chunk in _chunked(subtree):
+        PersonLineage.objects.filter(descendant_id__in=chunk).delete()
+    PersonLineage.objects.bulk_create(
+        [PersonLineage(ancestor_id=a, descendant_id=d, depth=depth)
+         for a, d, depth in rows],
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
@@ -0,0 +1,27 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from familytree.gedcom import export_gedcom, VERSIONS
+
+
+class Command(BaseCommand):
+    help = "Export the family tree of a user as a GEDCOM file."
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('path')
+        parser.add_argument(
+            '--gedcom-version', choices=VERSIONS, default=VERSIONS[0],
+            help="GEDCOM version to write.")
+
+    def handle(self, *args, **options):
+        try:
+            owner = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['username']} does not exist.")
+
+        with open(options['path'], 'w', encoding='utf-8') as output:
+            for chunk in export_gedcom(owner.pk, options['gedcom_version']):
+                output.write(chunk)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Exported the family tree of {owner.username}."))
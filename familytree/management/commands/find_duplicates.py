@@ -0,0 +1,33 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from familytree.duplicates import find_duplicates, THRESHOLD
+from familytree.models import Person
+
+
+class Command(BaseCommand):
+    help = "List likely duplicate persons in the family tree of a user."
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument(
+            '--threshold', type=float, default=THRESHOLD,
+            help="Lowest score from 0 to 1 a pair needs to be listed.")
+        parser.add_argument(
+            '--limit', type=int, default=100,
+            help="Number of pairs to list, best first.")
+
+    def handle(self, *args, **options):
+        try:
+            owner = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['username']} does not exist.")
+
+        pairs = find_duplicates(
+            owner.pk, options['threshold'], options['limit'])
+        names = Person.objects.in_bulk(
+            {person_id for _, a, b in pairs for person_id in (a, b)})
+        for rating, a, b in pairs:
+            self.stdout.write(
+                f"{rating:.3f}  #{a} {names[a]}  <>  #{b} {names[b]}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Found {len(pairs)} candidate pairs."))
@@ -0,0 +1,28 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from familytree.gedcom import import_gedcom, BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = "Import a GEDCOM file into the family tree of a user."
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('path')
+        parser.add_argument(
+            '--batch-size', type=int, default=BATCH_SIZE,
+            help="Number of persons inserted per transaction.")
+
+    def handle(self, *args, **options):
+        try:
+            owner = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['username']} does not exist.")
+
+        with open(options['path'], encoding='utf-8-sig',
+                  errors='replace') as lines:
+            persons, families = import_gedcom(
+                lines, owner, options['batch_size'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {persons} persons and {families} families."))
@@ -0,0 +1,40 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from familytree import counters
+from familytree.models import Person
+
+COUNTERS = ('parent_count', 'child_count', 'partner_count', 'sibling_count')
+
+
+class Command(BaseCommand):
+    help = "Recompute the relation and person counters from the links."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'username', nargs='?',
+            help="Only repair the family tree of this user.")
+
+    def handle(self, *args, **options):
+        owners = User.objects.all()
+        if options['username']:
+            owners = owners.filter(username=options['username'])
+            if not owners.exists():
+                raise CommandError(
+                    f"User {options['username']} does not exist.")
+
+        repaired = 0
+        for owner_id in owners.values_list('pk', flat=True):
+            persons = Person.objects.filter(owner_id=owner_id)
+            with transaction.atomic():
+                before = set(persons.values_list('pk', *COUNTERS))
+                counters.recount(persons.values_list('pk', flat=True))
+                counters.recount_siblings(
+                    persons.values_list('birth_unit_id', flat=True))
+                persons.filter(birth_unit__isnull=True).update(
+                    sibling_count=0)
+                counters.recount_trees(owner_id)
+                after = set(persons.values_list('pk', *COUNTERS))
+            repaired += len(after - before)
+        self.stdout.write(self.style.SUCCESS(
+            f"Repaired the counters of {repaired} persons."))
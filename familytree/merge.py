@@ -0,0 +1,79 @@
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from .models import Person, FamilyTree, FamilyRelation
+from .signals import tree_bulk_changed
+from . import images
+
+# Rows of the Person.parents through table point from child to parent.
+ParentLink = Person.parents.through
+PartnerLink = Person.partners.through
+TreeMember = FamilyTree.person.through
+
+# Fields the survivor takes over from the duplicate when it has none.
+FILLED_FIELDS = (
+    'nickname', 'birth_date', 'birth_place', 'birth_country',
+    'death_date', 'occupation', 'hobbies', 'language',
+)
+
+
+def _rewire(model, column, other, duplicate_id, survivor_id, same=(),
+            links=True):
+    """Point column of every row of model from the duplicate to the
+    survivor with one UPDATE. Rows that would repeat a row of the
+    survivor, matching on other and the same columns, are deleted
+    first. For links between persons, rows that would link the
+    survivor to itself are deleted as well.
+    """
+    rows = model.objects.filter(**{column: duplicate_id})
+    clash = model.objects.filter(
+        **{column: survivor_id, other: OuterRef(other)},
+        **{field: OuterRef(field) for field in same})
+    rows.filter(Exists(clash)).delete()
+    if links:
+        rows.filter(**{other: survivor_id}).delete()
+    rows.update(**{column: survivor_id})
+
+
+def merge_persons(survivor, duplicate):
+    """Merge duplicate into survivor in one transaction.
+    Parents, children, partners, relations and tree memberships of the
+    duplicate move to the survivor, empty fields of the survivor are
+    filled from the duplicate and the duplicate is deleted.
+    """
+    if survivor.pk == duplicate.pk or survivor.owner_id != duplicate.owner_id:
+        raise ValueError("Only two persons of the same tree can be merged.")
+
+    survivor_id, duplicate_id = survivor.pk, duplicate.pk
+    with transaction.atomic():
+        for column, other in (('from_person_id', 'to_person_id'),
+                              ('to_person_id', 'from_person_id')):
+            _rewire(ParentLink, column, other, duplicate_id, survivor_id)
+            _rewire(PartnerLink, column, other, duplicate_id, survivor_id)
+            _rewire(FamilyRelation, column, other, duplicate_id,
+                    survivor_id, same=('relation_type',))
+        _rewire(TreeMember, 'person_id', 'familytree_id',
+                duplicate_id, survivor_id, links=False)
+        if not FamilyTree.objects.filter(main_person_id=survivor_id).exists():
+            FamilyTree.objects.filter(main_person_id=duplicate_id).update(
+                main_person_id=survivor_id)
+
+        changed = [
+            field for field in FILLED_FIELDS
+            if not getattr(survivor, field) and getattr(duplicate, field)
+        ]
+        for field in changed:
+            setattr(survivor, field, getattr(duplicate, field))
+        if not images.has_image(survivor) and images.has_image(duplicate):
+            survivor.featured_image = duplicate.featured_image
+            changed.append('featured_image')
+        if changed:
+            survivor.save(update_fields=changed)
+
+        duplicate.delete()
+        children = ParentLink.objects.filter(
+            to_person_id=survivor_id
+            ).values_list('from_person_id', flat=True)
+        tree_bulk_changed.send(
+            sender=Person, owner_id=survivor.owner_id,
+            person_ids=[survivor_id, *children])
+    return survivor
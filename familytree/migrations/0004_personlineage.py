@@ -0,0 +1,70 @@
+# Generated by Django 4.2.20 on 2026-10-18 02:59
+
+from django.db import migrations, models
+import django.db.models.deletion
+from collections import defaultdict, deque
+
+
+def build_lineage(apps, schema_editor):
+    """Fill the closure table from the existing parent links."""
+    Person = apps.get_model('familytree', 'Person')
+    PersonLineage = apps.get_model('familytree', 'PersonLineage')
+    ParentLink = Person.parents.through
+
+    parents_of = defaultdict(list)
+    children_of = defaultdict(list)
+    indegree = defaultdict(int)
+    links = ParentLink.objects.values_list('from_person_id', 'to_person_id')
+    for child, parent in links.iterator(chunk_size=2000):
+        parents_of[child].append(parent)
+        children_of[parent].append(child)
+        indegree[child] += 1
+
+    persons = set(parents_of) | set(children_of)
+    queue = deque(p for p in persons if indegree[p] == 0)
+    ancestry = {}
+    batch = []
+    while queue:
+        person_id = queue.popleft()
+        own = {(person_id, 0)}
+        for parent in parents_of[person_id]:
+            for ancestor, depth in ancestry[parent]:
+                if ancestor != person_id:
+                    own.add((ancestor, depth + 1))
+        ancestry[person_id] = own
+        batch.extend(
+            PersonLineage(ancestor_id=a, descendant_id=person_id, depth=d)
+            for a, d in own if d > 0
+        )
+        if len(batch) >= 1000:
+            PersonLineage.objects.bulk_create(batch)
+            batch = []
+        for child in children_of[person_id]:
+            indegree[child] -= 1
+            if indegree[child] == 0:
+                queue.append(child)
+    PersonLineage.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('familytree', '0003_alter_familyrelation_relation_type'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PersonLineage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('depth', models.PositiveSmallIntegerField()),
+                ('ancestor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='descendant_links', to='familytree.person')),
+                ('descendant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ancestor_links', to='familytree.person')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['descendant', 'depth'], name='familytree__descend_774f5e_idx')],
+                'unique_together': {('ancestor', 'descendant', 'depth')},
+            },
+        ),
+        migrations.RunPython(build_lineage, migrations.RunPython.noop),
+    ]
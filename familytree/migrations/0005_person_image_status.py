@@ -0,0 +1,18 @@
+# Generated by Django 4.2.20 on 2026-10-18 03:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('familytree', '0004_personlineage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='person',
+            name='image_status',
+            field=models.CharField(choices=[('ready', 'Ready'), ('pending', 'Processing'), ('failed', 'Failed')], default='ready', max_length=10),
+        ),
+    ]
@@ -0,0 +1,53 @@
+from django.db import migrations
+
+FIELDS = (
+    'first_name', 'last_name', 'nickname', 'birth_place', 'occupation', 'bio',
+)
+COLUMNS = ', '.join(FIELDS)
+DOCUMENT = "to_tsvector('simple', {})".format(
+    " || ' ' || ".join(f"coalesce({field}, '')" for field in FIELDS))
+
+
+def create_index(apps, schema_editor):
+    """Create the search index of the database in use.
+    SQLite gets an FTS5 table filled from the person table, PostgreSQL
+    a GIN index over the text columns and a trigram index on the name.
+    """
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE familytree_person_fts USING fts5("
+            f"owner, {COLUMNS}, "
+            f"tokenize='unicode61 remove_diacritics 2', prefix='1 2 3')")
+        schema_editor.execute(
+            f"INSERT INTO familytree_person_fts (rowid, owner, {COLUMNS}) "
+            f"SELECT id, 'o' || owner_id, {COLUMNS} FROM familytree_person")
+    elif vendor == 'postgresql':
+        schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        schema_editor.execute(
+            f"CREATE INDEX familytree_person_search "
+            f"ON familytree_person USING GIN ({DOCUMENT})")
+        schema_editor.execute(
+            "CREATE INDEX familytree_person_name_trgm "
+            "ON familytree_person USING GIN "
+            "((first_name || ' ' || last_name) gin_trgm_ops)")
+
+
+def drop_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE familytree_person_fts")
+    elif vendor == 'postgresql':
+        schema_editor.execute("DROP INDEX familytree_person_search")
+        schema_editor.execute("DROP INDEX familytree_person_name_trgm")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('familytree', '0006_imageasset'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 4.2.20 on 2026-10-18 03:37
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from collections import defaultdict
+
+
+def build_units(apps, schema_editor):
+    """Group the existing children into units of their parent sets."""
+    Person = apps.get_model('familytree', 'Person')
+    FamilyUnit = apps.get_model('familytree', 'FamilyUnit')
+    ParentLink = Person.parents.through
+    UnitParent = FamilyUnit.parents.through
+
+    parents_of = defaultdict(list)
+    links = ParentLink.objects.values_list('from_person_id', 'to_person_id')
+    for child, parent in links.iterator(chunk_size=2000):
+        parents_of[child].append(parent)
+    owner_of = dict(
+        Person.objects.filter(pk__in=list(parents_of)).values_list(
+            'pk', 'owner_id').iterator(chunk_size=2000))
+
+    children_of = defaultdict(list)
+    for child, parents in parents_of.items():
+        key = ','.join(str(pk) for pk in sorted(parents))
+        children_of[owner_of[child], key].append(child)
+
+    batch = list(children_of)
+    for start in range(0, len(batch), 1000):
+        chunk = batch[start:start + 1000]
+        units = FamilyUnit.objects.bulk_create(
+            [FamilyUnit(owner_id=owner_id, key=key)
+             for owner_id, key in chunk])
+        UnitParent.objects.bulk_create(
+            [UnitParent(familyunit_id=unit.pk, person_id=int(parent))
+             for unit in units for parent in unit.key.split(',')])
+        children = [
+            Person(pk=child, birth_unit_id=unit.pk)
+            for unit in units
+            for child in children_of[unit.owner_id, unit.key]
+        ]
+        Person.objects.bulk_update(children, ['birth_unit'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('familytree', '0007_person_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FamilyUnit',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=255)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='family_units', to=settings.AUTH_USER_MODEL)),
+                ('parents', models.ManyToManyField(related_name='parent_units', to='familytree.person')),
+            ],
+            options={
+                'unique_together': {('owner', 'key')},
+            },
+        ),
+        migrations.AddField(
+            model_name='person',
+            name='birth_unit',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='children', to='familytree.familyunit'),
+        ),
+        migrations.RunPython(build_units, migrations.RunPython.noop),
+    ]
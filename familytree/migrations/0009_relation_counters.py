@@ -0,0 +1,90 @@
+# Generated by Django 4.2.20 on 2026-10-18 03:42
+
+from collections import defaultdict
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def _rows(model, column):
+    return Coalesce(Subquery(
+        model.objects.filter(**{column: OuterRef('pk')}).order_by()
+        .values(column).annotate(rows=Count('*')).values('rows')), 0)
+
+
+def fill_counters(apps, schema_editor):
+    """Count the existing links, members and siblings."""
+    Person = apps.get_model('familytree', 'Person')
+    FamilyTree = apps.get_model('familytree', 'FamilyTree')
+    FamilyUnit = apps.get_model('familytree', 'FamilyUnit')
+    ParentLink = Person.parents.through
+    PartnerLink = Person.partners.through
+    UnitParent = FamilyUnit.parents.through
+
+    Person.objects.update(
+        parent_count=_rows(ParentLink, 'from_person_id'),
+        child_count=_rows(ParentLink, 'to_person_id'),
+        partner_count=_rows(PartnerLink, 'from_person_id'),
+    )
+    FamilyTree.objects.update(
+        person_count=_rows(FamilyTree.person.through, 'familytree_id'))
+
+    parents_of, units_of = defaultdict(set), defaultdict(set)
+    rows = UnitParent.objects.values_list('familyunit_id', 'person_id')
+    for unit_id, parent_id in rows.iterator(chunk_size=2000):
+        parents_of[unit_id].add(parent_id)
+        units_of[parent_id].add(unit_id)
+    sizes = dict(Person.objects.filter(
+        birth_unit__isnull=False).order_by().values('birth_unit_id')
+        .annotate(size=Count('*')).values_list('birth_unit_id', 'size'))
+
+    batch = []
+    children = Person.objects.filter(
+        birth_unit__isnull=False).values_list('pk', 'birth_unit_id')
+    for pk, unit_id in children.iterator(chunk_size=2000):
+        related = {
+            other for parent in parents_of[unit_id]
+            for other in units_of[parent]
+        }
+        batch.append(Person(pk=pk, sibling_count=max(
+            sum(sizes.get(other, 0) for other in related) - 1, 0)))
+        if len(batch) >= 1000:
+            Person.objects.bulk_update(batch, ['sibling_count'])
+            batch = []
+    Person.objects.bulk_update(batch, ['sibling_count'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('familytree', '0008_familyunit'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='familytree',
+            name='person_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='person',
+            name='child_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='person',
+            name='parent_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='person',
+            name='partner_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='person',
+            name='sibling_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.20 on 2026-10-18 03:48
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('familytree', '0009_relation_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='familytree',
+            name='modified_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.AddField(
+            model_name='familytree',
+            name='version',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+    ]
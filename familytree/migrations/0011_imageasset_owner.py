@@ -0,0 +1,37 @@
+# Generated by Django 4.2.20 on 2026-10-18 04:17
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def drop_assets(apps, schema_editor):
+    """Forget the shared assets, they have no owner. The images stay
+    with their persons and are registered again on the next upload."""
+    apps.get_model('familytree', 'ImageAsset').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('familytree', '0010_familytree_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_assets, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='imageasset',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='imageasset',
+            name='owner',
+            field=models.ForeignKey(default=1, on_delete=django.db.models.deletion.CASCADE, related_name='image_assets', to=settings.AUTH_USER_MODEL),
+            preserve_default=False,
+        ),
+        migrations.AlterUniqueTogether(
+            name='imageasset',
+            unique_together={('owner', 'backend', 'sha256')},
+        ),
+    ]
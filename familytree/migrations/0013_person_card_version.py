@@ -0,0 +1,18 @@
+# Generated by Django 4.2.20 on 2026-10-18 04:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('familytree', '0012_cache_table'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='person',
+            name='card_version',
+            field=models.CharField(blank=True, default='', editable=False, max_length=12),
+        ),
+    ]
@@ -1,7 +1,10 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 from cloudinary.models import CloudinaryField
-from django.db.models import SET_NULL
+from django.db import connection, connections
+from django.db.models import SET_NULL, Subquery, Value
+from django.db.models.expressions import RawSQL
 import pycountry
 from multiselectfield import MultiSelectField
 
@@ -43,6 +46,26 @@ LANGUAGE_CHOICES = [
 ]
 
 
+def _save_kwargs(instance, kwargs, derived):
+    """Leave the derived fields out of a save of a loaded instance.
+    They are only written by their own UPDATEs, a full save would write
+    back the values read when the instance was loaded.
+    Like any save with update_fields, the save of a loaded instance
+    whose row was deleted meanwhile raises DatabaseError instead of
+    inserting the row again.
+    """
+    if (instance._state.adding or kwargs.get('force_insert')
+            or kwargs.get('update_fields') is not None):
+        return kwargs
+    deferred = instance.get_deferred_fields()
+    kwargs['update_fields'] = [
+        field.name for field in instance._meta.concrete_fields
+        if not field.primary_key and field.name not in derived
+        and field.attname not in deferred
+    ]
+    return kwargs
+
+
 class FamilyTree(models.Model):
     """ A family tree model """
 
@@ -61,10 +84,170 @@ class FamilyTree(models.Model):
         blank=True,
         related_name='main_of_tree'
     )
+    # Kept up to date by the signals and bulk writers, see counters.
+    person_count = models.PositiveIntegerField(default=0, editable=False)
+    # Raised on every change to the tree, see freshness.touch.
+    version = models.PositiveBigIntegerField(default=0, editable=False)
+    modified_at = models.DateTimeField(default=timezone.now, editable=False)
+    DERIVED_FIELDS = ('person_count', 'version', 'modified_at')
 
     def __str__(self):
         return f"{self.owner.username} Family Tree"
 
+    def save(self, *args, **kwargs):
+        """Save without the DERIVED_FIELDS, see _save_kwargs."""
+        super().save(*args, **_save_kwargs(self, kwargs, self.DERIVED_FIELDS))
+
+
+# Upper bound for unbounded recursive lineage queries,
+# it also stops the recursion on cyclic data.
+MAX_LINEAGE_DEPTH = 100
+
+# Anchor of a lineage CTE starting at a single person.
+_ANCHOR = "SELECT CAST(%s AS BIGINT), 0"
+
+
+def _lineage_cte(name, anchor, up):
+    """Build a recursive CTE of (person_id, depth) rows over the parent
+    links, walking towards parents if up is true and children otherwise.
+    The CTE takes the anchor params followed by the maximum depth.
+    """
+    table = connection.ops.quote_name(
+        Person.parents.through._meta.db_table)
+    step, join = (
+        ('to_person_id', 'from_person_id') if up
+        else ('from_person_id', 'to_person_id')
+    )
+    return (
+        f"{name}(person_id, depth) AS ("
+        f"{anchor} UNION "
+        f"SELECT t.{step}, {name}.depth + 1 FROM {table} t "
+        f"JOIN {name} ON t.{join} = {name}.person_id "
+        f"WHERE {name}.depth < %s)"
+    )
+
+
+def _depth(max_depth):
+    if max_depth is None:
+        return MAX_LINEAGE_DEPTH
+    return min(max_depth, MAX_LINEAGE_DEPTH)
+
+
+class PersonQuerySet(models.QuerySet):
+    """ Lineage queries issued as WITH RECURSIVE over Person.parents """
+
+    def ancestors_of(self, person, max_depth=None):
+        """Filter to the ancestors of a person within max_depth
+        generations, using a single recursive query.
+        """
+        sql = (
+            "WITH RECURSIVE "
+            + _lineage_cte('lineage', _ANCHOR, up=True)
+            + " SELECT person_id FROM lineage WHERE depth > 0"
+        )
+        return self.filter(
+            pk__in=RawSQL(sql, (person.pk, _depth(max_depth))))
+
+    def descendants_of(self, person, max_depth=None):
+        """Filter to the descendants of a person within max_depth
+        generations, using a single recursive query.
+        """
+        sql = (
+            "WITH RECURSIVE "
+            + _lineage_cte('lineage', _ANCHOR, up=False)
+            + " SELECT person_id FROM lineage WHERE depth > 0"
+        )
+        return self.filter(
+            pk__in=RawSQL(sql, (person.pk, _depth(max_depth))))
+
+    def blood_relatives_of(self, person, max_hops):
+        """Filter to everyone sharing an ancestor with a person who can be
+        reached with at most max_hops steps up and then down the tree.
+        """
+        sql = (
+            "WITH RECURSIVE "
+            + _lineage_cte('up', _ANCHOR, up=True) + ", "
+            + _lineage_cte('down', "SELECT person_id, depth FROM up",
+                           up=False)
+            + " SELECT person_id FROM down WHERE person_id <> %s"
+        )
+        hops = _depth(max_hops)
+        return self.filter(
+            pk__in=RawSQL(sql, (person.pk, hops, hops, person.pk)))
+
+    def generations(self, person, up=None, down=None):
+        """Map the ids of ancestors and descendants of a person to their
+        generation, positive for ancestors (1 for parents) and negative
+        for descendants (-1 for children). Runs a single query.
+        """
+        sql = (
+            "WITH RECURSIVE "
+            + _lineage_cte('up', _ANCHOR, up=True) + ", "
+            + _lineage_cte('down', _ANCHOR, up=False)
+            + " SELECT person_id, MIN(depth) FROM up"
+            " WHERE depth > 0 GROUP BY person_id"
+            " UNION ALL"
+            " SELECT person_id, -MIN(depth) FROM down"
+            " WHERE depth > 0 GROUP BY person_id"
+        )
+        params = (person.pk, _depth(up), person.pk, _depth(down))
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(sql, params)
+            return dict(cursor.fetchall())
+
+
+class PersonManager(models.Manager):
+    """ Manager with lineage lookups backed by the closure table """
+
+    def ancestors(self, person, max_depth=None):
+        """Get all ancestors of a person in a single query.
+        Limit the result to max_depth generations if given.
+        """
+        lookup = {'descendant_links__descendant': person}
+        if max_depth is not None:
+            lookup['descendant_links__depth__lte'] = max_depth
+        return self.filter(**lookup).distinct()
+
+    def descendants(self, person, max_depth=None):
+        """Get all descendants of a person in a single query.
+        Limit the result to max_depth generations if given.
+        """
+        lookup = {'ancestor_links__ancestor': person}
+        if max_depth is not None:
+            lookup['ancestor_links__depth__lte'] = max_depth
+        return self.filter(**lookup).distinct()
+
+    def neighbourhood(self, person):
+        """Get the direct relatives of a person grouped by role.
+        One UNION query collects the relative ids tagged with their role
+        and a second one loads the persons, however large the family is.
+        """
+        parent_links = self.model.parents.through.objects
+        partner_links = self.model.partners.through.objects
+        parent_ids = parent_links.filter(
+            from_person=person).values('to_person_id')
+
+        roles = parent_links.filter(from_person=person).values_list(
+            'to_person_id', Value('parents')
+        ).union(
+            parent_links.filter(to_person_id__in=Subquery(parent_ids))
+            .exclude(from_person=person)
+            .values_list('from_person_id', Value('siblings')),
+            partner_links.filter(from_person=person)
+            .values_list('to_person_id', Value('partners')),
+            parent_links.filter(to_person=person)
+            .values_list('from_person_id', Value('children')),
+        )
+        roles = sorted(roles)
+        persons = self.in_bulk({pk for pk, _ in roles})
+
+        relatives = {
+            'parents': [], 'siblings': [], 'partners': [], 'children': []
+        }
+        for pk, role in roles:
+            relatives[role].append(persons[pk])
+        return relatives
+
 
 class Person(models.Model):
     """ A person model """
@@ -72,9 +255,20 @@ class Person(models.Model):
         User, on_delete=models.CASCADE,
         related_name='persons'
     )
+    IMAGE_READY = 'ready'
+    IMAGE_PENDING = 'pending'
+    IMAGE_FAILED = 'failed'
+    IMAGE_STATUS_CHOICES = [
+        (IMAGE_READY, 'Ready'),
+        (IMAGE_PENDING, 'Processing'),
+        (IMAGE_FAILED, 'Failed'),
+    ]
+
     featured_image = CloudinaryField(
         'image', default='placeholder',
         blank=True, null=True)
+    image_status = models.CharField(
+        max_length=10, choices=IMAGE_STATUS_CHOICES, default=IMAGE_READY)
     first_name = models.CharField(max_length=100)
     last_name = models.CharField(max_length=100)
     birth_place = models.CharField(max_length=100, blank=True)
@@ -113,16 +307,115 @@ class Person(models.Model):
         blank=True,
     )
 
+    birth_unit = models.ForeignKey(
+        'FamilyUnit', on_delete=SET_NULL,
+        null=True, blank=True, related_name='children'
+    )
+
+    # Kept up to date by the signals and bulk writers, see counters.
+    parent_count = models.PositiveIntegerField(default=0, editable=False)
+    child_count = models.PositiveIntegerField(default=0, editable=False)
+    partner_count = models.PositiveIntegerField(default=0, editable=False)
+    sibling_count = models.PositiveIntegerField(default=0, editable=False)
+    # Replaced whenever the card of the person changes, see cards.bump.
+    card_version = models.CharField(
+        max_length=12, blank=True, default='', editable=False)
+    DERIVED_FIELDS = (
+        'birth_unit', 'parent_count', 'child_count', 'partner_count',
+        'sibling_count', 'card_version',
+    )
+
+    objects = PersonManager.from_queryset(PersonQuerySet)()
+
     def __str__(self):
         return f"{self.first_name} {self.last_name}"
 
+    def save(self, *args, **kwargs):
+        """Save without the DERIVED_FIELDS, see _save_kwargs."""
+        super().save(*args, **_save_kwargs(self, kwargs, self.DERIVED_FIELDS))
+
+    def full_siblings(self):
+        """Get the siblings sharing all parents with the person,
+        the other children of its family unit.
+        """
+        return Person.objects.filter(
+            birth_unit__children=self).exclude(id=self.id)
+
     def siblings(self):
-        """Get all siblings of the person.
+        """Get all siblings of the person, the children of every unit
+        sharing a parent with its own unit.
         Exclude the person itself from the list.
         """
+        unit_parents = FamilyUnit.parents.through.objects
+        units = unit_parents.filter(
+            person_id__in=unit_parents.filter(
+                familyunit__children=self).values('person_id')
+            ).values('familyunit_id')
         return Person.objects.filter(
-            parents__in=self.parents.all()
-            ).exclude(id=self.id).distinct()
+            birth_unit_id__in=units).exclude(id=self.id)
+
+
+class FamilyUnit(models.Model):
+    """ A set of parents and the children they have together.
+    Every child points to the unit of its parents as birth_unit """
+    owner = models.ForeignKey(
+        User, on_delete=models.CASCADE,
+        related_name='family_units'
+    )
+    parents = models.ManyToManyField(
+        'Person', related_name='parent_units'
+    )
+    # The sorted parent ids joined by commas, one unit per parent set.
+    key = models.CharField(max_length=255)
+
+    def __str__(self):
+        return f"Family unit {self.key}"
+
+    class Meta:
+        unique_together = ('owner', 'key')
+
+
+class ImageAsset(models.Model):
+    """ A stored image, addressed by the SHA-256 of the uploaded file.
+    Uploads of the same owner with a known hash reuse the stored image,
+    other owners never learn that a file was uploaded before """
+    owner = models.ForeignKey(
+        User, on_delete=models.CASCADE,
+        related_name='image_assets'
+    )
+    sha256 = models.CharField(max_length=64)
+    backend = models.CharField(max_length=200)
+    image = CloudinaryField('image')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.sha256
+
+    class Meta:
+        unique_together = ('owner', 'backend', 'sha256')
+
+
+class PersonLineage(models.Model):
+    """ A closure table row linking an ancestor to a descendant.
+    There is one row per distinct path length between the two persons """
+    ancestor = models.ForeignKey(
+        'Person', related_name='descendant_links',
+        on_delete=models.CASCADE
+    )
+    descendant = models.ForeignKey(
+        'Person', related_name='ancestor_links',
+        on_delete=models.CASCADE
+    )
+    depth = models.PositiveSmallIntegerField()
+
+    def __str__(self):
+        return f"{self.ancestor} → {self.depth} → {self.descendant}"
+
+    class Meta:
+        unique_together = ('ancestor', 'descendant', 'depth')
+        indexes = [
+            models.Index(fields=['descendant', 'depth']),
+        ]
 
 
 class FamilyRelation(models.Model):
@@ -0,0 +1,131 @@
+import re
+from django.db import connection
+from django.db.models import Q
+from .models import Person
+
+FIELDS = (
+    'first_name', 'last_name', 'nickname', 'birth_place', 'occupation', 'bio',
+)
+RESULT_FIELDS = ('id', 'first_name', 'last_name', 'nickname', 'birth_date')
+RESULT_LIMIT = 50
+TYPEAHEAD_LIMIT = 10
+MAX_TERMS = 8
+BATCH_SIZE = 500
+
+# SQLite keeps an FTS5 table whose rowid is the person id. The owner is
+# stored as an indexed token, so the index itself filters by owner.
+FTS_TABLE = 'familytree_person_fts'
+
+# PostgreSQL indexes this expression with GIN, queries must repeat it
+# verbatim for the index to be used.
+PG_DOCUMENT = "to_tsvector('simple', {})".format(
+    " || ' ' || ".join(f"coalesce({field}, '')" for field in FIELDS))
+PG_NAME = "(first_name || ' ' || last_name)"
+
+
+def terms(query):
+    """Split a search query into lower case words."""
+    return re.findall(r'\w+', query.lower())[:MAX_TERMS]
+
+
+def _fts_match(owner_id, words, prefix):
+    star = '*' if prefix else ''
+    words = ' '.join(f'"{word}"{star}' for word in words)
+    return f"owner : o{owner_id} AND {{{' '.join(FIELDS)}}} : ({words})"
+
+
+def _sqlite(owner_id, words, prefix, limit):
+    columns = ', '.join(f'p.{field}' for field in RESULT_FIELDS)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT {columns} FROM {FTS_TABLE} "
+            f"JOIN familytree_person p ON p.id = {FTS_TABLE}.rowid "
+            f"WHERE {FTS_TABLE} MATCH %s "
+            f"ORDER BY bm25({FTS_TABLE}) LIMIT %s",
+            [_fts_match(owner_id, words, prefix), limit])
+        return cursor.fetchall()
+
+
+def _postgresql(owner_id, words, prefix, limit):
+    star = ':*' if prefix else ''
+    tsquery = ' & '.join(f"{word}{star}" for word in words)
+    # Typeahead only uses the prefix index, a full search also finds
+    # misspelled names through the trigram index.
+    fuzzy, params = '', [owner_id, tsquery]
+    if not prefix:
+        fuzzy = f" OR {PG_NAME} %% %s"
+        params.append(' '.join(words))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT {', '.join(RESULT_FIELDS)} FROM familytree_person "
+            f"WHERE owner_id = %s AND ({PG_DOCUMENT} @@ "
+            f"to_tsquery('simple', %s){fuzzy}) "
+            f"ORDER BY ts_rank({PG_DOCUMENT}, to_tsquery('simple', %s)) "
+            f"DESC, id LIMIT %s",
+            params + [tsquery, limit])
+        return cursor.fetchall()
+
+
+def _fallback(owner_id, words, prefix, limit):
+    persons = Person.objects.filter(owner_id=owner_id)
+    for word in words:
+        lookup = 'istartswith' if prefix else 'icontains'
+        match = Q()
+        for field in FIELDS:
+            match |= Q(**{f'{field}__{lookup}': word})
+        persons = persons.filter(match)
+    return persons.order_by('last_name', 'first_name', 'id').values_list(
+        *RESULT_FIELDS)[:limit]
+
+
+def search(owner_id, query, typeahead=False, limit=None):
+    """Find the persons of an owner matching every word of query.
+    In typeahead mode words match as prefixes and only the first
+    TYPEAHEAD_LIMIT hits are returned. Return a list of dicts with
+    the RESULT_FIELDS of each person, best matches first.
+    """
+    words = terms(query)
+    if not words:
+        return []
+    limit = limit or (TYPEAHEAD_LIMIT if typeahead else RESULT_LIMIT)
+    run = {
+        'sqlite': _sqlite, 'postgresql': _postgresql,
+    }.get(connection.vendor, _fallback)
+    return [
+        dict(zip(RESULT_FIELDS, row))
+        for row in run(owner_id, words, typeahead, limit)
+    ]
+
+
+def _chunked(ids):
+    ids = list(ids)
+    for start in range(0, len(ids), BATCH_SIZE):
+        yield ids[start:start + BATCH_SIZE]
+
+
+def remove(person_ids):
+    """Drop persons from the SQLite search index."""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for chunk in _chunked(person_ids):
+            cursor.execute(
+                f"DELETE FROM {FTS_TABLE} WHERE rowid IN "
+                f"({', '.join(['%s'] * len(chunk))})", chunk)
+
+
+def index(person_ids):
+    """Write the current values of persons to the SQLite search index.
+    PostgreSQL indexes the person table itself and needs nothing.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    remove(person_ids)
+    columns = ', '.join(FIELDS)
+    with connection.cursor() as cursor:
+        for chunk in _chunked(person_ids):
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} (rowid, owner, {columns}) "
+                f"SELECT id, 'o' || owner_id, {columns} "
+                f"FROM familytree_person WHERE id IN "
+                f"({', '.join(['%s'] * len(chunk))})", chunk)
@@ -1,6 +1,15 @@
-from django.db.models.signals import post_save
-from django.dispatch import receiver
-from .models import Person, FamilyTree
+from django.db.models.signals import post_save, m2m_changed, pre_delete
+from django.db.models.signals import post_delete
+from django.db import transaction
+from django.dispatch import receiver, Signal
+from django.db.models import F
+from .models import Person, FamilyTree, FamilyRelation, FamilyUnit
+from .graph import graph_cache
+from . import cards, counters, freshness, images, lineage, search, tasks, units
+
+# Sent by bulk writers (imports, merges, batch adds) that bypass the
+# model signals, with the owner_id and the ids of the persons touched.
+tree_bulk_changed = Signal()
 
 
 @receiver(post_save, sender=Person)
@@ -14,3 +23,238 @@ def checkFamilyTree(sender, instance, created, **kwargs):
             owner=user
             )
         family_tree.person.add(instance)
+
+
+@receiver(m2m_changed, sender=Person.parents.through)
+def update_lineage(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Keep the PersonLineage closure table in sync with Person.parents.
+    With reverse=True the instance is the parent and pk_set its children.
+    """
+    if action == 'post_add':
+        if reverse:
+            lineage.link((instance.pk, child) for child in pk_set)
+        else:
+            lineage.link((parent, instance.pk) for parent in pk_set)
+    elif action == 'post_remove':
+        lineage.rebuild(pk_set if reverse else {instance.pk})
+    elif action == 'pre_clear':
+        instance._lineage_roots = set(
+            instance.children.values_list('pk', flat=True)
+            ) if reverse else {instance.pk}
+    elif action == 'post_clear':
+        lineage.rebuild(getattr(instance, '_lineage_roots', ()))
+
+
+@receiver(m2m_changed, sender=Person.parents.through)
+def update_family_units(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Move children whose parents changed to the unit of their new parents.
+    Runs after update_lineage, which remembers the roots of a clear.
+    """
+    if action in ('post_add', 'post_remove'):
+        units.assign(pk_set if reverse else {instance.pk})
+    elif action == 'post_clear':
+        units.assign(getattr(instance, '_lineage_roots', ()))
+
+
+@receiver(m2m_changed, sender=Person.parents.through)
+@receiver(m2m_changed, sender=Person.partners.through)
+def count_links(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Keep the parent, child and partner counters in step with the links.
+    Additions only report new links and are counted with F() updates,
+    removals are recounted from the remaining rows.
+    """
+    if sender is Person.partners.through:
+        manager, own, other = 'partners', 'partner_count', 'partner_count'
+    elif reverse:
+        manager, own, other = 'children', 'child_count', 'parent_count'
+    else:
+        manager, own, other = 'parents', 'parent_count', 'child_count'
+
+    if action == 'post_add' and pk_set:
+        counters.add([instance.pk], own, len(pk_set))
+        counters.add(pk_set, other, 1)
+    elif action == 'post_remove':
+        counters.recount({instance.pk, *pk_set})
+    elif action == 'pre_clear':
+        instance._cleared_links = set(
+            getattr(instance, manager).values_list('pk', flat=True))
+    elif action == 'post_clear':
+        counters.recount(
+            {instance.pk, *getattr(instance, '_cleared_links', ())})
+
+
+@receiver(m2m_changed, sender=FamilyTree.person.through)
+def count_tree_members(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Keep the person counter of family trees in step with their members.
+    """
+    if action == 'post_add' and pk_set:
+        if reverse:
+            FamilyTree.objects.filter(pk__in=pk_set).update(
+                person_count=F('person_count') + 1)
+        else:
+            FamilyTree.objects.filter(pk=instance.pk).update(
+                person_count=F('person_count') + len(pk_set))
+    elif action in ('post_remove', 'post_clear'):
+        counters.recount_trees(instance.owner_id)
+
+
+@receiver(pre_delete, sender=Person)
+def remember_children(sender, instance, origin=None, **kwargs):
+    """
+    Remember the relatives and trees of a deleted person, their
+    lineage, family units and counters are updated once it is gone.
+    Whole-account deletions remove the entire tree and are skipped.
+    """
+    if getattr(origin, 'model', type(origin)) is Person:
+        instance._lineage_children = list(
+            instance.children.values_list('pk', flat=True)
+        )
+        instance._counted_links = counters.neighbours([instance.pk])
+        instance._counted_trees = list(
+            instance.persons.values_list('pk', flat=True))
+        instance._birth_unit = Person.objects.filter(
+            pk=instance.pk).values_list('birth_unit_id', flat=True).first()
+
+
+@receiver(post_delete, sender=Person)
+def rebuild_lineage(sender, instance, **kwargs):
+    """
+    Rebuild the lineage, family units and counters of the relatives
+    of a deleted person.
+    """
+    children = getattr(instance, '_lineage_children', ())
+    lineage.rebuild(children)
+    units.assign(children)
+    counters.recount(getattr(instance, '_counted_links', ()))
+    FamilyTree.objects.filter(
+        pk__in=getattr(instance, '_counted_trees', ())
+        ).update(person_count=F('person_count') - 1)
+    birth_unit = getattr(instance, '_birth_unit', None)
+    if birth_unit:
+        counters.recount_siblings([birth_unit])
+        FamilyUnit.objects.filter(
+            pk=birth_unit, children__isnull=True).delete()
+
+
+@receiver(post_save, sender=Person)
+@receiver(post_delete, sender=Person)
+def invalidate_person_graph(sender, instance, **kwargs):
+    """
+    Drop the cached graph of the owner when a person changes.
+    """
+    graph_cache.invalidate(instance.owner_id)
+
+
+@receiver(m2m_changed, sender=Person.parents.through)
+@receiver(m2m_changed, sender=Person.partners.through)
+def invalidate_link_graph(sender, instance, action, **kwargs):
+    """
+    Drop the cached graph of the owner when parents or partners change.
+    """
+    if action.startswith('post_'):
+        graph_cache.invalidate(instance.owner_id)
+
+
+@receiver(tree_bulk_changed)
+def refresh_after_bulk_change(sender, owner_id, person_ids, **kwargs):
+    """
+    Bring derived data up to date after a bulk write.
+    """
+    lineage.rebuild(person_ids)
+    units.assign(person_ids)
+    counters.refresh(owner_id, person_ids)
+    cards.bump(person_ids)
+    freshness.touch(owner_id)
+    graph_cache.invalidate(owner_id)
+    search.index(person_ids)
+
+
+@receiver(post_save, sender=Person)
+def store_staged_image(sender, instance, **kwargs):
+    """Store a staged image once the saving transaction commits."""
+    staged = instance.__dict__.pop('_staged_image', None)
+    if staged:
+        transaction.on_commit(
+            lambda: tasks.submit(images.process, instance.pk, *staged))
+
+
+@receiver(post_save, sender=Person)
+def index_person(sender, instance, **kwargs):
+    """Keep the search index in step with the person."""
+    search.index([instance.pk])
+
+
+@receiver(post_delete, sender=Person)
+def unindex_person(sender, instance, **kwargs):
+    """Drop a deleted person from the search index."""
+    search.remove([instance.pk])
+
+
+@receiver(post_save, sender=Person)
+def bump_person_card(sender, instance, **kwargs):
+    """Retire the cached cards of a saved person, this also covers
+    stored images."""
+    instance.card_version = cards.bump([instance.pk])
+
+
+@receiver(m2m_changed, sender=Person.parents.through)
+@receiver(m2m_changed, sender=Person.partners.through)
+def bump_linked_cards(sender, instance, action, pk_set, **kwargs):
+    """Retire the cached cards of persons whose links changed.
+    Runs after count_links, which remembers the links of a clear.
+    """
+    if action in ('post_add', 'post_remove'):
+        cards.bump({instance.pk, *pk_set})
+    elif action == 'post_clear':
+        cards.bump({instance.pk, *getattr(instance, '_cleared_links', ())})
+
+
+@receiver(post_save, sender=FamilyRelation)
+@receiver(post_delete, sender=FamilyRelation)
+def bump_relation_cards(sender, instance, **kwargs):
+    """Retire the cached cards of both sides of a relation."""
+    cards.bump([instance.from_person_id, instance.to_person_id])
+
+
+@receiver(post_save, sender=Person)
+@receiver(post_delete, sender=Person)
+def touch_person_tree(sender, instance, **kwargs):
+    """Mark the tree of a saved or deleted person as changed."""
+    freshness.touch(instance.owner_id)
+
+
+@receiver(m2m_changed, sender=Person.parents.through)
+@receiver(m2m_changed, sender=Person.partners.through)
+@receiver(m2m_changed, sender=FamilyTree.person.through)
+def touch_linked_tree(sender, instance, action, **kwargs):
+    """Mark the tree as changed when links or members change."""
+    if action.startswith('post_'):
+        freshness.touch(instance.owner_id)
+
+
+@receiver(post_save, sender=FamilyRelation)
+@receiver(post_delete, sender=FamilyRelation)
+def touch_relation_tree(sender, instance, origin=None, **kwargs):
+    """Mark the tree of a relation as changed. Relations deleted along
+    with a person are skipped, deleting the person touches the tree.
+    """
+    if getattr(origin, 'model', type(origin)) is Person:
+        return
+    if FamilyRelation.from_person.is_cached(instance):
+        owner_id = instance.from_person.owner_id
+    else:
+        owner_id = Person.objects.filter(
+            pk=instance.from_person_id
+            ).values_list('owner_id', flat=True).first()
+    freshness.touch(owner_id)
+
+
+@receiver(post_save, sender=FamilyTree)
+def touch_saved_tree(sender, instance, created, **kwargs):
+    """Mark a tree as changed when its main person is replaced."""
+    if not created:
+        freshness.touch(instance.owner_id)
@@ -0,0 +1,33 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'FAMILYTREE_TASK_WORKERS', 2),
+    thread_name_prefix='familytree-task',
+)
+
+
+def _run(func, args, kwargs):
+    try:
+        func(*args, **kwargs)
+    except Exception:
+        logger.exception("Background task %s failed", func.__name__)
+        raise
+    finally:
+        # Every worker thread opens its own connections, close them.
+        connections.close_all()
+
+
+def submit(func, *args, **kwargs):
+    """Run a function outside the request cycle in a worker thread.
+    With the FAMILYTREE_TASKS_EAGER setting it runs right away instead,
+    which is what the tests use.
+    """
+    if getattr(settings, 'FAMILYTREE_TASKS_EAGER', False):
+        func(*args, **kwargs)
+        return None
+    return _executor.submit(_run, func, args, kwargs)
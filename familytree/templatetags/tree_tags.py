@@ -1,29 +1,90 @@
 # familytree/templatetags/tree_tags.py
+from collections import defaultdict
 from django import template
 from familytree.models import Person
+from familytree import cards, images
+from django.utils.html import format_html
 from django.utils.safestring import mark_safe
 
 register = template.Library()
 
+ParentLink = Person.parents.through
+
+
+@register.simple_tag
+def show_family_tree(person, max_depth=10):
+    """Render the descendants of a person as nested lists.
+    Descendants are fetched one generation per query down to max_depth
+    generations. Everyone is placed once, which also breaks cycles.
+    """
+    if not person:
+        return mark_safe("<ul></ul>")
+
+    names = {person.pk: (person.first_name, person.last_name)}
+    children = defaultdict(list)
+    generation = [person.pk]
+    depth = 0
+    while generation and depth < max_depth:
+        rows = ParentLink.objects.filter(
+            to_person_id__in=generation
+            ).values_list(
+                'to_person_id', 'from_person_id',
+                'from_person__first_name', 'from_person__last_name'
+            ).order_by('from_person_id')
+        generation = []
+        for parent_id, child_id, first_name, last_name in rows:
+            if child_id in names:
+                continue
+            names[child_id] = (first_name, last_name)
+            children[parent_id].append(child_id)
+            generation.append(child_id)
+        depth += 1
+
+    # Depth-first walk with an explicit stack, closing tags are
+    # pushed as plain strings between the person ids.
+    parts = ["<ul>"]
+    stack = [person.pk]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, str):
+            parts.append(item)
+            continue
+        parts.append(format_html(
+            '<li><div class="person">{} {}</div>', *names[item]))
+        if children[item]:
+            parts.append("<ul>")
+            stack.append("</ul></li>")
+            stack.extend(reversed(children[item]))
+        else:
+            parts.append("</li>")
+    parts.append("</ul>")
+    return mark_safe("".join(parts))
+
+
+@register.filter
+def image_url(person):
+    """Get the image url of a person from the configured backend,
+    empty for persons without an own image.
+    """
+    return images.image_url(person)
+
+
+@register.simple_tag
+def card_image(person):
+    """Get the card image urls of a person, None for the placeholder.
+    Views showing many cards set them up front with
+    images.attach_card_images.
+    """
+    if not hasattr(person, 'card_image'):
+        person.card_image = images.card_images([person]).get(person.pk)
+    return person.card_image
+
 
 @register.simple_tag
-def show_family_tree(person):
-    def render_node(p):
-        if not p:
-            return ""
-
-        children_html = "".join([
-            render_node(child) for child in p.children.all()
-            ])
-
-        return f"""
-        <li>
-            <div class="person">
-                {p.first_name} {p.last_name}
-            </div>
-            {"<ul>" + children_html + "</ul>" if children_html else ""}
-        </li>
-        """
-
-    html = f"<ul>{render_node(person)}</ul>"
-    return mark_safe(html)
+def person_card(person, pov_id):
+    """Get the cached card markup of a person seen from pov_id.
+    Views showing many cards set them up front with cards.attach_cards.
+    """
+    if not hasattr(person, 'card_html'):
+        person.card_html = cards.render_cards([person], pov_id)[person.pk]
+    return person.card_html
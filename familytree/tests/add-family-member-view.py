@@ -1,5 +1,7 @@
+from unittest.mock import patch
 from django.test import TestCase, Client
-from familytree.models import Person
+from familytree.models import Person, FamilyUnit
+from familytree import units
 from django.contrib.auth.models import User
 from django.urls import reverse
 
@@ -114,6 +116,28 @@ class AddFamilyMemberViewTest(TestCase):
         self.assertRedirects(response, reverse(
             "family_view", args=[self.main_person.id]))
 
+    def test_sibling_joins_family_unit(self):
+        """A sibling gets all parents at once and joins the unit of the
+        main person without passing through other units."""
+        parents = [
+            Person.objects.create(
+                owner=self.user, first_name=name, last_name="Parent")
+            for name in ("Omar", "Layla")
+        ]
+        self.main_person.parents.add(*parents)
+        data = {
+            "first_name": "Zaynab",
+            "last_name": "Sibling",
+            "relation_type": "sibling",
+        }
+        with patch.object(units, "assign", wraps=units.assign) as assign:
+            self.client.post(self.get_url("sibling"), data)
+        self.assertEqual(assign.call_count, 1)
+        sibling = Person.objects.get(first_name="Zaynab")
+        self.main_person.refresh_from_db()
+        self.assertEqual(sibling.birth_unit_id, self.main_person.birth_unit_id)
+        self.assertEqual(FamilyUnit.objects.count(), 1)
+
     def test_post_creates_parent_correctly(self):
         data = {
             "first_name": "Fatima",
@@ -0,0 +1,110 @@
+from django.db import connection
+from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth.models import User
+from django.urls import reverse
+from familytree.models import Person, FamilyTree, FamilyRelation
+from familytree.search import search
+
+
+class AddFamilyMembersViewTest(TestCase):
+    """Test suite for the add_family_members batch view."""
+
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username="batch",
+                                             password="testpass")
+        self.client.login(username="batch", password="testpass")
+        self.main_person = Person.objects.create(
+            owner=self.user, first_name="Ali", last_name="Main")
+        self.mother = Person.objects.create(
+            owner=self.user, first_name="Khadija", last_name="Main")
+
+    def get_url(self, relation="child"):
+        return reverse("add_family_members") + (
+            f"?relation={relation}&person_id={self.main_person.id}")
+
+    def post(self, names, relation="child", relation_type=None):
+        data = {
+            "form-TOTAL_FORMS": str(len(names) + 1),
+            "form-INITIAL_FORMS": "0",
+            "relation_type": relation_type or relation,
+        }
+        for i, name in enumerate(names):
+            data[f"form-{i}-first_name"] = name
+            data[f"form-{i}-last_name"] = "Main"
+        return self.client.post(self.get_url(relation), data)
+
+    def test_get_renders_formset(self):
+        """The page shows several empty person rows."""
+        response = self.client.get(self.get_url())
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "form-4-first_name")
+
+    def test_children_added_in_one_request(self):
+        """All filled rows become children, empty rows are skipped."""
+        names = [f"Child {chr(65 + i)}" for i in range(10)]
+        response = self.post(names)
+        self.assertRedirects(
+            response, reverse("family_view", args=[self.main_person.id]))
+
+        children = self.main_person.children.all()
+        self.assertEqual(children.count(), 10)
+        self.assertEqual(
+            FamilyRelation.objects.filter(
+                from_person=self.main_person, relation_type="child").count(),
+            10)
+        tree = FamilyTree.objects.get(owner=self.user)
+        self.assertEqual(tree.person.filter(first_name__startswith="Child")
+                         .count(), 10)
+        self.assertEqual(
+            set(Person.objects.descendants(self.main_person)), set(children))
+
+    def test_query_count_does_not_grow(self):
+        """Ten children cost as many queries as two."""
+        self.post(["One", "Two"])
+        with CaptureQueriesContext(connection) as two:
+            self.post(["Three", "Four"])
+        with CaptureQueriesContext(connection) as ten:
+            self.post([f"Name {chr(65 + i)}" for i in range(10)])
+        self.assertEqual(len(ten), len(two))
+
+    def test_siblings_share_parents(self):
+        """New siblings get every parent of the main person."""
+        self.main_person.parents.add(self.mother)
+        self.post(["Hasan", "Husain"], relation="sibling")
+        self.assertEqual(
+            set(self.main_person.siblings().values_list(
+                "first_name", flat=True)),
+            {"Hasan", "Husain"})
+
+    def test_parents_become_ancestors(self):
+        """New parents show up as ancestors of the main person."""
+        self.post(["Omar"], relation="parent")
+        self.assertEqual(
+            [p.first_name for p in Person.objects.ancestors(self.main_person)],
+            ["Omar"])
+
+    def test_partners_are_symmetric_and_searchable(self):
+        """Partners link both ways and are in the search index."""
+        self.post(["Layla"], relation="partner")
+        layla = Person.objects.get(first_name="Layla")
+        self.assertIn(self.main_person, layla.partners.all())
+        self.assertEqual(
+            [hit["id"] for hit in search(self.user.pk, "layla")], [layla.id])
+
+    def test_invalid_row_saves_nothing(self):
+        """A row with errors keeps the form and adds nobody."""
+        response = self.post(["Valid", "B4d"])
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(self.main_person.children.exists())
+
+    def test_other_owner_is_404(self):
+        """The main person has to belong to the user."""
+        other = User.objects.create_user(username="other", password="pass")
+        stranger = Person.objects.create(
+            owner=other, first_name="Ali", last_name="X")
+        response = self.client.get(
+            reverse("add_family_members")
+            + f"?relation=child&person_id={stranger.id}")
+        self.assertEqual(response.status_code, 404)
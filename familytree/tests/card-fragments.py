@@ -0,0 +1,104 @@
+from unittest.mock import patch
+from django.core.cache import caches
+from django.test import TestCase, Client
+from django.contrib.auth.models import User
+from django.urls import reverse
+from familytree.models import Person, FamilyRelation
+from familytree import cards
+
+
+class CardFragmentTest(TestCase):
+    """Test suite for the versioned person card cache."""
+
+    def setUp(self):
+        caches["fragments"].clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username="cards", password="pass")
+        self.client.login(username="cards", password="pass")
+        self.person = self.make("Rashid")
+        self.children = [self.make(f"Child{i}") for i in range(200)]
+        self.person.children.add(*self.children)
+
+    def make(self, first_name):
+        return Person.objects.create(
+            owner=self.user, first_name=first_name, last_name="Card")
+
+    def render(self, persons):
+        with patch.object(cards, "render_to_string",
+                          wraps=cards.render_to_string) as render:
+            html = cards.render_cards(persons, self.person.id)
+        return html, render.call_count
+
+    def test_cards_are_rendered_once(self):
+        """A second render reads every card from the cache."""
+        first, rendered = self.render(self.children)
+        self.assertEqual(rendered, 200)
+        second, rendered = self.render(self.children)
+        self.assertEqual(rendered, 0)
+        self.assertEqual(first, second)
+        self.assertIn("Child7 Card", second[self.children[7].pk])
+
+    def test_family_view_uses_cached_cards(self):
+        """The family view with 200 cards renders none of them again."""
+        url = reverse("family_view", args=[self.person.id])
+        self.client.get(url)
+        with patch.object(cards, "render_to_string",
+                          wraps=cards.render_to_string) as render:
+            response = self.client.get(url)
+        self.assertEqual(render.call_count, 0)
+        self.assertContains(response, "Child199 Card")
+
+    def test_save_bumps_version(self):
+        """Editing a person renders its card again with the new data."""
+        self.render(self.children[:2])
+        self.children[0].first_name = "Renamed"
+        self.children[0].save()
+        html, rendered = self.render(self.children[:2])
+        self.assertEqual(rendered, 1)
+        self.assertIn("Renamed Card", html[self.children[0].pk])
+
+    def test_relation_changes_bump_version(self):
+        """Link and relation changes retire the cards of both sides."""
+        sister = self.make("Amal")
+        self.render([self.person, sister])
+        FamilyRelation.objects.create(
+            from_person=self.person, to_person=sister,
+            relation_type="sibling")
+        self.assertEqual(self.render(self.reload(self.person, sister))[1], 2)
+        sister.partners.add(self.children[0])
+        self.assertEqual(self.render(self.reload(self.person, sister))[1], 1)
+
+    def reload(self, *persons):
+        return Person.objects.filter(
+            pk__in=[p.pk for p in persons]).order_by("pk")
+
+    def test_other_pov_reuses_cards(self):
+        """Only the links depend on the POV, cards rendered for one POV
+        serve every other one."""
+        self.render(self.children)
+        with patch.object(cards, "render_to_string",
+                          wraps=cards.render_to_string) as render:
+            html = cards.render_cards(self.children, self.children[0].id)
+        self.assertEqual(render.call_count, 1)
+        self.assertIn(
+            reverse("view_details", args=[self.children[0].id,
+                                          self.children[1].id]),
+            html[self.children[1].pk])
+        self.assertNotIn(str(cards.POV_MARK), html[self.children[1].pk])
+
+    def test_cards_cost_no_queries(self):
+        """Cached cards are read without touching the database."""
+        self.render(self.children)
+        with self.assertNumQueries(0):
+            cards.render_cards(self.children, self.person.id)
+
+    def test_cards_depend_on_pov(self):
+        """Cards seen from another person are cached separately."""
+        html = cards.render_cards([self.children[0]], self.children[0].id)
+        self.assertNotIn(
+            reverse("family_view", args=[self.children[0].id]),
+            html[self.children[0].pk])
+        html = cards.render_cards([self.children[0]], self.person.id)
+        self.assertIn(
+            reverse("family_view", args=[self.children[0].id]),
+            html[self.children[0].pk])
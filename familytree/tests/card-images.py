@@ -0,0 +1,57 @@
+from unittest.mock import patch
+from django.core.cache import caches
+from django.test import TestCase, Client
+from django.contrib.auth.models import User
+from django.urls import reverse
+from familytree.models import Person
+from familytree import images
+
+
+class CardImagesTest(TestCase):
+    """Test suite for the batched card image urls."""
+
+    def setUp(self):
+        caches["fragments"].clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username="cards", password="pass")
+        self.client.login(username="cards", password="pass")
+        self.pov = Person.objects.create(
+            owner=self.user, first_name="Amina", last_name="Core",
+            featured_image="image/upload/v1/group.jpg")
+        self.sister = Person.objects.create(
+            owner=self.user, first_name="Huda", last_name="Core",
+            featured_image="image/upload/v1/group.jpg")
+        self.parent = Person.objects.create(
+            owner=self.user, first_name="Omar", last_name="Core")
+        self.pov.parents.add(self.parent)
+        self.sister.parents.add(self.parent)
+
+    def test_sized_urls(self):
+        """Every image gets a small src and a srcset of all widths."""
+        card = images.card_images([self.pov])[self.pov.id]
+        self.assertIn("w_100", card["src"])
+        for width in images.CARD_WIDTHS:
+            self.assertIn(f" {width}w", card["srcset"])
+
+    def test_placeholder_left_out(self):
+        """Persons without an own image get no urls."""
+        self.assertNotIn(self.parent.id, images.card_images([self.parent]))
+
+    def test_shared_image_built_once_and_cached(self):
+        """Urls are built once per image and then served from the cache.
+        """
+        persons = [self.pov, self.sister, self.parent]
+        with patch.object(images.CloudinaryBackend, "url",
+                          autospec=True, return_value="u") as url:
+            first = images.card_images(persons)
+            self.assertEqual(url.call_count, len(images.CARD_WIDTHS))
+            self.assertEqual(images.card_images(persons), first)
+            self.assertEqual(url.call_count, len(images.CARD_WIDTHS))
+        self.assertEqual(first[self.pov.id], first[self.sister.id])
+
+    def test_family_view_cards(self):
+        """Cards on the family page are lazy and responsive."""
+        response = self.client.get(reverse("family_view", args=[self.pov.id]))
+        self.assertContains(response, 'loading="lazy"')
+        self.assertContains(response, 'sizes="100px"')
+        self.assertContains(response, "w_300")
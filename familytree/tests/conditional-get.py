@@ -0,0 +1,94 @@
+from django.test import TestCase, Client
+from django.contrib.auth.models import User
+from django.urls import reverse
+from django.utils.http import http_date
+from familytree.models import Person, FamilyTree, FamilyRelation
+
+
+class ConditionalGetTest(TestCase):
+    """Test suite for the ETag and Last-Modified answers of tree pages."""
+
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username="etag", password="pass")
+        self.client.login(username="etag", password="pass")
+        self.person = Person.objects.create(
+            owner=self.user, first_name="Samira", last_name="Tag")
+        self.child = Person.objects.create(
+            owner=self.user, first_name="Jamal", last_name="Tag")
+        self.child.parents.add(self.person)
+        self.urls = [
+            reverse("family_view", args=[self.person.id]),
+            reverse("classic_tree_view", args=[self.person.id]),
+            reverse("view_details", args=[self.person.id, self.child.id]),
+        ]
+
+    def version(self):
+        return FamilyTree.objects.get(owner=self.user).version
+
+    def test_unchanged_tree_answers_304(self):
+        """A repeated request is answered without running the view."""
+        for url in self.urls:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertIn("no-cache", response["Cache-Control"])
+            # Session, user and tree version.
+            with self.assertNumQueries(3):
+                repeat = self.client.get(
+                    url, HTTP_IF_NONE_MATCH=response["ETag"])
+            self.assertEqual(repeat.status_code, 304)
+
+    def test_if_modified_since(self):
+        """Browsers without the ETag are answered by date."""
+        response = self.client.get(self.urls[0])
+        repeat = self.client.get(
+            self.urls[0], HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+        self.assertEqual(repeat.status_code, 304)
+        stale = self.client.get(
+            self.urls[0], HTTP_IF_MODIFIED_SINCE=http_date(0))
+        self.assertEqual(stale.status_code, 200)
+
+    def test_changes_raise_version(self):
+        """Person, link and relation writes all change the tree."""
+        steps = [
+            lambda: self.person.save(),
+            lambda: self.child.parents.clear(),
+            lambda: self.person.partners.add(self.child),
+            lambda: FamilyRelation.objects.create(
+                from_person=self.person, to_person=self.child,
+                relation_type="partner"),
+            lambda: self.child.delete(),
+        ]
+        for step in steps:
+            before = self.version()
+            step()
+            self.assertGreater(self.version(), before)
+
+    def test_deploy_changes_etag(self):
+        """Pages of an older deploy are not reused."""
+        with self.settings(FAMILYTREE_RELEASE="v41"):
+            etag = self.client.get(self.urls[0])["ETag"]
+        with self.settings(FAMILYTREE_RELEASE="v42"):
+            response = self.client.get(
+                self.urls[0], HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("v42", response["ETag"])
+
+    def test_changed_tree_is_rendered(self):
+        """A stale ETag gets the new page."""
+        etag = self.client.get(self.urls[0])["ETag"]
+        self.person.first_name = "Samia"
+        self.person.save()
+        response = self.client.get(self.urls[0], HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertContains(response, "Samia")
+
+    def test_other_user_gets_own_page(self):
+        """An ETag of another user never matches."""
+        etag = self.client.get(self.urls[1])["ETag"]
+        other = User.objects.create_user(username="other", password="pass")
+        Person.objects.create(owner=other, first_name="Other", last_name="X")
+        self.client.login(username="other", password="pass")
+        response = self.client.get(self.urls[1], HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 404)
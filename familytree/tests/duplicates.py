@@ -0,0 +1,91 @@
+from datetime import date
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase
+from django.contrib.auth.models import User
+from familytree.models import Person
+from familytree import duplicates
+from familytree.duplicates import find_duplicates, soundex
+
+
+class DuplicateFinderTest(TestCase):
+    """Test suite for the blocked duplicate person finder."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="dupes", password="pass")
+        self.mohammed = Person.objects.create(
+            owner=self.user, first_name="Mohammed", last_name="Khayyam",
+            birth_date=date(1048, 5, 18), birth_country="IR")
+        self.muhammad = Person.objects.create(
+            owner=self.user, first_name="Muhammad", last_name="Khayam",
+            birth_date=date(1048, 5, 18), birth_country="IR")
+        self.son = Person.objects.create(
+            owner=self.user, first_name="Mohammed", last_name="Khayyam",
+            birth_date=date(1080, 1, 1), birth_country="EG")
+        self.layla = Person.objects.create(
+            owner=self.user, first_name="Layla", last_name="Khayyam",
+            birth_date=date(1048, 5, 18), birth_country="IR")
+
+    def test_soundex(self):
+        """Names sounding alike share a code."""
+        self.assertEqual(soundex("Robert"), "R163")
+        self.assertEqual(soundex("Rupert"), "R163")
+        self.assertEqual(soundex("Ashcraft"), "A261")
+        self.assertEqual(soundex("Tymczak"), "T522")
+        self.assertEqual(soundex("Özil"), soundex("Ozil"))
+        self.assertEqual(soundex(""), "")
+
+    def test_finds_spelling_variants(self):
+        """Phonetic variants born the same day are the only candidates."""
+        pairs = find_duplicates(self.user.pk)
+        self.assertEqual([pair[1:] for pair in pairs],
+                         [(self.mohammed.id, self.muhammad.id)])
+
+    def test_missing_data_still_compared(self):
+        """A person without birth data is compared by name."""
+        bare = Person.objects.create(
+            owner=self.user, first_name="Mohammed", last_name="Khayyam")
+        found = {pair[1:] for pair in find_duplicates(self.user.pk)}
+        self.assertIn((self.mohammed.id, bare.id), found)
+
+    def test_different_names_not_compared(self):
+        """Persons only get scored against phonetically equal names."""
+        calls = []
+        original = duplicates.score
+
+        def counting(a, b):
+            calls.append((a["id"], b["id"]))
+            return original(a, b)
+
+        duplicates.score = counting
+        try:
+            find_duplicates(self.user.pk)
+        finally:
+            duplicates.score = original
+        self.assertNotIn(self.layla.id, {i for pair in calls for i in pair})
+
+    def test_large_block_is_split(self):
+        """Oversized blocks are split by birth year and country, and
+        oversized sub-blocks compare neighbours by birth date only."""
+        people = [
+            {"id": i, "birth_date": date(1900 + 10 * i, 1, 1),
+             "birth_country": f"C{i}"}
+            for i in range(6)
+        ]
+        duplicates.MAX_BLOCK, duplicates.WINDOW = 3, 2
+        try:
+            pairs = list(duplicates.candidate_pairs(people))
+            window = list(duplicates._pairs(people, split=False))
+        finally:
+            duplicates.MAX_BLOCK, duplicates.WINDOW = 200, 20
+        # Decades apart and from different countries nobody meets.
+        self.assertEqual(pairs, [])
+        self.assertEqual(len(window), 9)
+
+    def test_command(self):
+        """The command lists the ranked pairs."""
+        out = StringIO()
+        call_command("find_duplicates", "dupes", stdout=out)
+        self.assertIn("Muhammad Khayam", out.getvalue())
+        self.assertIn("Found 1 candidate pairs.", out.getvalue())
@@ -42,3 +42,98 @@ class EntireTreeViewTest(TestCase):
         self.assertIn("pov", response.context)
         self.assertEqual(response.context["pov"], self.pov)
         self.assertContains(response, "Ismail")
+
+    def test_relatives_are_in_context(self):
+        """Grandparents, partner parents, siblings and children
+        should be resolved from the family graph."""
+        parent = Person.objects.create(
+            owner=self.user, first_name="Omar", last_name="Tree")
+        grandparent = Person.objects.create(
+            owner=self.user, first_name="Nasir", last_name="Tree")
+        partner = Person.objects.create(
+            owner=self.user, first_name="Layla", last_name="Partner")
+        partner_parent = Person.objects.create(
+            owner=self.user, first_name="Hind", last_name="Partner")
+        sibling = Person.objects.create(
+            owner=self.user, first_name="Zahra", last_name="Tree")
+        child = Person.objects.create(
+            owner=self.user, first_name="Salim", last_name="Tree")
+        self.pov.parents.add(parent)
+        parent.parents.add(grandparent)
+        sibling.parents.add(parent)
+        self.pov.partners.add(partner)
+        partner.parents.add(partner_parent)
+        child.parents.add(self.pov)
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.context["parents"], [parent])
+        self.assertEqual(response.context["grandparents"], [grandparent])
+        self.assertEqual(response.context["partners"], [partner])
+        self.assertEqual(
+            response.context["partner_parents"], [partner_parent])
+        self.assertEqual(response.context["siblings"], [sibling])
+        self.assertEqual(response.context["children"], [child])
+
+    def make_line(self, first_name, count):
+        """Create count generations of ancestors above the POV."""
+        line, child = [], self.pov
+        for number in range(1, count + 1):
+            parent = Person.objects.create(
+                owner=self.user, first_name=f"{first_name}{number}",
+                last_name="Tree")
+            child.parents.add(parent)
+            line.append(parent)
+            child = parent
+        return line
+
+    def test_eight_generations_of_ancestors(self):
+        """?up= shows every generation with a bounded number of queries."""
+        line = self.make_line("Ancestor", 8)
+        self.client.get(self.url)
+        # Session, user, tree state with the main person, POV, version
+        # of the cached graph, generations and the persons themselves.
+        with self.assertNumQueries(7):
+            response = self.client.get(self.url, {"up": 8})
+        levels = response.context["ancestor_levels"]
+        self.assertEqual(len(levels), 7)
+        self.assertEqual(levels[0]["title"],
+                         "Great-great-great-great-great-great-grandparents")
+        self.assertEqual(levels[0]["persons"], [line[7]])
+        self.assertEqual(levels[-1]["title"], "Grandparents")
+        self.assertEqual(response.context["parents"], [line[0]])
+        self.assertContains(response, "Ancestor8 Tree")
+
+    def test_generations_default_and_limit(self):
+        """Grandparents and children are shown by default, invalid
+        values fall back to it and large ones are capped."""
+        line = self.make_line("Ancestor", 3)
+        for value in ("x", "-3", "\u00b2", "9" * 5000):
+            response = self.client.get(self.url, {"up": value})
+            self.assertEqual(response.context["grandparents"], [line[1]])
+            self.assertEqual(len(response.context["ancestor_levels"]), 1)
+        with self.settings(FAMILYTREE_MAX_GENERATIONS=1):
+            response = self.client.get(self.url, {"up": 5})
+        self.assertEqual(response.context["up"], 1)
+        self.assertEqual(response.context["ancestor_levels"], [])
+
+    def test_descendant_generations(self):
+        """?down= adds grandchildren below the children, ?up=0 hides
+        the parents."""
+        parent = Person.objects.create(
+            owner=self.user, first_name="Omar", last_name="Tree")
+        child = Person.objects.create(
+            owner=self.user, first_name="Salim", last_name="Tree")
+        grandchild = Person.objects.create(
+            owner=self.user, first_name="Yusuf", last_name="Tree")
+        self.pov.parents.add(parent)
+        child.parents.add(self.pov)
+        grandchild.parents.add(child)
+
+        response = self.client.get(self.url, {"up": 0, "down": 2})
+        self.assertEqual(response.context["parents"], [])
+        self.assertEqual(response.context["children"], [child])
+        levels = response.context["descendant_levels"]
+        self.assertEqual(levels, [
+            {"title": "Grandchildren", "persons": [grandchild]}])
+        self.assertContains(response, "Yusuf Tree")
@@ -0,0 +1,87 @@
+from django.test import TestCase
+from django.contrib.auth.models import User
+from familytree.models import Person, FamilyUnit
+from familytree.batch import add_relatives
+from familytree.merge import merge_persons
+
+
+class FamilyUnitTest(TestCase):
+    """Test suite for the family units behind sibling lookups."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="unit", password="pass")
+        self.father = self.make("Idris")
+        self.mother = self.make("Amina")
+        self.second_wife = self.make("Layla")
+        self.first = self.make("Hassan")
+        self.second = self.make("Hussein")
+        self.half = self.make("Zainab")
+        for child in (self.first, self.second):
+            child.parents.add(self.father, self.mother)
+        self.half.parents.add(self.father, self.second_wife)
+
+    def make(self, first_name):
+        return Person.objects.create(
+            owner=self.user, first_name=first_name, last_name="Unit")
+
+    def reload(self, *persons):
+        for person in persons:
+            person.refresh_from_db()
+
+    def test_children_share_unit(self):
+        """Children of the same parents point to one unit."""
+        self.reload(self.first, self.second, self.half)
+        self.assertIsNotNone(self.first.birth_unit_id)
+        self.assertEqual(self.first.birth_unit_id, self.second.birth_unit_id)
+        self.assertNotEqual(self.first.birth_unit_id, self.half.birth_unit_id)
+        self.assertQuerySetEqual(
+            self.first.birth_unit.parents.order_by('id'),
+            [self.father, self.mother])
+
+    def test_siblings(self):
+        """siblings finds full and half siblings, full_siblings only
+        those sharing all parents."""
+        self.reload(self.first)
+        self.assertQuerySetEqual(
+            self.first.siblings().order_by('id'), [self.second, self.half])
+        self.assertQuerySetEqual(
+            self.first.full_siblings(), [self.second])
+        self.assertQuerySetEqual(self.father.siblings(), [])
+
+    def test_sibling_lookup_is_single_query(self):
+        """Sibling lookups do not walk the parents."""
+        self.reload(self.first)
+        with self.assertNumQueries(1):
+            list(self.first.siblings())
+
+    def test_parent_change_moves_child(self):
+        """Removing a parent moves the child to a new unit and drops
+        units left without children."""
+        self.reload(self.half)
+        old_unit = self.half.birth_unit_id
+        self.half.parents.remove(self.second_wife)
+        self.reload(self.half)
+        self.assertNotEqual(self.half.birth_unit_id, old_unit)
+        self.assertFalse(FamilyUnit.objects.filter(pk=old_unit).exists())
+        self.half.parents.clear()
+        self.reload(self.half)
+        self.assertIsNone(self.half.birth_unit_id)
+
+    def test_deleted_parent(self):
+        """Children of a deleted parent are regrouped."""
+        self.mother.delete()
+        self.reload(self.first, self.second)
+        self.assertEqual(self.first.birth_unit.key, str(self.father.pk))
+        self.assertEqual(self.first.birth_unit_id, self.second.birth_unit_id)
+
+    def test_bulk_writers(self):
+        """Batch adds and merges keep the units up to date."""
+        self.reload(self.first)
+        added = add_relatives(self.first, 'sibling', 'sibling',
+                              [Person(first_name="Ali", last_name="Unit")])
+        self.reload(*added)
+        self.assertEqual(added[0].birth_unit_id, self.first.birth_unit_id)
+
+        merge_persons(self.mother, self.second_wife)
+        self.reload(self.first, self.half)
+        self.assertEqual(self.half.birth_unit_id, self.first.birth_unit_id)
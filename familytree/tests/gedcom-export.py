@@ -0,0 +1,136 @@
+import io
+from datetime import date
+from django.test import TestCase, Client
+from django.contrib.auth.models import User
+from django.urls import reverse
+from familytree.models import Person, FamilyRelation
+from familytree.gedcom import (
+    export_gedcom, family_units, import_gedcom, parse, MAX_VALUE_LENGTH)
+
+
+class GedcomExportTest(TestCase):
+    """Test suite for the streaming GEDCOM export."""
+
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username="exporter", password="pass")
+        self.client.login(username="exporter", password="pass")
+        self.father = Person.objects.create(
+            owner=self.user, first_name="Omar", last_name="Senior",
+            nickname="Abu Salim", birth_date=date(1950, 1, 2),
+            birth_place="Tunis")
+        self.mother = Person.objects.create(
+            owner=self.user, first_name="Layla", last_name="Senior",
+            bio="Loved\ngardening")
+        self.child = Person.objects.create(
+            owner=self.user, first_name="Salim", last_name="Senior")
+        self.ex = Person.objects.create(
+            owner=self.user, first_name="Mona", last_name="Ex")
+        self.child.parents.add(self.father, self.mother)
+        self.father.partners.add(self.mother)
+        self.mother.partners.add(self.father)
+        self.child.partners.add(self.ex)
+        self.ex.partners.add(self.child)
+        FamilyRelation.objects.create(
+            from_person=self.child, to_person=self.ex,
+            relation_type="ex-partner")
+
+    def export(self, version="5.5.1"):
+        return "".join(export_gedcom(self.user.pk, version))
+
+    def test_family_units(self):
+        """Children with the same parents and childless couples form
+        one family each."""
+        self.assertEqual(sorted(family_units(self.user.pk)), [
+            ((self.father.id, self.mother.id), [self.child.id], False),
+            ((self.child.id, self.ex.id), [], True),
+        ])
+
+    def test_family_units_query_count(self):
+        """Families are derived from the through tables in 3 queries."""
+        with self.assertNumQueries(3):
+            family_units(self.user.pk)
+
+    def test_records(self):
+        """The export holds a header, the persons and the families."""
+        records = list(parse(io.StringIO(self.export())))
+        self.assertEqual(
+            [r.tag for r in records],
+            ["HEAD", "INDI", "INDI", "INDI", "INDI", "FAM", "FAM", "TRLR"])
+        self.assertEqual(records[0].value_of("GEDC", "VERS"), "5.5.1")
+        self.assertEqual(records[1].value_of("BIRT", "DATE"), "2 JAN 1950")
+        self.assertEqual(records[2].value_of("NOTE"), "Loved\ngardening")
+        self.assertIsNotNone(records[6].find("DIV"))
+
+    def test_gedcom_7_header(self):
+        """GEDCOM 7 has no CHAR line and long values are not split."""
+        self.mother.bio = "x" * (MAX_VALUE_LENGTH * 2)
+        self.mother.save()
+        text = self.export("7.0")
+        self.assertIn("2 VERS 7.0", text)
+        self.assertNotIn("CHAR", text)
+        self.assertNotIn("CONC", text)
+        self.assertIn("CONC", self.export())
+
+    def test_conc_keeps_spaces(self):
+        """Long values are split between words, never at a space."""
+        words = " ".join(f"word{i}" for i in range(100))
+        self.mother.bio = f"{words}\nsecond line"
+        self.mother.save()
+        text = self.export()
+        self.assertTrue(all(len(line) <= 255 for line in text.split("\n")))
+        for line in text.split("\n"):
+            if " CONC " in line:
+                self.assertFalse(line.split(" CONC ", 1)[1][0].isspace())
+        records = list(parse(io.StringIO(text)))
+        self.assertEqual(
+            records[2].value_of("NOTE"), f"{words}\nsecond line")
+
+    def test_more_than_two_parents(self):
+        """Parents beyond HUSB and WIFE get a family with the same
+        children, so the import finds all of them."""
+        stepfather = Person.objects.create(
+            owner=self.user, first_name="Karim", last_name="Step")
+        self.child.parents.add(stepfather)
+        other = User.objects.create_user(username="copy", password="pass")
+        import_gedcom(io.StringIO(self.export()), other)
+        copy = Person.objects.get(owner=other, first_name="Salim")
+        self.assertEqual(
+            sorted(copy.parents.values_list("first_name", flat=True)),
+            ["Karim", "Layla", "Omar"])
+
+    def test_round_trip(self):
+        """Importing the export rebuilds the same family."""
+        other = User.objects.create_user(username="copy", password="pass")
+        import_gedcom(io.StringIO(self.export()), other)
+        copy = Person.objects.get(owner=other, first_name="Salim")
+        self.assertEqual(
+            sorted(copy.parents.values_list("first_name", flat=True)),
+            ["Layla", "Omar"])
+        self.assertEqual(
+            list(copy.partners.values_list("first_name", flat=True)),
+            ["Mona"])
+        omar = Person.objects.get(owner=other, first_name="Omar")
+        self.assertEqual(omar.nickname, "Abu Salim")
+        self.assertEqual(omar.birth_date, date(1950, 1, 2))
+
+    def test_unknown_version(self):
+        """Only supported versions can be written."""
+        with self.assertRaises(ValueError):
+            self.export("6.0")
+
+    def test_download(self):
+        """The view streams the export as an attachment."""
+        response = self.client.get(reverse("export_gedcom"))
+        self.assertTrue(response.streaming)
+        self.assertIn("attachment", response["Content-Disposition"])
+        text = b"".join(response.streaming_content).decode()
+        self.assertTrue(text.startswith("0 HEAD"))
+        self.assertTrue(text.endswith("0 TRLR\n"))
+
+    def test_download_unknown_version(self):
+        """Unknown versions give a 404."""
+        response = self.client.get(
+            reverse("export_gedcom"), {"version": "6.0"})
+        self.assertEqual(response.status_code, 404)
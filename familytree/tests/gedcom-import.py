@@ -0,0 +1,126 @@
+import io
+import os
+import tempfile
+from datetime import date
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, Client, override_settings
+from django.contrib.auth.models import User
+from django.urls import reverse
+from familytree.models import Person, FamilyTree, FamilyRelation
+from familytree.gedcom import import_gedcom, parse, parse_date
+
+GEDCOM = """0 HEAD
+1 CHAR UTF-8
+0 @I1@ INDI
+1 NAME Omar /Senior/
+2 NICK Abu Salim
+1 BIRT
+2 DATE 2 JAN 1950
+2 PLAC Tunis
+1 OCCU Baker
+0 @I2@ INDI
+1 NAME Layla /Senior/
+1 NOTE Loved
+2 CONT gardening
+0 @I3@ INDI
+1 NAME Salim /Senior/
+1 BIRT
+2 DATE ABT 1980
+0 @I4@ INDI
+1 NAME Yusuf /Senior/
+0 @F1@ FAM
+1 HUSB @I1@
+1 WIFE @I2@
+1 CHIL @I3@
+0 @F2@ FAM
+1 HUSB @I3@
+1 CHIL @I4@
+0 TRLR
+"""
+
+
+class GedcomImportTest(TestCase):
+    """Test suite for the bulk GEDCOM import."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="importer", password="pass")
+
+    def test_parser_nests_and_joins_lines(self):
+        """Records are nested by level and CONT lines are joined."""
+        records = list(parse(io.StringIO(GEDCOM)))
+        self.assertEqual(
+            [r.tag for r in records],
+            ["HEAD", "INDI", "INDI", "INDI", "INDI", "FAM", "FAM", "TRLR"])
+        self.assertEqual(records[1].value_of("BIRT", "PLAC"), "Tunis")
+        self.assertEqual(records[2].value_of("NOTE"), "Loved\ngardening")
+
+    def test_parse_date(self):
+        """Only exact dates are converted."""
+        self.assertEqual(parse_date("2 JAN 1950"), date(1950, 1, 2))
+        self.assertIsNone(parse_date("ABT 1980"))
+        self.assertIsNone(parse_date("31 FEB 1980"))
+
+    def test_import_creates_persons_and_relations(self):
+        """Individuals and families map onto persons and their links."""
+        persons, families = import_gedcom(
+            io.StringIO(GEDCOM), self.user, batch_size=2)
+        self.assertEqual((persons, families), (4, 2))
+
+        omar = Person.objects.get(first_name="Omar")
+        layla = Person.objects.get(first_name="Layla")
+        salim = Person.objects.get(first_name="Salim")
+        yusuf = Person.objects.get(first_name="Yusuf")
+        self.assertEqual(omar.nickname, "Abu Salim")
+        self.assertEqual(omar.birth_date, date(1950, 1, 2))
+        self.assertEqual(omar.occupation, "Baker")
+        self.assertIsNone(salim.birth_date)
+        self.assertEqual(set(salim.parents.all()), {omar, layla})
+        self.assertEqual(list(omar.partners.all()), [layla])
+        self.assertEqual(list(layla.partners.all()), [omar])
+        self.assertEqual(FamilyRelation.objects.filter(
+            relation_type="parent").count(), 3)
+
+        tree = FamilyTree.objects.get(owner=self.user)
+        self.assertEqual(tree.person.count(), 4)
+        self.assertEqual(tree.main_person, omar)
+        # The lineage of the bulk inserted links is rebuilt
+        self.assertIn(omar, Person.objects.ancestors(yusuf))
+
+    def test_management_command(self):
+        """The import is available as a management command."""
+        with tempfile.NamedTemporaryFile(
+                "w", suffix=".ged", delete=False) as f:
+            f.write(GEDCOM)
+        self.addCleanup(os.remove, f.name)
+        out = io.StringIO()
+        call_command("import_gedcom", "importer", f.name, stdout=out)
+        self.assertIn("Imported 4 persons and 2 families", out.getvalue())
+
+
+@override_settings(FAMILYTREE_TASKS_EAGER=True)
+class ImportGedcomViewTest(TestCase):
+    """Test suite for the GEDCOM upload view."""
+
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username="uploader", password="pass")
+        self.client.login(username="uploader", password="pass")
+        self.url = reverse("import_gedcom")
+
+    def test_upload_starts_import(self):
+        """A valid upload is imported and redirects to the tree."""
+        upload = SimpleUploadedFile("tree.ged", GEDCOM.encode())
+        response = self.client.post(self.url, {"gedcom_file": upload})
+        self.assertRedirects(
+            response, reverse("get_owner"), fetch_redirect_response=False)
+        self.assertEqual(Person.objects.filter(owner=self.user).count(), 4)
+
+    def test_rejects_other_files(self):
+        """Files that are not GEDCOM are rejected."""
+        upload = SimpleUploadedFile("tree.ged", b"hello")
+        response = self.client.post(self.url, {"gedcom_file": upload})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Person.objects.filter(owner=self.user).exists())
@@ -0,0 +1,80 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.contrib.auth.models import User
+from familytree.models import Person
+from familytree.graph import FamilyGraph, GraphCache, graph_cache
+from familytree import freshness
+
+
+class FamilyGraphTest(TestCase):
+    """Test suite for the compact graph snapshot and its cache."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="graph", password="pass")
+        self.parent = self.make("Omar")
+        self.pov = self.make("Amina")
+        self.sibling = self.make("Zahra")
+        self.partner = self.make("Layla")
+        self.child = self.make("Salim")
+        self.pov.parents.add(self.parent)
+        self.sibling.parents.add(self.parent)
+        self.pov.partners.add(self.partner)
+        self.child.parents.add(self.pov, self.partner)
+        graph_cache.clear()
+
+    def make(self, first_name):
+        return Person.objects.create(
+            owner=self.user, first_name=first_name, last_name="Graph")
+
+    def test_snapshot_neighbourhood(self):
+        """Parents, children, partners and siblings come from memory."""
+        graph = FamilyGraph.build(self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(graph.parents(self.pov.id), (self.parent.id,))
+            self.assertEqual(graph.children(self.pov.id), (self.child.id,))
+            self.assertEqual(graph.partners(self.partner.id), (self.pov.id,))
+            self.assertEqual(graph.siblings(self.pov.id), (self.sibling.id,))
+            self.assertEqual(
+                set(graph.parents(self.child.id)),
+                {self.pov.id, self.partner.id}
+            )
+        self.assertEqual(graph.parents(0), ())
+
+    def test_hits_misses_and_invalidation(self):
+        """A relation change invalidates the snapshot of the owner."""
+        graph_cache.get(self.user.pk)
+        graph_cache.get(self.user.pk)
+        self.assertEqual(graph_cache.hits, 1)
+        self.assertEqual(graph_cache.misses, 1)
+
+        newborn = self.make("Yusuf")
+        newborn.parents.add(self.pov)
+        graph = graph_cache.get(self.user.pk)
+        self.assertEqual(graph_cache.misses, 2)
+        self.assertIn(newborn.id, graph.children(self.pov.id))
+
+    def test_tree_version_stamps_snapshots(self):
+        """A write seen only through the tree version, as from another
+        worker, rebuilds the snapshot; losing the cache does not."""
+        graph_cache.get(self.user.pk)
+        cache.clear()
+        graph_cache.get(self.user.pk)
+        self.assertEqual(graph_cache.misses, 1)
+        freshness.touch(self.user.pk)
+        graph_cache.get(self.user.pk)
+        self.assertEqual(graph_cache.misses, 2)
+
+    def test_memory_budget_evicts_least_recent(self):
+        """Snapshots beyond the memory budget are evicted."""
+        other = User.objects.create_user(username="other", password="pass")
+        Person.objects.create(owner=other, first_name="Ali", last_name="X")
+        budget = FamilyGraph.build(self.user.pk).nbytes
+        cache = GraphCache(max_bytes=budget)
+
+        cache.get(self.user.pk)
+        cache.get(other.pk)
+
+        self.assertEqual(cache.evictions, 1)
+        self.assertLessEqual(cache.size, budget)
+        self.assertEqual(cache.stats()['entries'], 1)
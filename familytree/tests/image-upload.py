@@ -0,0 +1,187 @@
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+from unittest.mock import patch
+from PIL import Image
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, Client, override_settings
+from django.contrib.auth.models import User
+from django.urls import reverse
+from familytree.models import Person, ImageAsset
+from familytree.forms import PersonForm
+from familytree import images
+
+IMAGE_ROOT = tempfile.mkdtemp()
+
+
+def jpeg_upload(name="portrait.jpg", size=(40, 30)):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, "red").save(buffer, format="JPEG")
+    return SimpleUploadedFile(name, buffer.getvalue(), "image/jpeg")
+
+
+@override_settings(
+    FAMILYTREE_IMAGE_BACKEND="familytree.images.LocalFileSystemBackend",
+    FAMILYTREE_IMAGE_ROOT=IMAGE_ROOT,
+    FAMILYTREE_IMAGE_URL="/media/",
+    FAMILYTREE_TASKS_EAGER=True,
+)
+class ImageUploadTest(TestCase):
+    """Test suite for the background image upload."""
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(IMAGE_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username="photo", password="pass")
+        self.client.login(username="photo", password="pass")
+        self.person = Person.objects.create(
+            owner=self.user, first_name="Fatima", last_name="Fihri")
+        self.url = reverse("edit_person",
+                           args=[self.person.id, self.person.id])
+        self.data = {"first_name": "Fatima", "last_name": "Fihri"}
+
+    def post(self):
+        return self.client.post(
+            self.url, {**self.data, "featured_image": jpeg_upload()})
+
+    def test_person_saved_before_upload(self):
+        """The request saves the person as pending without storing the
+        image, which happens once the transaction commits."""
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.post()
+        self.person.refresh_from_db()
+        self.assertEqual(self.person.image_status, Person.IMAGE_PENDING)
+        self.assertFalse(images.has_image(self.person))
+        self.assertEqual(len(callbacks), 1)
+
+    def test_stored_image_replaces_placeholder(self):
+        """The background task stores the image and marks it ready."""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post()
+        self.person.refresh_from_db()
+        self.assertEqual(self.person.image_status, Person.IMAGE_READY)
+        url = images.image_url(self.person)
+        self.assertTrue(url.startswith("/media/local/"))
+        self.assertTrue(os.path.exists(
+            os.path.join(IMAGE_ROOT, url.removeprefix("/media/"))))
+
+    def test_card_uses_backend_url(self):
+        """Templates ask the backend for the image url."""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post()
+        self.person.refresh_from_db()
+        response = self.client.get(
+            reverse("family_view", args=[self.person.id]))
+        self.assertContains(response, images.image_url(self.person))
+
+    def test_failed_upload(self):
+        """A failing backend marks the image as failed and cleans up."""
+        with patch.object(images.LocalFileSystemBackend, "save",
+                          side_effect=OSError), \
+                patch.object(images.os, "remove") as remove, \
+                self.captureOnCommitCallbacks(execute=True):
+            self.post()
+        self.person.refresh_from_db()
+        self.assertEqual(self.person.image_status, Person.IMAGE_FAILED)
+        self.assertFalse(images.has_image(self.person))
+        remove.assert_called_once()
+        os.unlink(remove.call_args.args[0])
+
+    def test_known_image_is_reused(self):
+        """A second upload of the same file reuses the stored image
+        without staging or storing it again."""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post()
+        self.person.refresh_from_db()
+        self.assertEqual(ImageAsset.objects.count(), 1)
+
+        sister = Person.objects.create(
+            owner=self.user, first_name="Maryam", last_name="Fihri")
+        url = reverse("edit_person", args=[sister.id, sister.id])
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.client.post(
+                url, {**self.data, "featured_image": jpeg_upload()})
+        sister.refresh_from_db()
+        self.assertEqual(callbacks, [])
+        self.assertEqual(sister.image_status, Person.IMAGE_READY)
+        self.assertEqual(images.image_url(sister),
+                         images.image_url(self.person))
+
+    def test_other_owners_image_is_not_reused(self):
+        """An upload known only from another owner is stored again, so
+        nobody learns which files others uploaded."""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post()
+        User.objects.create_user(username="other", password="pass")
+        self.client.login(username="other", password="pass")
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.client.post(reverse("add_self"), {
+                **self.data, "featured_image": jpeg_upload()})
+        stranger = Person.objects.get(owner__username="other")
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(stranger.image_status, Person.IMAGE_PENDING)
+
+    def test_content_hash(self):
+        """Uploads are hashed with SHA-256 and can be read again."""
+        upload = jpeg_upload()
+        data = upload.read()
+        self.assertEqual(images.content_hash(upload),
+                         hashlib.sha256(data).hexdigest())
+        self.assertEqual(upload.read(), data)
+
+    def test_edit_without_image_keeps_status(self):
+        """Saving without an upload does not start a task."""
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.client.post(self.url, self.data)
+        self.person.refresh_from_db()
+        self.assertEqual(self.person.image_status, Person.IMAGE_READY)
+        self.assertEqual(callbacks, [])
+
+
+@override_settings(FAMILYTREE_IMAGE_MAX_SIDE=100)
+class ImageDownscaleTest(TestCase):
+    """Test suite for the bounded image validation and downscaling."""
+
+    def stage(self, upload):
+        path = images.stage(upload)
+        self.addCleanup(lambda: os.path.exists(path) and os.remove(path))
+        return path
+
+    def test_header_is_enough(self):
+        """Validation reads the header only, truncated pixel data is
+        left to the background task."""
+        data = jpeg_upload(size=(400, 300)).read()
+        self.assertEqual(
+            images.inspect(io.BytesIO(data[:len(data) // 2])),
+            ("jpeg", 400, 300))
+
+    @override_settings(FAMILYTREE_IMAGE_MAX_PIXELS=1000)
+    def test_too_many_pixels_rejected(self):
+        """Images above the pixel limit do not pass the form."""
+        form = PersonForm(
+            data={"first_name": "Fatima", "last_name": "Fihri"},
+            files={"featured_image": jpeg_upload(size=(50, 50))})
+        self.assertFalse(form.is_valid())
+        self.assertIn("at most 1,000 pixels",
+                      str(form.errors["featured_image"]))
+
+    def test_large_image_is_downscaled(self):
+        """Large images are shrunk to the maximum side and re-encoded."""
+        path = self.stage(jpeg_upload(size=(800, 400)))
+        stored = images.downscale(path)
+        self.addCleanup(os.remove, stored)
+        self.assertFalse(os.path.exists(path))
+        with Image.open(stored) as image:
+            self.assertEqual(image.size, (100, 50))
+            self.assertEqual(image.format, "WEBP")
+
+    def test_small_image_is_kept(self):
+        """Images within the limit are stored unchanged."""
+        path = self.stage(jpeg_upload())
+        self.assertEqual(images.downscale(path), path)
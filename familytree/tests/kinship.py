@@ -0,0 +1,97 @@
+from django.test import TestCase, Client
+from django.contrib.auth.models import User
+from django.urls import reverse
+from familytree.models import Person
+from familytree.graph import FamilyGraph
+from familytree.kinship import describe, relationship
+
+
+class DescribeRelationshipTest(TestCase):
+    """Test suite for naming a relationship from generation counts."""
+
+    def test_direct_lines(self):
+        """Parents and children in a direct line."""
+        self.assertEqual(describe(0, 0), "self")
+        self.assertEqual(describe(1, 0), "parent")
+        self.assertEqual(describe(3, 0), "great-grandparent")
+        self.assertEqual(describe(0, 2), "grandchild")
+
+    def test_collateral_lines(self):
+        """Siblings, aunts/uncles and nieces/nephews."""
+        self.assertEqual(describe(1, 1), "sibling")
+        self.assertEqual(describe(1, 1, half=True), "half-sibling")
+        self.assertEqual(describe(3, 1), "great-aunt/uncle")
+        self.assertEqual(describe(1, 2), "niece/nephew")
+
+    def test_cousins(self):
+        """Cousin degree and removal."""
+        self.assertEqual(describe(2, 2), "first cousin")
+        self.assertEqual(describe(3, 4), "second cousin once removed")
+        self.assertEqual(describe(2, 6), "first cousin 4 times removed")
+
+
+class KinshipTest(TestCase):
+    """Test suite for the kinship calculator and its endpoint."""
+
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username="kin", password="pass")
+        self.client.login(username="kin", password="pass")
+        # great-grandparent with two lines of descent of unequal length
+        self.root = self.make("Root")
+        left = self.root
+        self.left = []
+        for i in range(3):
+            child = self.make(f"Left{i}")
+            child.parents.add(left)
+            self.left.append(child)
+            left = child
+        right = self.root
+        self.right = []
+        for i in range(4):
+            child = self.make(f"Right{i}")
+            child.parents.add(right)
+            self.right.append(child)
+            right = child
+        self.partner = self.make("Partner")
+        self.left[-1].partners.add(self.partner)
+        self.stranger = self.make("Stranger")
+
+    def make(self, first_name):
+        return Person.objects.create(
+            owner=self.user, first_name=first_name, last_name="Kin")
+
+    def test_second_cousin_once_removed(self):
+        """Unequal lines below a shared ancestor are named as cousins."""
+        graph = FamilyGraph.build(self.user.pk)
+        result = relationship(graph, self.left[-1].id, self.right[-1].id)
+        self.assertEqual(
+            result["relationship"], "second cousin once removed")
+        self.assertEqual(result["common_ancestor"], self.root.id)
+
+    def test_partner_and_unrelated(self):
+        """Partners are named, strangers are not related."""
+        graph = FamilyGraph.build(self.user.pk)
+        self.assertEqual(
+            relationship(graph, self.left[-1].id, self.partner.id)
+            ["relationship"], "partner")
+        self.assertIsNone(
+            relationship(graph, self.left[-1].id, self.stranger.id)
+            ["relationship"])
+
+    def test_endpoint(self):
+        """The endpoint answers with the relationship as JSON."""
+        url = reverse(
+            "relationship", args=[self.right[0].id, self.left[-1].id])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json()["relationship"], "great-niece/nephew")
+
+    def test_endpoint_404_for_foreign_person(self):
+        """Persons outside the own tree are not found."""
+        other = User.objects.create_user(username="other", password="pass")
+        outsider = Person.objects.create(
+            owner=other, first_name="Ali", last_name="Foreign")
+        url = reverse("relationship", args=[self.root.id, outsider.id])
+        self.assertEqual(self.client.get(url).status_code, 404)
@@ -0,0 +1,134 @@
+from datetime import date
+from django.test import TestCase, Client
+from django.contrib.auth.models import User
+from django.urls import reverse
+from familytree.models import Person, FamilyTree, FamilyRelation
+from familytree.merge import merge_persons
+
+
+class MergePersonTest(TestCase):
+    """Test suite for merging duplicate persons."""
+
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username="merger", password="pass")
+        self.client.login(username="merger", password="pass")
+
+        def person(first_name, **fields):
+            created = Person.objects.create(
+                owner=self.user, first_name=first_name, last_name="Core",
+                **fields)
+            FamilyTree.objects.get(owner=self.user).person.add(created)
+            return created
+
+        self.survivor = person("Amina", birth_date=date(1950, 1, 2))
+        self.duplicate = person("Amina", birth_place="Fez")
+        self.mother = person("Khadija")
+        self.father = person("Omar")
+        self.child = person("Salim")
+        self.partner = person("Yusuf")
+
+        self.survivor.parents.add(self.mother)
+        self.duplicate.parents.add(self.mother, self.father)
+        self.child.parents.add(self.duplicate)
+        self.duplicate.partners.add(self.partner)
+        self.survivor.partners.add(self.partner)
+        for relation_type in ("partner", "ex-partner"):
+            FamilyRelation.objects.create(
+                from_person=self.duplicate, to_person=self.partner,
+                relation_type=relation_type)
+        FamilyRelation.objects.create(
+            from_person=self.survivor, to_person=self.partner,
+            relation_type="partner")
+        self.tree = FamilyTree.objects.get(owner=self.user)
+        self.tree.main_person = self.duplicate
+        self.tree.save()
+
+    def test_relations_move_to_survivor(self):
+        """Parents, children, partners and relations are rewired without
+        creating duplicate rows."""
+        merge_persons(self.survivor, self.duplicate)
+
+        self.assertFalse(Person.objects.filter(pk=self.duplicate.pk).exists())
+        self.assertEqual(
+            set(self.survivor.parents.all()), {self.mother, self.father})
+        self.assertEqual(list(self.survivor.children.all()), [self.child])
+        self.assertEqual(list(self.survivor.partners.all()), [self.partner])
+        self.assertEqual(list(self.partner.partners.all()), [self.survivor])
+        self.assertEqual(
+            sorted(FamilyRelation.objects.filter(
+                from_person=self.survivor).values_list(
+                    "relation_type", flat=True)),
+            ["ex-partner", "partner"])
+
+    def test_tree_membership_and_main_person(self):
+        """The survivor keeps one membership and becomes main person."""
+        merge_persons(self.survivor, self.duplicate)
+        self.tree.refresh_from_db()
+        self.assertEqual(self.tree.main_person, self.survivor)
+        self.assertEqual(
+            self.tree.person.filter(pk=self.survivor.pk).count(), 1)
+
+    def test_tree_id_equal_to_survivor_id(self):
+        """A membership moves even if the tree id equals the survivor id.
+        """
+        user = User.objects.create_user(username="twin", password="pass")
+        tree = FamilyTree.objects.create(owner=user, pk=10 ** 6)
+        survivor = Person.objects.create(
+            pk=tree.pk, owner=user, first_name="Amina", last_name="Twin")
+        duplicate = Person.objects.create(
+            owner=user, first_name="Amina", last_name="Twin")
+        tree.person.remove(survivor)
+        merge_persons(survivor, duplicate)
+        self.assertEqual(list(tree.person.all()), [survivor])
+
+    def test_empty_fields_are_filled(self):
+        """Fields only the duplicate knows are kept on the survivor."""
+        merge_persons(self.survivor, self.duplicate)
+        self.survivor.refresh_from_db()
+        self.assertEqual(self.survivor.birth_place, "Fez")
+        self.assertEqual(self.survivor.birth_date, date(1950, 1, 2))
+
+    def test_lineage_follows(self):
+        """Ancestor queries see the merged family."""
+        merge_persons(self.survivor, self.duplicate)
+        self.assertEqual(
+            set(Person.objects.ancestors(self.child)),
+            {self.survivor, self.mother, self.father})
+
+    def test_merging_related_persons(self):
+        """Links between the two persons are dropped, not turned into
+        links to the survivor itself."""
+        self.survivor.parents.add(self.duplicate)
+        merge_persons(self.survivor, self.duplicate)
+        self.assertNotIn(self.survivor, self.survivor.parents.all())
+
+    def test_rejects_other_owner(self):
+        """Persons of different owners cannot be merged."""
+        other = User.objects.create_user(username="other", password="pass")
+        stranger = Person.objects.create(
+            owner=other, first_name="Amina", last_name="Core")
+        with self.assertRaises(ValueError):
+            merge_persons(self.survivor, stranger)
+
+    def test_view(self):
+        """Posting the form merges and returns to the survivor."""
+        url = reverse("merge_person",
+                      args=[self.duplicate.id, self.survivor.id])
+        self.assertEqual(self.client.get(url).status_code, 200)
+        response = self.client.post(url, {"duplicate": self.duplicate.id})
+        self.assertRedirects(
+            response, reverse("family_view", args=[self.survivor.id]))
+        self.assertFalse(Person.objects.filter(pk=self.duplicate.pk).exists())
+
+    def test_view_only_offers_own_persons(self):
+        """Persons of other users cannot be picked."""
+        other = User.objects.create_user(username="other", password="pass")
+        stranger = Person.objects.create(
+            owner=other, first_name="Amina", last_name="Core")
+        url = reverse("merge_person",
+                      args=[self.survivor.id, self.survivor.id])
+        response = self.client.post(url, {"duplicate": stranger.id})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(Person.objects.filter(pk=stranger.pk).exists())
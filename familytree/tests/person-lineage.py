@@ -0,0 +1,91 @@
+from django.test import TestCase
+from django.contrib.auth.models import User
+from familytree.models import Person, PersonLineage
+
+
+class PersonLineageTest(TestCase):
+    """Test suite for the ancestor/descendant closure table."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="lineage", password="pass")
+        # Three generations: grandparent -> parent -> child -> grandchild
+        self.grandparent = self.make("Nasir")
+        self.parent = self.make("Omar")
+        self.child = self.make("Salim")
+        self.grandchild = self.make("Yusuf")
+        self.parent.parents.add(self.grandparent)
+        self.child.parents.add(self.parent)
+        self.grandchild.parents.add(self.child)
+
+    def make(self, first_name):
+        return Person.objects.create(
+            owner=self.user, first_name=first_name, last_name="Tree")
+
+    def test_ancestors_with_depth(self):
+        """All ancestors are found, max_depth limits the generations."""
+        self.assertQuerySetEqual(
+            Person.objects.ancestors(self.grandchild).order_by('id'),
+            [self.grandparent, self.parent, self.child]
+        )
+        self.assertQuerySetEqual(
+            Person.objects.ancestors(self.grandchild, max_depth=2),
+            [self.parent, self.child], ordered=False
+        )
+
+    def test_descendants_with_depth(self):
+        """All descendants are found, max_depth limits the generations."""
+        self.assertQuerySetEqual(
+            Person.objects.descendants(self.grandparent).order_by('id'),
+            [self.parent, self.child, self.grandchild]
+        )
+        self.assertQuerySetEqual(
+            Person.objects.descendants(self.grandparent, max_depth=1),
+            [self.parent]
+        )
+
+    def test_lookup_is_single_query(self):
+        """An N-generation lookup should not walk the tree."""
+        with self.assertNumQueries(1):
+            list(Person.objects.ancestors(self.grandchild, max_depth=10))
+
+    def test_reverse_add_links_descendants(self):
+        """Adding children from the parent side updates the closure."""
+        newborn = self.make("Zayd")
+        self.grandchild.children.add(newborn)
+        self.assertIn(self.grandparent, Person.objects.ancestors(newborn))
+        self.assertTrue(PersonLineage.objects.filter(
+            ancestor=self.grandparent, descendant=newborn, depth=4
+            ).exists())
+
+    def test_remove_parent_rebuilds_subtree(self):
+        """Removing a parent link drops the ancestors of the whole branch."""
+        self.child.parents.remove(self.parent)
+        self.assertQuerySetEqual(
+            Person.objects.ancestors(self.grandchild), [self.child])
+        self.assertQuerySetEqual(
+            Person.objects.descendants(self.grandparent), [self.parent])
+
+    def test_clear_from_parent_side(self):
+        """Clearing the children of a person unlinks their branches."""
+        self.parent.children.clear()
+        self.assertFalse(
+            Person.objects.ancestors(self.grandchild)
+            .filter(id=self.grandparent.id).exists()
+        )
+
+    def test_delete_person_rebuilds_children(self):
+        """Deleting a person detaches their descendants from its ancestors."""
+        self.parent.delete()
+        self.assertQuerySetEqual(
+            Person.objects.ancestors(self.grandchild), [self.child])
+
+    def test_second_parent_keeps_other_line(self):
+        """A remaining parent keeps its own line of ancestors."""
+        other_parent = self.make("Amina")
+        self.child.parents.add(other_parent)
+        self.child.parents.remove(self.parent)
+        self.assertQuerySetEqual(
+            Person.objects.ancestors(self.grandchild).order_by('id'),
+            [self.child, other_parent]
+        )
@@ -0,0 +1,78 @@
+from django.test import TestCase
+from django.contrib.auth.models import User
+from familytree.models import Person
+
+
+class PersonQuerySetTest(TestCase):
+    """Test suite for the recursive lineage queries."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="recursive", password="pass")
+        # grandparent -> parent -> pov -> child, parent -> sibling,
+        # grandparent -> aunt -> cousin
+        self.grandparent = self.make("Nasir")
+        self.parent = self.make("Omar")
+        self.aunt = self.make("Maryam")
+        self.pov = self.make("Amina")
+        self.sibling = self.make("Zahra")
+        self.cousin = self.make("Karim")
+        self.child = self.make("Salim")
+        self.stranger = self.make("Random")
+        self.parent.parents.add(self.grandparent)
+        self.aunt.parents.add(self.grandparent)
+        self.pov.parents.add(self.parent)
+        self.sibling.parents.add(self.parent)
+        self.cousin.parents.add(self.aunt)
+        self.child.parents.add(self.pov)
+
+    def make(self, first_name):
+        return Person.objects.create(
+            owner=self.user, first_name=first_name, last_name="Cte")
+
+    def test_ancestors_of(self):
+        """Ancestors are found recursively and limited by depth."""
+        self.assertQuerySetEqual(
+            Person.objects.ancestors_of(self.child),
+            [self.grandparent, self.parent, self.pov], ordered=False)
+        self.assertQuerySetEqual(
+            Person.objects.ancestors_of(self.child, max_depth=1),
+            [self.pov])
+
+    def test_descendants_of(self):
+        """Descendants are found recursively and limited by depth."""
+        self.assertQuerySetEqual(
+            Person.objects.descendants_of(self.grandparent, max_depth=2),
+            [self.parent, self.aunt, self.pov, self.sibling, self.cousin],
+            ordered=False)
+
+    def test_blood_relatives_within_hops(self):
+        """Relatives through a shared ancestor within the hop limit."""
+        self.assertQuerySetEqual(
+            Person.objects.blood_relatives_of(self.pov, max_hops=2),
+            [self.grandparent, self.parent, self.sibling, self.child],
+            ordered=False)
+        within_four = Person.objects.blood_relatives_of(
+            self.pov, max_hops=4)
+        self.assertIn(self.cousin, within_four)
+        self.assertNotIn(self.stranger, within_four)
+        self.assertNotIn(self.pov, within_four)
+
+    def test_generations(self):
+        """Generation numbers are positive upwards and negative downwards."""
+        with self.assertNumQueries(1):
+            generations = Person.objects.generations(self.pov)
+        self.assertEqual(generations, {
+            self.parent.id: 1,
+            self.grandparent.id: 2,
+            self.child.id: -1,
+        })
+        self.assertEqual(
+            Person.objects.generations(self.pov, up=1, down=0),
+            {self.parent.id: 1})
+
+    def test_cycle_terminates(self):
+        """Cyclic parent links do not recurse forever."""
+        self.grandparent.parents.add(self.child)
+        self.assertIn(
+            self.pov, Person.objects.ancestors_of(self.pov))
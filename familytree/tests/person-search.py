@@ -0,0 +1,83 @@
+import io
+from django.test import TestCase, Client
+from django.contrib.auth.models import User
+from django.urls import reverse
+from familytree.models import Person
+from familytree.gedcom import import_gedcom
+from familytree.search import search
+
+
+class PersonSearchTest(TestCase):
+    """Test suite for the full-text and typeahead person search."""
+
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username="finder", password="pass")
+        self.client.login(username="finder", password="pass")
+        self.omar = Person.objects.create(
+            owner=self.user, first_name="Omar", last_name="Khayyam",
+            birth_place="Nishapur", occupation="Astronomer")
+        self.ömer = Person.objects.create(
+            owner=self.user, first_name="Ömer", last_name="Seyfettin",
+            bio="Wrote short stories")
+        self.layla = Person.objects.create(
+            owner=self.user, first_name="Layla", last_name="Khayyam")
+        other = User.objects.create_user(username="other", password="pass")
+        Person.objects.create(owner=other, first_name="Omar", last_name="X")
+
+    def ids(self, query, typeahead=False):
+        return [hit["id"] for hit in search(self.user.pk, query, typeahead)]
+
+    def test_full_text(self):
+        """Every word has to match in one of the searched fields."""
+        self.assertEqual(self.ids("khayyam astronomer"), [self.omar.id])
+        self.assertEqual(self.ids("stories"), [self.ömer.id])
+        self.assertEqual(
+            sorted(self.ids("Khayyam")), [self.omar.id, self.layla.id])
+
+    def test_scoped_to_owner(self):
+        """Persons of other users are never found."""
+        self.assertEqual(self.ids("omar"), [self.omar.id])
+
+    def test_typeahead_prefix(self):
+        """Typeahead matches words by prefix, ignoring diacritics."""
+        self.assertEqual(self.ids("kha la", typeahead=True), [self.layla.id])
+        self.assertEqual(
+            sorted(self.ids("om", typeahead=True)),
+            [self.omar.id, self.ömer.id])
+        self.assertEqual(self.ids("om"), [])
+
+    def test_index_follows_changes(self):
+        """Edits and deletions are reflected in the index."""
+        self.layla.occupation = "Poet"
+        self.layla.save()
+        self.assertEqual(self.ids("poet"), [self.layla.id])
+        self.layla.delete()
+        self.assertEqual(self.ids("poet"), [])
+
+    def test_bulk_import_is_indexed(self):
+        """Persons added by a bulk import are searchable."""
+        import_gedcom(io.StringIO(
+            "0 HEAD\n0 @I1@ INDI\n1 NAME Hafez /Shirazi/\n0 TRLR\n"),
+            self.user)
+        self.assertEqual(len(self.ids("shirazi")), 1)
+
+    def test_quotes_and_symbols(self):
+        """Query syntax characters are ignored."""
+        self.assertEqual(self.ids('"omar*) {'), [self.omar.id])
+        self.assertEqual(self.ids("  "), [])
+
+    def test_typeahead_is_one_query(self):
+        """A typeahead lookup is a single indexed query."""
+        with self.assertNumQueries(1):
+            search(self.user.pk, "kh", typeahead=True)
+
+    def test_endpoint(self):
+        """The view answers with JSON results linking to the persons."""
+        response = self.client.get(
+            reverse("search_persons"), {"q": "lay", "typeahead": "1"})
+        results = response.json()["results"]
+        self.assertEqual([hit["id"] for hit in results], [self.layla.id])
+        self.assertEqual(results[0]["url"],
+                         reverse("family_view", args=[self.layla.id]))
@@ -0,0 +1,67 @@
+from django.test import TestCase, RequestFactory
+from django.contrib.auth.models import User, AnonymousUser
+from familytree.models import Person, FamilyTree
+from familytree.context_processors import pov_context
+from familytree.freshness import tree_state
+
+
+class PovContextTest(TestCase):
+    """Test suite for the lazy pov_context processor."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="pov", password="pass")
+        self.request = self.new_request()
+        self.main = Person.objects.create(
+            owner=self.user, first_name="Amina", last_name="Main")
+        self.tree = FamilyTree.objects.get(owner=self.user)
+        self.tree.main_person = self.main
+        self.tree.save()
+
+    def new_request(self):
+        request = RequestFactory().get("/")
+        request.user = self.user
+        return request
+
+    def test_anonymous_user_gets_nothing(self):
+        """Anonymous users get no person in the context."""
+        self.request.user = AnonymousUser()
+        self.assertEqual(pov_context(self.request), {})
+
+    def test_unused_person_costs_no_query(self):
+        """Pages that never read the person do not query the database."""
+        with self.assertNumQueries(0):
+            pov_context(self.request)
+
+    def test_person_id_costs_one_query(self):
+        """Reading the id of the main person costs a single query."""
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                pov_context(self.request)["person"].id, self.main.id)
+
+    def test_state_read_once_per_request(self):
+        """The ETag and the main person share one query per request."""
+        with self.assertNumQueries(1):
+            tree_state(self.request)
+            self.assertEqual(
+                pov_context(self.request)["person"].id, self.main.id)
+
+    def test_person_fields_load_on_access(self):
+        """Other fields are loaded when a template needs them."""
+        person = pov_context(self.request)["person"]
+        self.assertEqual(person.first_name, "Amina")
+
+    def test_changed_main_person_is_picked_up(self):
+        """A new FamilyTree.main_person is picked up at once."""
+        pov_context(self.request)["person"].id
+        other = Person.objects.create(
+            owner=self.user, first_name="Omar", last_name="Other")
+        self.tree.main_person = other
+        self.tree.save()
+        self.assertEqual(
+            pov_context(self.new_request())["person"].id, other.id)
+
+    def test_deleted_main_person_is_dropped(self):
+        """Deleting the main person empties the context."""
+        pov_context(self.request)["person"].id
+        self.main.delete()
+        self.assertFalse(pov_context(self.new_request())["person"])
@@ -0,0 +1,121 @@
+from io import StringIO
+from django.core.management import call_command
+from django.db import DatabaseError, transaction
+from django.test import TestCase
+from django.contrib.auth.models import User
+from familytree.models import Person, FamilyTree
+from familytree.batch import add_relatives
+
+COUNTERS = ('parent_count', 'child_count', 'partner_count', 'sibling_count')
+
+
+class RelationCountersTest(TestCase):
+    """Test suite for the denormalized relation counters."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="count", password="pass")
+        self.father = self.make("Karim")
+        self.mother = self.make("Nadia")
+        self.son = self.make("Tariq")
+        self.daughter = self.make("Salma")
+        self.son.parents.add(self.father, self.mother)
+        self.daughter.parents.add(self.father, self.mother)
+        self.father.partners.add(self.mother)
+
+    def make(self, first_name):
+        return Person.objects.create(
+            owner=self.user, first_name=first_name, last_name="Count")
+
+    def counts(self, person):
+        person.refresh_from_db()
+        return tuple(getattr(person, field) for field in COUNTERS)
+
+    def test_links_are_counted(self):
+        """Adding parents and partners updates both sides."""
+        self.assertEqual(self.counts(self.father), (0, 2, 1, 0))
+        self.assertEqual(self.counts(self.mother), (0, 2, 1, 0))
+        self.assertEqual(self.counts(self.son), (2, 0, 0, 1))
+        self.assertEqual(
+            FamilyTree.objects.get(owner=self.user).person_count, 4)
+
+    def test_repeated_add_is_not_counted(self):
+        """Adding an existing link again changes nothing."""
+        self.son.parents.add(self.father)
+        self.mother.partners.add(self.father)
+        self.assertEqual(self.counts(self.son), (2, 0, 0, 1))
+        self.assertEqual(self.counts(self.father), (0, 2, 1, 0))
+
+    def test_removal_and_clear(self):
+        """Removed and cleared links are recounted."""
+        self.father.children.remove(self.son)
+        self.assertEqual(self.counts(self.father)[1], 1)
+        self.assertEqual(self.counts(self.son), (1, 0, 0, 1))
+        self.daughter.parents.clear()
+        self.assertEqual(self.counts(self.daughter), (0, 0, 0, 0))
+        self.assertEqual(self.counts(self.mother)[1], 1)
+        self.assertEqual(self.counts(self.son)[3], 0)
+        self.mother.partners.clear()
+        self.assertEqual(self.counts(self.father)[2], 0)
+
+    def test_deleted_person(self):
+        """Deleting a person updates its relatives and the tree."""
+        self.daughter.delete()
+        self.assertEqual(self.counts(self.father)[1], 1)
+        self.assertEqual(self.counts(self.son)[3], 0)
+        self.mother.delete()
+        self.assertEqual(self.counts(self.father), (0, 1, 0, 0))
+        self.assertEqual(self.counts(self.son), (1, 0, 0, 0))
+        self.assertEqual(
+            FamilyTree.objects.get(owner=self.user).person_count, 2)
+
+    def test_bulk_add(self):
+        """Batch adds count the new links and members."""
+        add_relatives(self.son, 'sibling', 'sibling', [
+            Person(first_name="Huda", last_name="Count"),
+            Person(first_name="Rami", last_name="Count"),
+        ])
+        self.assertEqual(self.counts(self.father)[1], 4)
+        self.assertEqual(self.counts(self.son)[3], 3)
+        self.assertEqual(
+            FamilyTree.objects.get(owner=self.user).person_count, 6)
+
+    def test_stale_instances_keep_derived_fields(self):
+        """Saving an instance loaded before links changed writes back
+        neither counters nor family unit, nor the tree version."""
+        stale = Person.objects.get(pk=self.son.pk)
+        tree = FamilyTree.objects.get(owner=self.user)
+        self.son.parents.clear()
+        self.make("Amal")
+        stale.first_name = "Tarek"
+        stale.save()
+        tree.save()
+        fresh = Person.objects.get(pk=self.son.pk)
+        self.assertEqual(fresh.first_name, "Tarek")
+        self.assertIsNone(fresh.birth_unit_id)
+        self.assertEqual(self.counts(fresh), (0, 0, 0, 0))
+        saved_tree = FamilyTree.objects.get(pk=tree.pk)
+        self.assertEqual(saved_tree.person_count, 5)
+        self.assertGreater(saved_tree.version, tree.version)
+
+    def test_save_of_deleted_row_raises(self):
+        """A loaded person whose row is gone is not inserted again."""
+        stale = Person.objects.get(pk=self.son.pk)
+        Person.objects.filter(pk=self.son.pk).delete()
+        with self.assertRaises(DatabaseError), transaction.atomic():
+            stale.save()
+        self.assertFalse(Person.objects.filter(pk=self.son.pk).exists())
+        new = Person(owner=self.user, first_name="Nour", last_name="Count")
+        new.save()
+        self.assertTrue(Person.objects.filter(pk=new.pk).exists())
+
+    def test_repair_command(self):
+        """The repair command restores counters that drifted."""
+        Person.objects.filter(pk=self.father.pk).update(
+            child_count=7, sibling_count=3)
+        FamilyTree.objects.filter(owner=self.user).update(person_count=0)
+        out = StringIO()
+        call_command("repair_counters", "count", stdout=out)
+        self.assertIn("Repaired the counters of 1 persons.", out.getvalue())
+        self.assertEqual(self.counts(self.father), (0, 2, 1, 0))
+        self.assertEqual(
+            FamilyTree.objects.get(owner=self.user).person_count, 4)
@@ -0,0 +1,73 @@
+import json
+from datetime import date
+from django.test import TestCase, Client
+from django.contrib.auth.models import User
+from django.urls import reverse
+from familytree.models import Person, FamilyRelation
+from familytree.exports import read_binary
+
+
+class TreeGraphViewTest(TestCase):
+    """Test suite for the streaming whole-tree graph endpoint."""
+
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username="grapher", password="pass")
+        self.client.login(username="grapher", password="pass")
+        self.parent = Person.objects.create(
+            owner=self.user, first_name="Omar", last_name="Senior",
+            birth_date=date(1950, 1, 2))
+        self.child = Person.objects.create(
+            owner=self.user, first_name="Salim", last_name="Junior")
+        self.partner = Person.objects.create(
+            owner=self.user, first_name="Layla", last_name="Partner")
+        self.child.parents.add(self.parent)
+        self.child.partners.add(self.partner)
+        FamilyRelation.objects.create(
+            from_person=self.child, to_person=self.partner,
+            relation_type="partner")
+        other = User.objects.create_user(username="other", password="pass")
+        Person.objects.create(owner=other, first_name="Ali", last_name="X")
+        self.url = reverse("tree_graph")
+
+    def test_redirect_if_not_logged_in(self):
+        """Unauthenticated users should be redirected to login page."""
+        self.client.logout()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 302)
+
+    def test_json_document(self):
+        """The streamed JSON holds the own nodes and all edge kinds."""
+        response = self.client.get(self.url)
+        self.assertTrue(response.streaming)
+        graph = json.loads(b"".join(response.streaming_content))
+
+        self.assertEqual(
+            [node["id"] for node in graph["nodes"]],
+            [self.parent.id, self.child.id, self.partner.id])
+        self.assertEqual(graph["nodes"][0]["birth_date"], "1950-01-02")
+        self.assertIsNone(graph["nodes"][0]["featured_image"])
+        self.assertEqual(graph["edges"], [
+            {"kind": "parent", "source": self.parent.id,
+             "target": self.child.id},
+            {"kind": "partner", "source": self.child.id,
+             "target": self.partner.id},
+            {"kind": "relation:partner", "source": self.child.id,
+             "target": self.partner.id},
+        ])
+
+    def test_binary_matches_json(self):
+        """The binary encoding decodes to the same graph."""
+        as_json = json.loads(
+            b"".join(self.client.get(self.url).streaming_content))
+        response = self.client.get(self.url, {"format": "binary"})
+        self.assertEqual(response["Content-Type"], "application/octet-stream")
+        as_binary = read_binary(b"".join(response.streaming_content))
+
+        self.assertEqual(as_binary["edges"], as_json["edges"])
+        self.assertEqual(as_binary["nodes"][0]["birth_date"],
+                         date(1950, 1, 2))
+        self.assertEqual(
+            [node["first_name"] for node in as_binary["nodes"]],
+            [node["first_name"] for node in as_json["nodes"]])
@@ -0,0 +1,157 @@
+import random
+from collections import defaultdict
+from unittest.mock import patch
+from django.core.cache import caches
+from django.test import TestCase, Client
+from django.contrib.auth.models import User
+from django.urls import reverse
+from familytree.graph import FamilyGraph, graph_cache
+from familytree.models import Person
+from familytree import layout
+
+
+def separated(positions):
+    """Check that persons of one generation are at least SEPARATION
+    apart."""
+    levels = defaultdict(list)
+    for x, y in positions.values():
+        levels[y].append(x)
+    return all(
+        b - a >= layout.SEPARATION - 1e-9
+        for xs in levels.values()
+        for a, b in zip(sorted(xs), sorted(xs)[1:]))
+
+
+class LayoutAlgorithmTest(TestCase):
+    """Test suite for the tree layout algorithms."""
+
+    def test_contours_pack_subtrees(self):
+        """A leaf is placed right next to the top of a wider subtree and
+        parents are centred above their children."""
+        # Root 1 with children 2 and 3, 2 has the children 4 and 5.
+        graph = FamilyGraph(
+            [1, 2, 3, 4, 5], [(2, 1), (3, 1), (4, 2), (5, 2)], [])
+        positions = layout.descendant_layout(graph, 1)
+        self.assertEqual(positions, {
+            1: (1.0, 0), 2: (0.5, 1), 3: (1.5, 1),
+            4: (0.0, 2), 5: (1.0, 2),
+        })
+
+    def test_large_random_tree(self):
+        """Random trees never overlap and stay centred."""
+        rng = random.Random(7)
+        pairs = [(child, rng.randrange(1, child)) for child in range(2, 2000)]
+        graph = FamilyGraph(range(1, 2000), pairs, [])
+        positions = layout.descendant_layout(graph, 1)
+        self.assertEqual(len(positions), 1999)
+        self.assertTrue(separated(positions))
+        children = defaultdict(list)
+        for child, parent in pairs:
+            children[parent].append(positions[child][0])
+        for parent, xs in children.items():
+            self.assertAlmostEqual(
+                positions[parent][0], (min(xs) + max(xs)) / 2)
+
+    def test_layered_pedigree(self):
+        """Partners share a generation next to each other, children are
+        below all their parents, also across branches."""
+        # Two families 1+2 and 3+4, their children 5 and 6 marry and
+        # have 7. 8 married into the tree without parents.
+        graph = FamilyGraph(
+            range(1, 9),
+            [(5, 1), (5, 2), (6, 3), (6, 4), (7, 5), (7, 6), (4, 8)],
+            [(1, 2), (2, 1), (3, 4), (4, 3), (5, 6), (6, 5)])
+        positions = layout.layered_layout(graph)
+        self.assertTrue(separated(positions))
+        self.assertEqual(positions[5][1], positions[6][1])
+        self.assertEqual(abs(positions[5][0] - positions[6][0]), 1.0)
+        self.assertEqual(positions[7][1], positions[5][1] + 1)
+        self.assertEqual(positions[3][1], positions[4][1])
+        self.assertGreater(positions[4][1], positions[8][1])
+
+    def test_window_reads_tiles(self):
+        """Only persons inside the viewport are returned."""
+        graph = FamilyGraph(range(1, 101), [], [])
+        positions = layout.layered_layout(graph)
+        tiles = defaultdict(list)
+        for pk, (x, y) in positions.items():
+            tiles[layout._tile(x, y)].append(pk)
+        placed = {'positions': positions, 'tiles': dict(tiles),
+                  'bounds': (0.0, 0, 99.0, 0)}
+        self.assertEqual(
+            layout.window(placed, 10, 0, 12.5, 0), [11, 12, 13])
+        self.assertEqual(layout.window(placed, 200, 0, 300, 5), [])
+
+
+class TreeLayoutViewTest(TestCase):
+    """Test suite for the tiled layout endpoint."""
+
+    def setUp(self):
+        caches["fragments"].clear()
+        graph_cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username="lay", password="pass")
+        self.client.login(username="lay", password="pass")
+        self.root = self.make("Hamid")
+        self.partner = self.make("Rana")
+        self.root.partners.add(self.partner)
+        self.children = [self.make(f"Child{i}") for i in range(30)]
+        for child in self.children:
+            child.parents.add(self.root, self.partner)
+        self.url = reverse("tree_layout")
+
+    def make(self, first_name):
+        return Person.objects.create(
+            owner=self.user, first_name=first_name, last_name="Layout")
+
+    def test_whole_tree(self):
+        """Without a viewport everyone and every link is sent."""
+        data = self.client.get(self.url).json()
+        self.assertEqual(len(data["nodes"]), 32)
+        self.assertEqual(len(data["edges"]), 61)
+        self.assertFalse(data["truncated"])
+        nodes = {node["id"]: node for node in data["nodes"]}
+        self.assertEqual(nodes[self.root.id]["name"], "Hamid Layout")
+        self.assertEqual(nodes[self.children[0].id]["y"], 1)
+
+    def test_viewport(self):
+        """A viewport only gets the persons on screen, with the links
+        leading off screen."""
+        data = self.client.get(
+            self.url, {"left": 0, "right": 4.5, "top": 1, "bottom": 1}
+            ).json()
+        self.assertEqual(len(data["nodes"]), 5)
+        self.assertTrue(all(node["y"] == 1 for node in data["nodes"]))
+        self.assertEqual(len(data["edges"]), 10)
+
+    def test_descendants_of_root(self):
+        """?root= lays out one person and its descendants."""
+        child = self.children[0]
+        grandchild = self.make("Grandchild")
+        grandchild.parents.add(child)
+        data = self.client.get(self.url, {"root": child.id}).json()
+        self.assertEqual(
+            {node["id"]: node["y"] for node in data["nodes"]},
+            {child.id: 0, grandchild.id: 1})
+
+    def test_invalid_requests(self):
+        """Unknown roots and broken viewports are not found."""
+        other = User.objects.create_user(username="other", password="pass")
+        stranger = Person.objects.create(
+            owner=other, first_name="X", last_name="Y")
+        for params in ({"root": stranger.id}, {"root": "x"},
+                       {"root": "\u00b2"}, {"left": "a"}, {"top": "nan"}):
+            self.assertEqual(
+                self.client.get(self.url, params).status_code, 404)
+
+    def test_layout_cached_per_version(self):
+        """Layouts are computed once per tree version."""
+        with patch.object(layout, "layered_layout",
+                          wraps=layout.layered_layout) as compute:
+            self.client.get(self.url)
+            self.client.get(self.url, {"left": 3})
+            self.assertEqual(compute.call_count, 1)
+            self.make("Newcomer")
+            data = self.client.get(self.url).json()
+            self.assertEqual(compute.call_count, 2)
+        self.assertEqual(len(data["nodes"]), 33)
@@ -44,3 +44,43 @@ class ShowFamilyTreeTagTest(TestCase):
         # Nested structure
         self.assertIn("<ul>", html)
         self.assertIn("</ul>", html)
+
+    def make_line(self, generations):
+        """Create a single line of descent and return its root."""
+        people = [
+            Person.objects.create(
+                owner=self.user, first_name=f"Gen{i}", last_name="Line")
+            for i in range(generations)
+        ]
+        for parent, child in zip(people, people[1:]):
+            child.parents.add(parent)
+        return people[0]
+
+    def test_one_query_per_generation(self):
+        """A ten generation line is fetched with one query per level."""
+        root = self.make_line(11)
+        with self.assertNumQueries(10):
+            html = show_family_tree(root)
+        self.assertIn("Gen10 Line", html)
+        self.assertEqual(html.count("<ul>"), html.count("</ul>"))
+
+    def test_max_depth_limits_generations(self):
+        """Descendants deeper than max_depth are not rendered"""
+        root = self.make_line(4)
+        html = show_family_tree(root, max_depth=2)
+        self.assertIn("Gen2 Line", html)
+        self.assertNotIn("Gen3 Line", html)
+
+    def test_cycle_is_rendered_once(self):
+        """A person who is their own ancestor does not loop forever"""
+        root = self.make_line(3)
+        root.parents.add(Person.objects.get(first_name="Gen2"))
+        html = show_family_tree(root)
+        self.assertEqual(html.count("Gen0 Line"), 1)
+
+    def test_names_are_escaped(self):
+        """Names are escaped in the rendered markup"""
+        person = Person.objects.create(
+            owner=self.user, first_name="<b>Ali</b>", last_name="Parent")
+        html = show_family_tree(person)
+        self.assertIn("&lt;b&gt;Ali&lt;/b&gt;", html)
@@ -1,6 +1,8 @@
 from django.test import TestCase, Client
 from django.contrib.auth.models import User
 from django.urls import reverse
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from familytree.models import Person, FamilyTree
 
 
@@ -78,3 +80,49 @@ class ViewFamilyTest(TestCase):
         self.assertIn(partner, persons_list)
         self.assertNotIn(self.pov, persons_list)
         # POV should not be in own list
+
+    def test_relatives_are_grouped_by_role(self):
+        """Each relative is listed once under its role."""
+        parent_a = Person.objects.create(
+            owner=self.user, first_name="Omar", last_name="Senior")
+        parent_b = Person.objects.create(
+            owner=self.user, first_name="Hind", last_name="Senior")
+        sibling = Person.objects.create(
+            owner=self.user, first_name="Zahra", last_name="Core")
+        self.pov.parents.add(parent_a, parent_b)
+        sibling.parents.add(parent_a, parent_b)
+
+        relatives = self.client.get(self.get_url()).context["relatives"]
+
+        self.assertEqual(relatives["parents"], [parent_a, parent_b])
+        self.assertEqual(relatives["siblings"], [sibling])
+        self.assertEqual(relatives["partners"], [])
+        self.assertEqual(relatives["children"], [])
+
+    def test_query_count_does_not_grow_with_family(self):
+        """The page renders in a fixed number of queries."""
+        parents = [
+            Person.objects.create(
+                owner=self.user, first_name="Parent", last_name=str(i))
+            for i in range(2)
+        ]
+        self.pov.parents.add(*parents)
+        with CaptureQueriesContext(connection) as small_family:
+            self.client.get(self.get_url())
+        # Requests reset the query log, count before the next one.
+        expected = len(small_family)
+
+        for i in range(5):
+            for role in ("Sibling", "Partner", "Child"):
+                relative = Person.objects.create(
+                    owner=self.user, first_name=role, last_name=str(i))
+                if role == "Sibling":
+                    relative.parents.add(*parents)
+                elif role == "Partner":
+                    self.pov.partners.add(relative)
+                else:
+                    relative.parents.add(self.pov)
+
+        with self.assertNumQueries(expected):
+            response = self.client.get(self.get_url())
+        self.assertEqual(len(response.context["persons"]), 17)
@@ -0,0 +1,104 @@
+from collections import defaultdict
+from .models import Person, FamilyUnit
+from . import counters
+
+# Rows of the Person.parents through table point from child to parent.
+ParentLink = Person.parents.through
+UnitParent = FamilyUnit.parents.through
+
+BATCH_SIZE = 1000
+
+
+def _chunked(ids):
+    ids = list(ids)
+    for start in range(0, len(ids), BATCH_SIZE):
+        yield ids[start:start + BATCH_SIZE]
+
+
+def unit_key(parent_ids):
+    """Get the key of the unit of a set of parents."""
+    return ','.join(str(pk) for pk in sorted(parent_ids))
+
+
+def assign(person_ids):
+    """Point the given persons to the unit of their current parents,
+    creating missing units. Persons without parents get no unit and
+    units left without children are removed. The sibling counters of
+    everyone in the old and new units are recomputed.
+    """
+    person_ids = set(person_ids)
+    if not person_ids:
+        return
+
+    parents_of = defaultdict(list)
+    owner_of, old_units = {}, set()
+    for chunk in _chunked(person_ids):
+        for child, parent in ParentLink.objects.filter(
+                from_person_id__in=chunk
+                ).values_list('from_person_id', 'to_person_id'):
+            parents_of[child].append(parent)
+        for pk, owner_id, unit_id in Person.objects.filter(
+                pk__in=chunk
+                ).values_list('pk', 'owner_id', 'birth_unit_id'):
+            owner_of[pk] = owner_id
+            old_units.add(unit_id)
+
+    wanted = {
+        (owner_of[pk], unit_key(parents_of[pk]))
+        for pk in owner_of if parents_of[pk]
+    }
+    units = _units(wanted, parents_of, owner_of)
+
+    changed = []
+    for pk, owner_id in owner_of.items():
+        unit_id = None
+        if parents_of[pk]:
+            unit_id = units[owner_id, unit_key(parents_of[pk])]
+        changed.append(Person(pk=pk, birth_unit_id=unit_id))
+    Person.objects.bulk_update(changed, ['birth_unit'], batch_size=BATCH_SIZE)
+
+    for chunk in _chunked(person_ids):
+        Person.objects.filter(
+            pk__in=chunk, birth_unit__isnull=True).update(sibling_count=0)
+    counters.recount_siblings(old_units | set(units.values()))
+    old_units.discard(None)
+    FamilyUnit.objects.filter(
+        pk__in=old_units, children__isnull=True).delete()
+
+
+def _units(wanted, parents_of, owner_of):
+    """Map (owner_id, key) to the id of its unit, creating missing ones."""
+    units = {}
+    keys_by_owner = defaultdict(list)
+    for owner_id, key in wanted:
+        keys_by_owner[owner_id].append(key)
+    for owner_id, keys in keys_by_owner.items():
+        for chunk in _chunked(keys):
+            units.update(
+                ((owner_id, key), pk) for key, pk in
+                FamilyUnit.objects.filter(
+                    owner_id=owner_id, key__in=chunk
+                    ).values_list('key', 'pk'))
+
+    missing = wanted - units.keys()
+    if not missing:
+        return units
+    FamilyUnit.objects.bulk_create(
+        [FamilyUnit(owner_id=owner_id, key=key) for owner_id, key in missing],
+        batch_size=BATCH_SIZE, ignore_conflicts=True)
+    created = {}
+    for owner_id in {owner_id for owner_id, _ in missing}:
+        keys = [key for o, key in missing if o == owner_id]
+        for chunk in _chunked(keys):
+            created.update(
+                ((owner_id, key), pk) for key, pk in
+                FamilyUnit.objects.filter(
+                    owner_id=owner_id, key__in=chunk
+                    ).values_list('key', 'pk'))
+    UnitParent.objects.bulk_create(
+        [UnitParent(familyunit_id=pk, person_id=int(parent))
+         for (_, key), pk in created.items()
+         for parent in key.split(',')],
+        batch_size=BATCH_SIZE, ignore_conflicts=True)
+    units.update(created)
+    return units
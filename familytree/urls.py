@@ -8,11 +8,17 @@ urlpatterns = [
         "add_family_member/",
         views.add_family_member, name="add_family_member"
         ),
+    path(
+        "add_family_members/",
+        views.add_family_members, name="add_family_members"
+        ),
     path('add_self/', views.add_self, name='add_self'),
     path('pov/<int:pov_id>/delete/<int:person_id>/',
          views.delete_person, name='delete_person'),
     path('pov/<int:pov_id>/edit/<int:person_id>/',
          views.edit_person, name='edit_person'),
+    path('pov/<int:pov_id>/merge/<int:person_id>/',
+         views.merge_person, name='merge_person'),
     path(
         'family_view/<int:person_id>/',
         views.view_family,
@@ -20,6 +26,13 @@ urlpatterns = [
         ),
     path("pov/<int:pov_id>/view_details/<int:person_id>/",
          views.view_details, name="view_details"),
+    path("pov/<int:pov_id>/relationship/<int:person_id>/",
+         views.relationship_view, name="relationship"),
+    path("search/", views.search_persons, name="search_persons"),
+    path("graph/", views.tree_graph, name="tree_graph"),
+    path("layout/", views.tree_layout, name="tree_layout"),
+    path("import/", views.import_gedcom, name="import_gedcom"),
+    path("export/", views.export_gedcom, name="export_gedcom"),
     path("tree/<int:person_id>/",
          views.classic_tree_view, name="classic_tree_view"),
 
@@ -1,8 +1,21 @@
+import math
+from collections import defaultdict
+from django.conf import settings
 from django.shortcuts import render, get_object_or_404
 from .models import Person, FamilyTree, FamilyRelation
 from django.contrib import messages
-from .forms import PersonForm, FamilyRelationForm
+from .forms import (
+    PersonForm, FamilyRelationForm, GedcomUploadForm, MergePersonForm,
+    BatchPersonFormSet)
+from .graph import graph_cache
+from .kinship import relationship
+from .context_processors import main_person_id
+from .freshness import tree_condition
+from . import cards, exports, gedcom, layout, search, tasks
+from .batch import add_relatives, RELATIONS
+from .merge import merge_persons
 from django.shortcuts import redirect
+from django.http import Http404, JsonResponse, StreamingHttpResponse
 from django.urls import reverse
 from django.contrib.auth.decorators import login_required
 # Create your views here.
@@ -11,13 +24,9 @@ from django.contrib.auth.decorators import login_required
 @login_required
 def get_owner(request):
     """Redirect to the main person of the family tree."""
-    try:
-        family_tree = FamilyTree.objects.get(owner=request.user)
-        if family_tree.main_person:
-            return redirect("family_view",
-                            person_id=family_tree.main_person.id)
-    except FamilyTree.DoesNotExist:
-        pass
+    person_id = main_person_id(request)
+    if person_id:
+        return redirect("family_view", person_id=person_id)
 
     return redirect("add_self")
 
@@ -26,12 +35,10 @@ def get_owner(request):
 def add_self(request):
     """Add the main person to the family tree."""
     if request.method == "POST":
-        form = PersonForm(request.POST)
+        form = PersonForm(
+            request.POST, request.FILES, instance=Person(owner=request.user))
         if form.is_valid():
-            person = form.save(commit=False)
-            person.owner = request.user
-            person.save()
-            form.save_m2m()
+            person = form.save()
 
             family_tree, created = FamilyTree.objects.get_or_create(
                 owner=request.user)
@@ -39,7 +46,7 @@ def add_self(request):
 
             if family_tree.main_person is None:
                 family_tree.main_person = person
-                family_tree.save()
+                family_tree.save(update_fields=['main_person'])
 
             return redirect("family_view", person_id=person.id)
     else:
@@ -55,7 +62,7 @@ def add_family_member(request):
     main_person = get_object_or_404(Person, id=person_id)
 
     if request.method == 'GET':
-        if relation == "sibling" and not main_person.parents.exists():
+        if relation == "sibling" and not main_person.parent_count:
             messages.info(
                 request,
                 """Please add at least one
@@ -66,7 +73,9 @@ def add_family_member(request):
                     'add_family_member'
                    )}?relation=parent&person_id={main_person.id}")
 
-    person_form = PersonForm(request.POST or None, request.FILES or None)
+    person_form = PersonForm(
+        request.POST or None, request.FILES or None,
+        instance=Person(owner=request.user))
     relation_form = FamilyRelationForm(
         request.POST or None,
         relation_context=relation
@@ -74,10 +83,7 @@ def add_family_member(request):
 
     if request.method == 'POST':
         if person_form.is_valid() and relation_form.is_valid():
-            new_person = person_form.save(commit=False)
-            new_person.owner = request.user
-            new_person.save()
-            person_form.save_m2m()
+            new_person = person_form.save()
 
             # Save relation
             relation_instance = relation_form.save(commit=False)
@@ -100,8 +106,7 @@ def add_family_member(request):
             elif relation == "partner":
                 main_person.partners.add(new_person)
             elif relation == "sibling":
-                for parent in main_person.parents.all():
-                    new_person.parents.add(parent)
+                new_person.parents.add(*main_person.parents.all())
 
             family_tree, _ = FamilyTree.objects.get_or_create(
                 owner=request.user
@@ -109,7 +114,7 @@ def add_family_member(request):
             family_tree.person.add(new_person)
             if family_tree.main_person is None:
                 family_tree.main_person = new_person
-                family_tree.save()
+                family_tree.save(update_fields=['main_person'])
 
             if 'save_and_add' in request.POST:
                 return redirect(
@@ -128,6 +133,48 @@ def add_family_member(request):
     })
 
 
+@login_required
+def add_family_members(request):
+    """Add several relatives of the same kind in one request."""
+    relation = request.GET.get('relation')
+    if relation not in RELATIONS:
+        raise Http404("Unknown relation.")
+    main_person = get_object_or_404(
+        Person, id=request.GET.get('person_id'), owner=request.user)
+
+    if relation == 'sibling' and not main_person.parent_count:
+        messages.info(
+            request,
+            "Please add at least one parent first, "
+            "before you can add siblings.")
+        return redirect(
+            f"{reverse('add_family_member')}"
+            f"?relation=parent&person_id={main_person.id}")
+
+    formset = BatchPersonFormSet(request.POST or None)
+    relation_form = FamilyRelationForm(
+        request.POST or None, relation_context=relation)
+
+    if (request.method == 'POST' and formset.is_valid()
+            and relation_form.is_valid()):
+        persons = [
+            form.save(commit=False) for form in formset
+            if form.has_changed()
+        ]
+        add_relatives(
+            main_person, relation,
+            relation_form.cleaned_data['relation_type'], persons)
+        messages.success(request, f"{len(persons)} persons were added.")
+        return redirect('family_view', person_id=main_person.id)
+
+    return render(request, 'familytree/add_family_members.html', {
+        'formset': formset,
+        'relation_form': relation_form,
+        'relation': relation,
+        'main_person': main_person,
+    })
+
+
 @login_required
 def edit_person(request, pov_id, person_id):
     """Edit a person in the family tree."""
@@ -174,26 +221,57 @@ def delete_person(request, pov_id, person_id):
 
 
 @login_required
+def merge_person(request, pov_id, person_id):
+    """Merge a duplicate into a person, moving all its relations."""
+    person = get_object_or_404(Person, id=person_id, owner=request.user)
+    form = MergePersonForm(
+        request.POST or None, person=person,
+        initial={'duplicate': request.GET.get('duplicate')})
+
+    if request.method == 'POST' and form.is_valid():
+        duplicate = form.cleaned_data['duplicate']
+        if pov_id == duplicate.id:
+            pov_id = person.id
+        merge_persons(person, duplicate)
+        messages.success(
+            request,
+            f"{duplicate} was merged into {person}.")
+        return redirect('family_view', person_id=pov_id)
+
+    return render(request, 'familytree/merge_person.html', {
+        'form': form,
+        'person': person,
+        'pov_id': pov_id,
+    })
+
+
+@login_required
+@tree_condition
 def view_family(request, person_id):
     """Display the family tree of a person."""
     person = get_object_or_404(Person, id=person_id, owner=request.user)
     family_tree = get_object_or_404(FamilyTree, owner=request.user)
 
+    relatives = Person.objects.neighbourhood(person)
+    cards.attach_cards(
+        [person, *(p for group in relatives.values() for p in group)],
+        person.id)
+
     context = {
         "person": person,
         "family_tree": family_tree,
-        "persons": [],
+        "relatives": relatives,
+        "persons": [
+            *relatives["partners"], *relatives["parents"],
+            *relatives["children"], *relatives["siblings"],
+        ],
     }
 
-    context["persons"].extend(person.partners.all())
-    context["persons"].extend(person.parents.all())
-    context["persons"].extend(person.children.all())
-    context["persons"].extend(person.siblings())
-
     return render(request, "familytree/family_view.html", context)
 
 
 @login_required
+@tree_condition
 def view_details(request, pov_id, person_id):
     """Display the details of a person."""
     person = get_object_or_404(Person, id=person_id, owner=request.user)
@@ -207,31 +285,231 @@ def view_details(request, pov_id, person_id):
 
 
 @login_required
-def classic_tree_view(request, person_id):
-    pov = get_object_or_404(Person, id=person_id, owner=request.user)
+def relationship_view(request, pov_id, person_id):
+    """Name the blood relationship of a person to the POV as JSON."""
+    graph = graph_cache.get(request.user.pk)
+    if pov_id not in graph or person_id not in graph:
+        raise Http404("No such person in your family tree.")
+
+    return JsonResponse({
+        'pov_id': pov_id,
+        'person_id': person_id,
+        **relationship(graph, pov_id, person_id),
+    })
+
+
+@login_required
+def search_persons(request):
+    """Search the persons of the own family tree as JSON.
+    Pass ?q= with the words to find and ?typeahead=1 to match them
+    as prefixes, which is what search-as-you-type boxes use.
+    """
+    query = request.GET.get('q', '')
+    typeahead = request.GET.get('typeahead') == '1'
+    results = search.search(request.user.pk, query, typeahead)
+    for result in results:
+        result['url'] = reverse('family_view', args=[result['id']])
+    return JsonResponse({'query': query, 'results': results})
 
-    parents = pov.parents.all()
-    grandparents = Person.objects.none()
-    for parent in parents:
-        grandparents |= parent.parents.all()
 
-    partners = pov.partners.all()
-    partner_parents = Person.objects.none()
-    for partner in partners:
-        partner_parents |= partner.parents.all()
+@login_required
+def tree_graph(request):
+    """Stream the whole family tree as a graph document.
+    Pass ?format=binary for the compact binary encoding.
+    """
+    if request.GET.get('format') == 'binary':
+        response = StreamingHttpResponse(
+            exports.graph_binary(request.user.pk),
+            content_type='application/octet-stream'
+        )
+    else:
+        response = StreamingHttpResponse(
+            exports.graph_json(request.user.pk),
+            content_type='application/json'
+        )
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+@login_required
+@tree_condition
+def tree_layout(request):
+    """Serve the persons of the tree layout inside a viewport as JSON.
+    Pass ?root= to lay out the descendants of one person, otherwise
+    everyone is laid out in generations. ?left=, ?top=, ?right= and
+    ?bottom= give the viewport in layout units, one unit per person
+    and generation, missing sides are unbounded.
+    """
+    root_id = request.GET.get('root')
+    graph = graph_cache.get(request.user.pk)
+    if root_id is not None:
+        try:
+            root_id = int(root_id)
+        except ValueError:
+            raise Http404("No such person in your family tree.")
+        if root_id not in graph:
+            raise Http404("No such person in your family tree.")
+    try:
+        viewport = [
+            float(request.GET.get(side, default)) for side, default in (
+                ('left', '-inf'), ('top', '-inf'),
+                ('right', 'inf'), ('bottom', 'inf'))
+        ]
+    except ValueError:
+        raise Http404("Invalid viewport.")
+    if any(math.isnan(side) for side in viewport):
+        raise Http404("Invalid viewport.")
+
+    placed = layout.get_layout(request.user.pk, root_id)
+    visible = layout.window(placed, *viewport)
+    truncated = len(visible) > layout.MAX_NODES
+    visible = visible[:layout.MAX_NODES]
+    positions = placed['positions']
+    names = {
+        pk: f"{first_name} {last_name}"
+        for pk, first_name, last_name in Person.objects.filter(
+            pk__in=visible).values_list('pk', 'first_name', 'last_name')
+    }
+
+    edges = set()
+    for person_id in visible:
+        for parent in graph.parents(person_id):
+            edges.add((parent, person_id, 'parent'))
+        for child in graph.children(person_id):
+            edges.add((person_id, child, 'parent'))
+        for partner in graph.partners(person_id):
+            edges.add((*sorted((person_id, partner)), 'partner'))
+
+    return JsonResponse({
+        'version': placed['version'],
+        'bounds': placed['bounds'],
+        'tile': [layout.TILE_WIDTH, layout.TILE_HEIGHT],
+        'truncated': truncated,
+        'nodes': [
+            {'id': pk, 'x': positions[pk][0], 'y': positions[pk][1],
+             'name': names.get(pk, '')}
+            for pk in visible
+        ],
+        'edges': [
+            {'from': a, 'to': b, 'type': kind,
+             'points': [*positions[a], *positions[b]]}
+            for a, b, kind in sorted(edges)
+            if a in positions and b in positions
+        ],
+    })
+
+
+@login_required
+def export_gedcom(request):
+    """Download the family tree as a GEDCOM file.
+    Pass ?version=7.0 for GEDCOM 7, the default is 5.5.1.
+    """
+    version = request.GET.get('version', '5.5.1')
+    if version not in gedcom.VERSIONS:
+        raise Http404("Unknown GEDCOM version.")
+    response = StreamingHttpResponse(
+        gedcom.export_gedcom(request.user.pk, version),
+        content_type='text/plain; charset=utf-8'
+    )
+    response['Content-Disposition'] = (
+        'attachment; filename="family-tree.ged"')
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+@login_required
+def import_gedcom(request):
+    """Upload a GEDCOM file, the import runs outside the request."""
+    form = GedcomUploadForm(request.POST or None, request.FILES or None)
+
+    if request.method == 'POST' and form.is_valid():
+        path = gedcom.stage_upload(form.cleaned_data['gedcom_file'])
+        tasks.submit(gedcom.import_file, path, request.user.pk)
+        messages.success(
+            request,
+            "Your import has started. "
+            "The persons appear in your tree once it is finished.")
+        return redirect('get_owner')
+
+    return render(request, 'familytree/import_gedcom.html', {'form': form})
+
+
+def _max_generations():
+    """Most generations the classic tree shows in either direction."""
+    return getattr(settings, 'FAMILYTREE_MAX_GENERATIONS', 10)
+
+
+def _generation_count(request, name, default):
+    """Read a number of generations from the query string, limited to
+    FAMILYTREE_MAX_GENERATIONS.
+    """
+    try:
+        value = int(request.GET.get(name, ''))
+    except ValueError:
+        return default
+    if value < 0:
+        return default
+    return min(value, _max_generations())
 
-    siblings = pov.siblings()
 
-    children = pov.children.all()
+def _generation_title(number, relatives):
+    """Name a generation, like 'Great-great-grandparents' for 4."""
+    return ("great-" * (number - 2) + "grand" + relatives).capitalize()
+
+
+@login_required
+@tree_condition
+def classic_tree_view(request, person_id):
+    """Display the classic tree of a person.
+    Pass ?up= and ?down= for the number of generations of ancestors
+    and descendants, two and one by default. All generations are read
+    with one recursive query and one query loading the persons.
+    """
+    pov = get_object_or_404(Person, id=person_id, owner=request.user)
+    up = _generation_count(request, 'up', 2)
+    down = _generation_count(request, 'down', 1)
+
+    graph = graph_cache.get(request.user.pk)
+    generation = Person.objects.generations(pov, up=up, down=down)
+    levels = defaultdict(list)
+    for relative_id, number in generation.items():
+        levels[number].append(relative_id)
+
+    partner_ids = graph.partners(pov.id)
+    partner_parent_ids = {
+        pp for p in partner_ids for pp in graph.parents(p)
+        } if up else set()
+    sibling_ids = graph.siblings(pov.id)
+
+    persons = Person.objects.in_bulk(
+        set(generation) | set(partner_ids)
+        | partner_parent_ids | set(sibling_ids)
+    )
+
+    def pick(ids):
+        return [persons[i] for i in sorted(ids) if i in persons]
 
     context = {
         'pov': pov,
-        'parents': parents,
-        'grandparents': grandparents.distinct(),
-        'partners': partners,
-        'siblings': siblings,
-        'partner_parents': partner_parents.distinct(),
-        'children': children
+        'up': up,
+        'down': down,
+        'max_generations': _max_generations(),
+        'ancestor_levels': [
+            {'title': _generation_title(number, 'parents'),
+             'persons': pick(levels[number])}
+            for number in range(up, 1, -1) if levels[number]
+        ],
+        'descendant_levels': [
+            {'title': _generation_title(number, 'children'),
+             'persons': pick(levels[-number])}
+            for number in range(2, down + 1) if levels[-number]
+        ],
+        'parents': pick(levels[1]),
+        'grandparents': pick(levels[2]),
+        'partners': pick(partner_ids),
+        'siblings': pick(sibling_ids),
+        'partner_parents': pick(partner_parent_ids),
+        'children': pick(levels[-1])
     }
 
     return render(request, "familytree/entire_view.html", context)
@@ -112,6 +112,32 @@ DATABASES = {
     dj_database_url.parse(os.environ.get("DATABASE_URL"))
 }
 
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# The default cache is shared by all workers and holds the few values
+# that must agree between them. The table is created by the familytree
+# migrations. Rendered cards, image urls and layouts are keyed by
+# versions read from the database, so every worker keeps its own copy
+# in memory.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'familytree_cache',
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+    'fragments': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'familytree_fragments',
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    },
+}
+
+# Part of the ETag of tree pages, so browsers drop pages of an older
+# deploy. Heroku sets HEROKU_RELEASE_VERSION with runtime dyno metadata,
+# without it the token is derived from the template and static files.
+FAMILYTREE_RELEASE = os.environ.get("HEROKU_RELEASE_VERSION", "")
+
 CSRF_TRUSTED_ORIGINS = [
     "https://*.codeinstitute-ide.net/",
     "https://*.herokuapp.com"
@@ -14,6 +14,8 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
+from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path, include
 from django.views.generic import TemplateView
@@ -50,3 +52,10 @@ urlpatterns = [
          include("peopleOfHistory.urls"),
          name="people_of_history"),
 ]
+
+# Images of the local image backend, served in development only.
+urlpatterns += static(
+    getattr(settings, 'FAMILYTREE_IMAGE_URL', '/media/'),
+    document_root=getattr(
+        settings, 'FAMILYTREE_IMAGE_ROOT',
+        settings.BASE_DIR / 'media'))
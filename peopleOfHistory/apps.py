@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class PeopleofhistoryConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'peopleOfHistory'
+
+    def ready(self):
+        import peopleOfHistory.signals
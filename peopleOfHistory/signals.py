@@ -0,0 +1,10 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import PersonOfHistory
+from .views import forget_person_of_the_day
+
+
+@receiver([post_save, post_delete], sender=PersonOfHistory)
+def invalidate_person_of_the_day(sender, **kwargs):
+    """Pick again once the persons of history change."""
+    forget_person_of_the_day()
@@ -1,6 +1,8 @@
 from django.test import TestCase, Client
 from django.urls import reverse
+from django.core.cache import cache
 from .models import PersonOfHistory
+from .views import person_of_the_day, _day_key, _pick, VERSION_KEY
 from unittest.mock import patch
 from cloudinary.models import CloudinaryField
 from django.core.exceptions import ValidationError
@@ -78,6 +80,8 @@ class PersonOfTheDayViewTest(TestCase):
     def setUp(self):
         self.client = Client()
         self.url = reverse('person_of_the_day')
+        # Rolled back test data does not send delete signals.
+        cache.clear()
 
     def test_view_with_no_persons(self):
         """If no persons exist, a suitable message is displayed."""
@@ -151,3 +155,78 @@ class PersonOfTheDayViewTest(TestCase):
         self.assertNotEqual(person_day2, None)
         # If there are enough entries, you can even expect them to be different
         self.assertNotEqual(person_day1, person_day2)
+
+    def test_pick_is_cached(self):
+        """Later requests of the day read the version and the pick with
+        one query."""
+        PersonOfHistory.objects.create(name="Ibn Sina", story="Polymath")
+        self.client.get(self.url)
+        with patch('peopleOfHistory.views.cloudinary_url') as signer:
+            with self.assertNumQueries(1):
+                response = self.client.get(self.url)
+        signer.assert_not_called()
+        self.assertEqual(response.context['person_of_history'].name,
+                         "Ibn Sina")
+
+    def test_story_not_loaded_for_others(self):
+        """The pick reads the id range and loads a single person."""
+        for i in range(5):
+            PersonOfHistory.objects.create(name=f"Person {i}", story="Story")
+        with self.assertNumQueries(2):
+            person, _ = _pick(date(2025, 6, 2))
+        self.assertTrue(person.name.startswith("Person"))
+
+    def test_changes_invalidate_the_pick(self):
+        """Adding a person makes the day pick again."""
+        self.client.get(self.url)
+        person = PersonOfHistory.objects.create(name="Ibn Rushd",
+                                                story="Philosopher")
+        response = self.client.get(self.url)
+        self.assertEqual(response.context['person_of_history'], person)
+
+    def test_edits_invalidate_the_pick(self):
+        """Editing the picked person is shown at once."""
+        person = PersonOfHistory.objects.create(name="Ibn Sina",
+                                                story="Polymath")
+        self.client.get(self.url)
+        person.story = "Physician"
+        person.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response.context['person_of_history'].story,
+                         "Physician")
+
+    def test_lost_version_is_not_reused(self):
+        """A pick cached before the version was evicted is not served."""
+        person = PersonOfHistory.objects.create(name="Ibn Sina",
+                                                story="Polymath")
+        day = date(2025, 6, 2)
+        person_of_the_day(day)
+        cache.delete(VERSION_KEY)
+        PersonOfHistory.objects.filter(pk=person.pk).update(
+            name="Avicenna")
+        self.assertEqual(person_of_the_day(day)[0].name, "Avicenna")
+
+    def test_waits_for_refill_in_flight(self):
+        """Requests arriving during a refill reuse its result."""
+        day = date(2025, 6, 2)
+        key = _day_key(day)
+        cache.add(f'{key}:lock', 1)
+
+        def refill_done(seconds):
+            cache.set(key, (cache.get(VERSION_KEY), ("picked", "url")))
+
+        with patch('peopleOfHistory.views.clock.sleep',
+                   side_effect=refill_done) as sleep:
+            self.assertEqual(person_of_the_day(day), ("picked", "url"))
+        sleep.assert_called_once()
+
+    def test_stops_waiting_after_deadline(self):
+        """A refill that never finishes is not waited for forever."""
+        PersonOfHistory.objects.create(name="Ibn Sina", story="Polymath")
+        day = date(2025, 6, 2)
+        cache.add(f'{_day_key(day)}:lock', 1)
+        with patch('peopleOfHistory.views.clock') as clock:
+            clock.monotonic.side_effect = [0, 1, 3]
+            person, _ = person_of_the_day(day)
+        self.assertEqual(clock.sleep.call_count, 1)
+        self.assertEqual(person.name, "Ibn Sina")
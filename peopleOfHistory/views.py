@@ -1,28 +1,70 @@
+from django.core.cache import cache
+from django.db.models import Max, Min
 from django.shortcuts import render, get_object_or_404
 from .models import PersonOfHistory
-from datetime import date
+from datetime import date, datetime, time, timedelta
 import hashlib
+import time as clock
+import uuid
 from cloudinary.utils import cloudinary_url
 
+VERSION_KEY = 'peopleOfHistory:version'
+LOCK_TIMEOUT = 10
+LOCK_WAIT = 2
 
-def person_of_the_day_view(request):
-    """Display a repeatable person of history for each day."""
-    all_persons = list(PersonOfHistory.objects.all())
-    if not all_persons:
-        return render(
-            request,
-            'peopleOfHistory/people_of_history.html',
-            {'person_of_history': None}
-        )
 
-    today_str = date.today().isoformat()
-    hash_digest = hashlib.md5(today_str.encode()).hexdigest()
-    hash_int = int(hash_digest, 16)
+def _day_key(day):
+    return f'peopleOfHistory:of-the-day:{day.isoformat()}'
+
+
+def forget_person_of_the_day():
+    """Make every worker pick again, cached picks of older versions
+    are no longer served."""
+    cache.set(VERSION_KEY, uuid.uuid4().hex, None)
+
+
+def _cached(day):
+    """Read the version and the cached pick of a day with one multi-get.
+    Return the version and the pick, None if missing or outdated.
+    """
+    found = cache.get_many([VERSION_KEY, _day_key(day)])
+    version = found.get(VERSION_KEY)
+    if version is None:
+        version = uuid.uuid4().hex
+        if not cache.add(VERSION_KEY, version, None):
+            version = cache.get(VERSION_KEY)
+    stored = found.get(_day_key(day))
+    if stored and stored[0] == version:
+        return version, stored[1]
+    return version, None
+
+
+def _seconds_until_midnight():
+    # Days follow date.today(), the local date of the server.
+    now = datetime.now()
+    midnight = datetime.combine(now.date() + timedelta(days=1), time.min)
+    return max(int((midnight - now).total_seconds()), 1)
+
 
-    index = hash_int % len(all_persons)
-    person_of_the_day = all_persons[index]
+def _pick(day):
+    """Pick the person of a day: a hash of the day chooses an id
+    between the smallest and the largest one, the person with the next
+    id at or above it is loaded. Both are indexed lookups.
+    """
+    bounds = PersonOfHistory.objects.aggregate(
+        first=Min('pk'), last=Max('pk'))
+    if bounds['first'] is None:
+        return None, None
+
+    hash_digest = hashlib.md5(day.isoformat().encode()).hexdigest()
+    target = bounds['first'] + int(hash_digest, 16) % (
+        bounds['last'] - bounds['first'] + 1)
+    person = PersonOfHistory.objects.filter(
+        pk__gte=target).order_by('pk').first()
+    if person is None:
+        return None, None
     secure_url, _ = cloudinary_url(
-        person_of_the_day.image.public_id,
+        person.image.public_id,
         secure=True,
         transformation=[
             {"width": 300, "crop": "scale"},
@@ -30,12 +72,53 @@ def person_of_the_day_view(request):
             {"fetch_format": "auto"}
         ]
     )
+    return person, secure_url
+
+
+def person_of_the_day(day):
+    """Get the person of a day and the signed image url.
+    The pick is cached until midnight together with the version it was
+    made for, only one request refills it while the others wait for
+    the cached value.
+    """
+    version, picked = _cached(day)
+    if picked is not None:
+        return picked
+
+    lock = f'{_day_key(day)}:lock'
+    if not cache.add(lock, 1, LOCK_TIMEOUT):
+        deadline = clock.monotonic() + LOCK_WAIT
+        while clock.monotonic() < deadline:
+            clock.sleep(0.05)
+            _, picked = _cached(day)
+            if picked is not None:
+                return picked
+        return _pick(day)
+
+    try:
+        picked = _pick(day)
+        cache.set(_day_key(day), (version, picked),
+                  _seconds_until_midnight())
+        return picked
+    finally:
+        cache.delete(lock)
+
+
+def person_of_the_day_view(request):
+    """Display a repeatable person of history for each day."""
+    person, secure_url = person_of_the_day(date.today())
+    if person is None:
+        return render(
+            request,
+            'peopleOfHistory/people_of_history.html',
+            {'person_of_history': None}
+        )
 
     return render(
         request,
         'peopleOfHistory/people_of_history.html',
         {
-            'person_of_history': person_of_the_day,
+            'person_of_history': person,
             'secure_image_url': secure_url
         }
     )